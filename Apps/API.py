@@ -6,11 +6,10 @@
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, FileResponse, Response
 import uvicorn
 import threading
 import time
-import json
 import subprocess
 import asyncio
 from contextlib import asynccontextmanager
@@ -21,6 +20,8 @@ import Config
 from _System_ import SystemState
 from Arduino_control import HardwareController
 from CLI_control import CameraHandler # Camera_handler 모듈명 가정
+from Commands import CommandRouter, CommandError, validate_targets
+from Payload_codec import PayloadCodec, get_codec
 
 # --- 백그라운드 작업 및 WebSocket 관리 ---
 
@@ -39,6 +40,11 @@ async def lifespan(app: FastAPI):
     log.info("Starting background broadcast task...")
     if not app.state.ap_mode:
         task = asyncio.create_task(broadcast_loop())
+        if camera_handler:
+            # 촬영 작업은 별도 스레드에서 끝나므로 이벤트 루프로 넘겨 WebSocket으로 알림
+            loop = asyncio.get_running_loop()
+            camera_handler.capture_jobs.add_listener(
+                lambda job: asyncio.run_coroutine_threadsafe(connection_manager.broadcast_event("capture_job", job), loop))
     yield
     if not app.state.ap_mode:
         task.cancel()
@@ -48,23 +54,34 @@ async def lifespan(app: FastAPI):
             log.info("Background broadcast task cancelled.")
 
 class ConnectionManager:
-    """활성화된 WebSocket 연결을 관리합니다."""
+    """활성화된 WebSocket 연결과 연결별 코덱을 관리합니다."""
     def __init__(self):
-        self.activate_connections: list[WebSocket] = []
+        self.activate_connections: dict[WebSocket, PayloadCodec] = {}
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, codec: PayloadCodec):
         await websocket.accept()
-        self.activate_connections.append(websocket)
-        log.info("WebSocket client connected.")
+        self.activate_connections[websocket] = codec
+        log.info(f"WebSocket client connected. (codec: {codec.name})")
 
     def disconnect(self, websocket: WebSocket):
-        self.activate_connections.remove(websocket)
+        self.activate_connections.pop(websocket, None)
         log.info("WebSocket client disconnected.")
 
     async def broadcast_state(self, state: dict):
-        message = json.dumps(state, default=str)
-        for connection in self.activate_connections:
-            await connection.send_text(message)
+        # 같은 코덱을 쓰는 연결에는 한 번 직렬화한 메시지를 그대로 보냄
+        messages = {}
+        for connection, codec in list(self.activate_connections.items()):
+            if codec.name not in messages:
+                messages[codec.name] = codec.encode(state)
+            message = messages[codec.name]
+            if codec.binary:
+                await connection.send_bytes(message)
+            else:
+                await connection.send_text(message)
+
+    async def broadcast_event(self, event: str, data: dict):
+        """상태가 아닌 이벤트 알림을 {"event": ..., "data": ...} 형식으로 보냅니다."""
+        await self.broadcast_state({"event": event, "data": data})
 
 # --- FastAPI 앱 설정 ---
 app = FastAPI(lifespan=lifespan)
@@ -80,6 +97,10 @@ app.add_middleware(
 system_state: SystemState = None
 hardware_controller: HardwareController = None
 camera_handler: CameraHandler = None
+arbiter = None  # 액추에이터 중재기 (수동 제어와 모드 변경을 반영)
+scheduler = None  # RUNTIME_MODE가 "SCHEDULER"일 때의 Scheduler 인스턴스
+command_router: CommandRouter = None  # MQTT 명령 채널과 같은 검증/반영 규칙을 사용하는 제어 명령 처리기
+async_mode = False  # RUNTIME_MODE가 "ASYNC"이면 블로킹 작업을 이벤트 루프의 executor에서 실행
 connection_manager = ConnectionManager()
 
 # --- API 인증 ---
@@ -100,48 +121,114 @@ async def get_current_state():
 @app.post("/api/control", dependencies=[Depends(verify_api_key)])
 async def control_actuator(command: dict):
     """수동으로 액추에이터를 제어하는 명령을 수신합니다."""
-    device = command.get("device")
-    value = command.get("value")
-    if device and value is not None:
-        log.info(f"[API] Manual control command received: {command}")
-        # 불필요한 'force_actuator_update=True' 인자를 삭제합니다.
-        system_state.update_values({"ACTUATOR": {device: value}})
-        return {"status": "success", "command": command}
-    raise HTTPException(status_code=400, detail="Invalid command format.")
+    log.info(f"[API] Manual control command received: {command}")
+    try:
+        result = command_router.control(command.get("device"), command.get("value"))
+    except CommandError as e:
+        raise HTTPException(status_code=e.status, detail=e.message)
+    return {"status": "success", "command": command, **result}
 
 @app.post("/api/setpoints", dependencies=[Depends(verify_api_key)])
 async def set_new_targets(targets: dict):
     """자동 제어를 위한 새로운 목표값을 설정합니다."""
     log.info(f"[API] Setpoints update received: {targets}")
-    # [수정] update_values 메서드를 사용하여 TARGET 값만 업데이트
-    updated_data = system_state.update_values({"TARGET": targets})
-    return {"status": "success", "updated_targets": updated_data['TARGET']}
+    try:
+        result = command_router.set_setpoints(targets)
+    except CommandError as e:
+        raise HTTPException(status_code=e.status, detail=e.message)
+    return {"status": "success", **result}
 
 @app.post("/api/mode", dependencies=[Depends(verify_api_key)])
 async def set_system_mode(mode_data: dict):
     """'AUTO' 또는 'MANUAL' 모드를 설정합니다."""
-    mode = mode_data.get("mode")
-    if mode and mode.upper() in ["AUTO", "MANUAL"]:
-        log.info(f"[API] Mode change received: {mode}")
-        # SystemState의 update_values를 재활용하여 모드를 변경합니다.
-        system_state.update_values({"MODE": mode.upper()})
-        return {"status": "success", "updated_mode": system_state.get_all_data()['MODE']}
-    raise HTTPException(status_code=400, detail="Invalid mode value. Must be 'AUTO' or 'MANUAL'.")
+    log.info(f"[API] Mode change received: {mode_data.get('mode')}")
+    try:
+        result = command_router.set_mode(mode_data.get("mode"))
+    except CommandError as e:
+        raise HTTPException(status_code=e.status, detail=e.message)
+    return {"status": "success", **result}
 
 @app.post("/api/camera/capture", dependencies=[Depends(verify_api_key)])
-async def trigger_capture():
-    """사용자 요청에 의해 카메라 촬영 시퀀스를 시작합니다."""
+async def trigger_capture(shots: int = 1):
+    """사용자 요청에 의해 카메라 촬영 시퀀스를 시작합니다. shots로 연속 촬영 장수를 지정할 수 있습니다."""
+    try:
+        result = command_router.capture(shots, source="API")
+    except CommandError as e:
+        raise HTTPException(status_code=e.status, detail=e.message)
+    log.info(f"[API] Capture sequence initiated by user. (shots={shots})")
+    message = "Merged into pending capture job." if result["coalesced"] else "Capture sequence initiated."
+    return {"status": "success", "message": message, **result}
+
+@app.get("/api/camera/capture/{job_id}", dependencies=[Depends(verify_api_key)])
+async def get_capture_job(job_id: str):
+    """촬영 작업의 상태(QUEUED, RUNNING, DONE, FAILED)와 결과를 반환합니다."""
+    job = camera_handler.capture_jobs.get(job_id) if camera_handler else None
+    if job:
+        return job
+    raise HTTPException(status_code=404, detail="Capture job not found.")
+
+@app.get("/api/camera/uploads", dependencies=[Depends(verify_api_key)])
+async def get_upload_stats():
+    """업로드 큐의 대기/진행 중인 파일 수와 누적 업로드, 실패, 버림 횟수, 중복으로 건너뛴 사진 수, 현재 업로드 대역폭 상한을 반환합니다."""
     if camera_handler:
-        log.info("[API] Capture sequence initiated by user.")
-        threading.Thread(target=camera_handler.capture_and_upload).start()
-        return {"status": "success", "message": "Capture sequence initiated."}
+        return {**camera_handler.upload_queue.stats(), "duplicates": camera_handler.duplicate_filter.stats(),
+                "transfer": camera_handler.aws.transfer_stats() if camera_handler.aws else None}
     raise HTTPException(status_code=503, detail="Camera handler not available.")
 
+@app.get("/api/images", dependencies=[Depends(verify_api_key)])
+async def list_images(start: str = None, end: str = None, limit: int = 50,
+                      temp_min: float = None, temp_max: float = None, humid_min: float = None, humid_max: float = None,
+                      soil_min: float = None, soil_max: float = None, light_min: float = None, light_max: float = None):
+    """라즈베리파이에 보관된 사진의 메타데이터(촬영 시각, 촬영 당시 센서 값, 종류별 해시)를 최신순으로 반환합니다.
+    start/end는 ISO 형식의 촬영 시각 범위이고, <센서>_min/<센서>_max로 촬영 당시 작물 환경을 골라낼 수 있습니다."""
+    if not camera_handler:
+        raise HTTPException(status_code=503, detail="Camera handler not available.")
+    if not 1 <= limit <= 500:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 500.")
+    bounds = {"TEMP": (temp_min, temp_max), "HUMID": (humid_min, humid_max),
+              "SOIL": (soil_min, soil_max), "LIGHT": (light_min, light_max)}
+    conditions = {name: bound for name, bound in bounds.items() if bound != (None, None)}
+    return {"images": camera_handler.image_store.list_images(start, end, limit, conditions),
+            "store": camera_handler.image_store.stats()}
+
+@app.get("/api/images/{filename}", dependencies=[Depends(verify_api_key)])
+async def get_image(filename: str, variant: str = "thumbnail", if_none_match: str = Header(None)):
+    """보관된 사진을 종류(thumbnail, analysis, original 등)별로 반환합니다.
+    내용 해시를 ETag로 사용하므로 클라이언트는 같은 사진을 다시 받지 않습니다."""
+    if not camera_handler:
+        raise HTTPException(status_code=503, detail="Camera handler not available.")
+    path, digest = camera_handler.image_store.get_path(filename, variant)
+    if not path:
+        raise HTTPException(status_code=404, detail="Image not found.")
+    headers = {"ETag": f'"{digest}"', "Cache-Control": "private, max-age=31536000, immutable"}
+    if if_none_match == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type="image/jpeg", headers=headers)
+
+@app.get("/api/actuator/sources", dependencies=[Depends(verify_api_key)])
+async def get_actuator_sources():
+    """액추에이터별 최종 출력과 이를 결정한 제어 주체, 레이어별 요청을 반환합니다."""
+    return arbiter.snapshot()
+
+@app.get("/api/scheduler/stats", dependencies=[Depends(verify_api_key)])
+async def get_scheduler_stats():
+    """스케줄러 작업별 실행 횟수, 지터, 오버런 통계를 반환합니다."""
+    if scheduler:
+        return {"jobs": scheduler.stats()}
+    raise HTTPException(status_code=404, detail="Scheduler is not enabled.")
+
 # --- WebSocket 엔드포인트 ---
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    """실시간 상태 브로드캐스트를 위한 WebSocket 연결을 처리합니다."""
-    await connection_manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, codec: str = None):
+    """실시간 상태 브로드캐스트를 위한 WebSocket 연결을 처리합니다.
+    ?codec=msgpack 처럼 코덱을 지정하면 이진 메시지로 받습니다. (기본: PAYLOAD_CODEC_DEFAULT)"""
+    try:
+        payload_codec = get_codec(codec)
+    except ValueError as e:
+        log.warning(f"WebSocket 연결 거부: {e}")
+        await websocket.close(code=1003, reason=str(e))
+        return
+    await connection_manager.connect(websocket, payload_codec)
     try:
         while True:
             await websocket.receive_text()
@@ -169,6 +256,11 @@ async def get_current_values():
 @app.post("/api/save-values")
 async def save_new_values(update_data: dict):
     """프론트에서 받은 값으로 기존 설정을 '안전하게' 업데이트합니다."""
+    if "TARGET" in update_data:
+        try:
+            update_data["TARGET"] = validate_targets(update_data["TARGET"])
+        except CommandError as e:
+            raise HTTPException(status_code=e.status, detail=e.message)
     state_manager = SystemState()
     updated_values = state_manager.update_values(update_data)
     return {"status": "success", "message": "Values updated successfully.", "data": updated_values}
@@ -200,20 +292,37 @@ async def save_wifi_credentials(credentials: dict):
         with open("/etc/wpa_supplicant/wpa_supplicant.conf", "a") as f:
             f.write(f'\nnetwork={{\n\tssid="{ssid}"\n\tpsk="{password}"\n}}\n')
         log.info("Wi-Fi credentials saved. Rebooting device in 5 seconds...")
-        threading.Thread(target=lambda: (time.sleep(5), subprocess.run(["sudo", "reboot"]))).start()
+        if scheduler:
+            scheduler.after(5, lambda: subprocess.run(["sudo", "reboot"]), name="reboot")
+        elif async_mode:
+            asyncio.get_running_loop().call_later(5, subprocess.run, ["sudo", "reboot"])
+        else:
+            threading.Thread(target=lambda: (time.sleep(5), subprocess.run(["sudo", "reboot"]))).start()
         return {"status": "success", "message": "Credentials saved. Device will reboot."}
     except Exception as e:
         log.error(f"Failed to save Wi-Fi credentials: {e}")
         raise HTTPException(status_code=500, detail="Failed to save credentials.")
 
 # --- 서버 실행 ---
-def run_api_server(state_instance, hardware_instance, camera_instance, ap_mode=False):
-    """API 서버를 실행합니다."""
-    global system_state, hardware_controller, camera_handler
+def setup_api(state_instance, hardware_instance, camera_instance, ap_mode=False, scheduler_instance=None, is_async=False,
+              arbiter_instance=None, command_router_instance=None):
+    """API 서버가 사용할 컴포넌트 인스턴스를 등록합니다.
+    command_router_instance가 없으면 등록한 인스턴스로 새 명령 처리기를 만듭니다."""
+    global system_state, hardware_controller, camera_handler, scheduler, async_mode, arbiter, command_router
     system_state = state_instance
     hardware_controller = hardware_instance
     camera_handler = camera_instance
+    arbiter = arbiter_instance
+    scheduler = scheduler_instance
+    async_mode = is_async
+    command_router = command_router_instance or CommandRouter(state_instance, arbiter_instance, camera_instance)
     app.state.ap_mode = ap_mode
+
+def run_api_server(state_instance, hardware_instance, camera_instance, ap_mode=False, scheduler_instance=None,
+                   arbiter_instance=None, command_router_instance=None):
+    """API 서버를 실행합니다."""
+    setup_api(state_instance, hardware_instance, camera_instance, ap_mode, scheduler_instance,
+              arbiter_instance=arbiter_instance, command_router_instance=command_router_instance)
     host_ip = "0.0.0.0"
     log.info(f"Starting API server in {'AP' if ap_mode else 'Normal'} mode on {host_ip}:8000")
     uvicorn.run(app, host=host_ip, port=8000)
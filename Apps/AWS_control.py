@@ -6,26 +6,102 @@
 
 # 외부 모듈 호출
 import threading
+import time
 import boto3
-from botocore.exceptions import NoCredentialsError, PartialCredentialsError
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config as BotocoreConfig
+from botocore.exceptions import ClientError, NoCredentialsError, PartialCredentialsError
 # MQTT 클라이언트를 위한 paho-mqtt 라이브러리
 import paho.mqtt.client as mqtt
-import json
 import os
+import io
 
 # 내부 모듈 호출
-from Utility import log
+from Utility import log, TokenBucket
 import Config
 from _System_ import SystemState
+from Local_cloud import LocalS3Client, LocalMQTTClient
+from Storage_layout import PartitionManifests
+from Payload_codec import codec_for_topic, check_topic_codecs
+
+# 다시 시도해도 성공할 수 없는 S3 오류 코드 (객체/버킷/권한 문제)
+PERMANENT_S3_ERRORS = ("AccessDenied", "AllAccessDisabled", "NoSuchBucket", "InvalidBucketName", "KeyTooLongError",
+                       "EntityTooLarge", "InvalidArgument", "InvalidRequest", "MethodNotAllowed")
+
+class PermanentUploadError(Exception):
+    """다시 시도해도 성공할 수 없는 업로드 실패입니다. 업로드 큐는 이 파일을 재시도하지 않고 격리합니다."""
+
+def is_permanent_error(error: Exception) -> bool:
+    """업로드 오류가 재시도로 해결되지 않는 종류이면 True를 반환합니다. (네트워크/시간 초과 등은 False)"""
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code") in PERMANENT_S3_ERRORS
+    return isinstance(error, (FileNotFoundError, ValueError))
+
+class MemoryviewReader(io.RawIOBase):
+    """메모리의 바이트를 복사하지 않고 파일처럼 읽을 수 있게 합니다. (upload_fileobj용)"""
+    def __init__(self, data):
+        self.view = memoryview(data).cast("B")
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = min(len(buffer), len(self.view) - self.position)
+        buffer[:count] = self.view[self.position:self.position + count]
+        self.position += count
+        return count
+
+    def read(self, size=-1):
+        """원본 버퍼를 가리키는 memoryview 조각을 반환합니다. (복사하지 않음, bytes가 필요하면 호출한 쪽에서 변환)"""
+        end = len(self.view) if size is None or size < 0 else min(len(self.view), self.position + size)
+        chunk = self.view[self.position:end]
+        self.position = end
+        return chunk
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: len(self.view)}[whence]
+        self.position = max(0, base + offset)
+        return self.position
+
+    def tell(self):
+        return self.position
 
 class AWSHandler:
     def __init__ (self, state: SystemState):
         self.state = state
-        self.s3_client = boto3.client('s3', region_name=Config.AWS_REGION)
+        if Config.CLOUD_BACKEND == "LOCAL":
+            self.s3_client = LocalS3Client()    # AWS 없이 시험할 때 로컬 디렉토리에 업로드
+        else:
+            # 하나의 세션과 클라이언트(연결 풀)를 모든 업로드가 재사용
+            self.session = boto3.session.Session(region_name=Config.AWS_REGION)
+            self.s3_client = self.session.client('s3', config=BotocoreConfig(
+                max_pool_connections=Config.S3_MAX_CONCURRENCY * Config.UPLOAD_WORKERS,
+                retries={"max_attempts": 3, "mode": "standard"}))
+
+        # 멀티파트 업로드 설정: 큰 파일은 여러 조각으로 나누어 동시에 전송
+        self.transfer_config = TransferConfig(
+            multipart_threshold=int(Config.S3_MULTIPART_THRESHOLD_MB * 1024 * 1024),
+            multipart_chunksize=int(Config.S3_MULTIPART_CHUNK_MB * 1024 * 1024),
+            max_concurrency=Config.S3_MAX_CONCURRENCY,
+            use_threads=Config.S3_MAX_CONCURRENCY > 1)
+        # 업로드 대역폭 제한: 전송되는 조각마다 토큰을 사용하므로 MQTT/API 트래픽이 끼어들 여유가 생김
+        self.max_rate = Config.UPLOAD_RATE_LIMIT_KBPS * 1024
+        self.bandwidth = TokenBucket(self.max_rate, Config.UPLOAD_RATE_BURST_KB * 1024)
+        self.observed_rate = None   # 관측된 업로드 처리량의 지수 이동 평균 (bytes/s)
+        self.transfer_lock = threading.Lock()
+        # 파티션(장치/구역/날짜/시간)별로 업로드된 객체를 기록하는 매니페스트
+        self.manifests = PartitionManifests(self.s3_client)
         self.data = self.state.get_all_data()
 
         #MQTT 클랄이언트 설정
-        self.mqtt_client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id="smartfarm-pi-hanium")
+        if Config.CLOUD_BACKEND == "LOCAL":
+            self.mqtt_client = LocalMQTTClient()    # 로컬 브로커 대체 구현
+        else:
+            self.mqtt_client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id="smartfarm-pi-hanium")
         self.mqtt_client.on_connect = self._on_mqtt_connect
         self.mqtt_client.on_message = self._on_mqtt_message
 
@@ -37,21 +113,77 @@ class AWSHandler:
         self.cert_path = os.path.join(certs_path, "0bc986e09690058b5d04735400aac0aed3c881b583d12293e91d2dc4abfdc261-certificate.pem.crt")
         self.key_path = os.path.join(certs_path, "0bc986e09690058b5d04735400aac0aed3c881b583d12293e91d2dc4abfdc261-private.pem.key")
         self.mqtt_endpoint = "a16umr8elu8e4g-ats.iot.ap-northeast-2.amazonaws.com"
-        self.mqtt_client.tls_set(ca_certs=self.ca_path, certfile=self.cert_path, keyfile=self.key_path)
+        if Config.CLOUD_BACKEND != "LOCAL":
+            self.mqtt_client.tls_set(ca_certs=self.ca_path, certfile=self.cert_path, keyfile=self.key_path)
         
+        # 토픽별 코덱을 미리 확인하여, 라이브러리가 없는 코덱은 시작할 때 오류를 기록하고 json으로 대체
+        log.info(f"MQTT 토픽별 코덱: {check_topic_codecs()}")
+
+        self.command_router = None  # 설정되면 COMMAND_TOPIC으로 들어온 원격 제어 명령을 처리
+        self.topic_handlers = {}    # 토픽 -> (처리 함수, QoS), 연결될 때마다 구독
         self.stop_event = threading.Event()
 
+    def subscribe_topic(self, topic: str, handler, qos: int = 1):
+        """토픽에 메시지가 오면 handler(msg)를 호출하도록 등록합니다. 다시 연결되어도 자동으로 구독합니다."""
+        self.topic_handlers[topic] = (handler, qos)
+        if self.mqtt_client.is_connected():
+            self.mqtt_client.subscribe(topic, qos=qos)
+
+    def set_command_router(self, command_router):
+        """MQTT 명령 채널에서 사용할 명령 처리기(REST API와 같은 인스턴스)를 등록합니다."""
+        self.command_router = command_router
+        self.subscribe_topic(Config.COMMAND_TOPIC, self._handle_command)
+
+    def _throttle(self, bytes_amount: int):
+        """(boto3 전송 콜백) 전송된 조각 크기만큼 토큰을 사용하며, 대역폭 상한을 넘으면 전송 스레드를 잠시 멈춥니다."""
+        if bytes_amount > 0:
+            self.bandwidth.acquire(bytes_amount, self.stop_event)
+
+    def _record_throughput(self, size: int, elapsed: float):
+        """업로드 처리량을 관측하여 대역폭 상한을 조정합니다.
+        회선이 상한보다 느리면 관측 처리량의 UPLOAD_BANDWIDTH_SHARE로 낮추어 제어 트래픽의 여유를 남기고,
+        상한까지 나오면 조금씩 올려 회선 상태가 좋아졌는지 확인합니다. (AIMD)"""
+        if not self.max_rate or not Config.UPLOAD_RATE_ADAPTIVE or size < Config.UPLOAD_RATE_SAMPLE_KB * 1024 or elapsed <= 0:
+            return
+        observed = size / elapsed
+        with self.transfer_lock:
+            self.observed_rate = observed if self.observed_rate is None else 0.7 * self.observed_rate + 0.3 * observed
+            rate = self.bandwidth.rate
+            if observed < rate * 0.8:
+                # 회선이 느려졌으면 이동 평균을 기다리지 않고 바로 낮춤
+                rate = min(observed, self.observed_rate) * Config.UPLOAD_BANDWIDTH_SHARE
+            else:
+                rate = rate * 1.1
+            rate = max(Config.UPLOAD_RATE_MIN_KBPS * 1024, min(self.max_rate, rate))
+            self.bandwidth.set_rate(rate, min(rate, Config.UPLOAD_RATE_BURST_KB * 1024))
+        log.debug(f"[S3] 관측 처리량 {observed / 1024:.0f}KB/s -> 업로드 상한 {rate / 1024:.0f}KB/s")
+
+    def transfer_stats(self) -> dict:
+        with self.transfer_lock:
+            return {
+                "rate_limit_kbps": round(self.bandwidth.rate / 1024, 1) if self.max_rate else None,
+                "observed_kbps": round(self.observed_rate / 1024, 1) if self.observed_rate else None,
+                "multipart_threshold_mb": Config.S3_MULTIPART_THRESHOLD_MB,
+                "max_concurrency": Config.S3_MAX_CONCURRENCY,
+                **self.manifests.stats(),
+            }
+
     def upload_to_s3(self, local_file_path: str, s3_object_name: str) -> bool:
         # 지정 파일을 S3 버킷에 업로드
+        # 다시 시도해도 성공할 수 없는 오류(권한, 버킷 없음, 파일 없음 등)는 False 대신 PermanentUploadError를 발생시킴
         try:
             log.info(f"Uploading {local_file_path} to S3 bucket '{Config.AWS_S3_BUCKET_NAME}' as '{s3_object_name}'")
-            self.s3_client.upload_file(local_file_path, Config.AWS_S3_BUCKET_NAME, s3_object_name)
+            size = os.path.getsize(local_file_path)
+            started = time.monotonic()
+            self.s3_client.upload_file(local_file_path, Config.AWS_S3_BUCKET_NAME, s3_object_name,
+                                       Config=self.transfer_config, Callback=self._throttle)
+            self._record_throughput(size, time.monotonic() - started)
             log.info("S3에 성공적으로 업로드하였습니다.")
             return True
         
-        except FileNotFoundError:
+        except FileNotFoundError as e:
             log.error(f"S3 업로드 실패: 파일을 {local_file_path}에서 찾지 못하였습니다.")
-            return False
+            raise PermanentUploadError(str(e)) from e
         
         except (NoCredentialsError, PartialCredentialsError):
             log.error("S3 업로드 실패: AWS 인증서 확인 실패. 다시 구성해주세요.")
@@ -59,8 +191,81 @@ class AWSHandler:
         
         except Exception as e:
             log.error(f"S3에 업로드 중 오류가 발생하였습니다: {e}")
+            if is_permanent_error(e):
+                raise PermanentUploadError(str(e)) from e
             return False
         
+    def upload_bytes(self, data, s3_object_name: str) -> bool:
+        # 메모리의 데이터를 임시 파일 없이 S3 버킷에 업로드
+        try:
+            log.info(f"Uploading {len(data)} bytes to S3 bucket '{Config.AWS_S3_BUCKET_NAME}' as '{s3_object_name}'")
+            started = time.monotonic()
+            self.s3_client.upload_fileobj(MemoryviewReader(data), Config.AWS_S3_BUCKET_NAME, s3_object_name,
+                                          Config=self.transfer_config, Callback=self._throttle)
+            self._record_throughput(len(data), time.monotonic() - started)
+            log.info("S3에 성공적으로 업로드하였습니다.")
+            return True
+
+        except (NoCredentialsError, PartialCredentialsError):
+            log.error("S3 업로드 실패: AWS 인증서 확인 실패. 다시 구성해주세요.")
+            return False
+
+        except Exception as e:
+            log.error(f"S3에 업로드 중 오류가 발생하였습니다: {e}")
+            if is_permanent_error(e):
+                raise PermanentUploadError(str(e)) from e
+            return False
+
+    def record_upload(self, s3_object_name: str, size: int, sha256: str, meta: dict):
+        """업로드가 끝난 객체를 파티션 매니페스트에 기록하고, 올릴 때가 되었으면 매니페스트를 S3에 올립니다.
+        파티션이 없으면(평면 키 배치) 기록하지 않습니다."""
+        meta = dict(meta)
+        partition = meta.pop("partition", None)
+        if partition is None:
+            return
+        self.manifests.append(partition, {"key": s3_object_name, "size": size, "sha256": sha256,
+                                          "uploaded_at": time.strftime("%Y-%m-%dT%H:%M:%S"), **meta})
+        self.manifests.flush()
+
+    def flush_manifests(self):
+        """바뀐 파티션 매니페스트를 바로 S3에 올립니다. (종료 시)"""
+        self.manifests.flush(force=True)
+
+    def publish(self, topic: str, payload: dict, qos: int = 1) -> bool:
+        """MQTT 메시지를 토픽의 코덱(MQTT_TOPIC_CODECS, 기본 JSON)으로 발행합니다.
+        연결이 끊겨 있으면 QoS 1 메시지는 클라이언트가 보관했다가 재연결 후 전송합니다."""
+        try:
+            result = self.mqtt_client.publish(topic, codec_for_topic(topic).encode(payload), qos=qos)
+        except Exception as e:
+            log.error(f"MQTT 메시지 발행 중 오류 발생: {e} | 토픽: {topic}")
+            return False
+        if result.rc == mqtt.MQTT_ERR_NO_CONN and qos > 0:
+            log.info(f"MQTT 연결이 끊겨 있어 메시지를 보관했다가 재연결 후 전송합니다: '{topic}'")
+            return True
+        if result.rc != mqtt.MQTT_ERR_SUCCESS:
+            log.warning(f"MQTT 메시지를 발행하지 못했습니다. (rc={result.rc}, 토픽: {topic})")
+            return False
+        log.info(f"MQTT 메시지 발행: '{topic}'")
+        return True
+
+    def publish_confirmed(self, topic: str, payload: dict, qos: int = 1, timeout: float = None) -> bool:
+        """MQTT 메시지를 발행하고 브로커의 수신 확인(PUBACK)을 timeout 동안 기다립니다.
+        연결이 끊겨 있거나 확인을 받지 못하면 False를 반환하므로, 호출한 쪽이 메시지를 보관했다가 다시 보낼 수 있습니다."""
+        if not self.mqtt_client.is_connected():
+            return False
+        try:
+            data = codec_for_topic(topic).encode(payload)
+        except Exception as e:
+            log.error(f"MQTT 메시지를 직렬화하지 못했습니다: {e} | 토픽: {topic}")
+            return False
+        try:
+            result = self.mqtt_client.publish(topic, data, qos=qos)
+            result.wait_for_publish(timeout)
+        except Exception as e:
+            log.warning(f"MQTT 메시지를 발행하지 못했습니다: {e} | 토픽: {topic}")
+            return False
+        return result.is_published()
+
     def _on_mqtt_connect(self, client, userdata, flags, rc, properties):
         """MQTT 브로커에 연결되었을 때 실행되는 콜백 함수."""
         if rc == 0:
@@ -69,17 +274,35 @@ class AWSHandler:
             topic = "smartfarm/analysis/result"
             client.subscribe(topic)
             log.info(f"Subscribed to MQTT topic: '{topic}'")
+            for topic, (_, qos) in self.topic_handlers.items():
+                client.subscribe(topic, qos=qos)
+                log.info(f"Subscribed to MQTT topic: '{topic}'")
         
         else:
             log.error(f"Failed to connect to AWS IoT Core, return code {rc}")
 
+    def _handle_command(self, msg):
+        """원격 제어 명령을 처리하고 결과를 COMMAND_ACK_TOPIC으로 발행합니다."""
+        try:
+            command = codec_for_topic(msg.topic).decode(msg.payload)
+        except Exception as e:
+            log.warning(f"[Command] 명령을 해석하지 못했습니다: {e}")
+            command = None
+        response = self.command_router.execute(command, source="MQTT")
+        self.publish(Config.COMMAND_ACK_TOPIC, response, qos=1)
+
     def _on_mqtt_message(self, client, userdata, msg):
         """구독 중인 토픽에 메시지가 도착했을 때 실행되는 콜백 함수."""
+        if msg.topic in self.topic_handlers:
+            try:
+                self.topic_handlers[msg.topic][0](msg)
+            except Exception as e:
+                log.error(f"MQTT 메시지 처리 중 오류 발생: {e} | 토픽: {msg.topic}")
+            return
         try:
-            payload = msg.payload.decode('utf-8')
-            log.info(f"Received message from topic '{msg.topic}': {payload}")
-            
-            data = json.loads(payload)
+            data = codec_for_topic(msg.topic).decode(msg.payload)
+            log.info(f"Received message from topic '{msg.topic}': {data}")
+
             new_condition = data.get("status")
             
             if new_condition:
@@ -94,9 +317,12 @@ class AWSHandler:
     def start_mqtt_listener(self):
         # MQTT 리스너를 시작하여 분석 결과를 비동기적으로 수신 대기합니다.
         # mqtt_endpoint, root CA 인증서, device 인증서, 개인키 존재시 아래 주석 해제
+        # connect_async + loop_start: 처음 연결에 실패해도(부팅 직후 네트워크 없음 등) 네트워크 스레드가
+        # MQTT_RECONNECT_MIN ~ MQTT_RECONNECT_MAX 간격으로 계속 다시 연결하므로, 보관된 원격 측정도 연결되면 발행됨
         try:
             log.info("MQTT 브로커에 연겷을 시도합니다.")
-            self.mqtt_client.connect(self.mqtt_endpoint, 8883)
+            self.mqtt_client.reconnect_delay_set(min_delay=Config.MQTT_RECONNECT_MIN, max_delay=Config.MQTT_RECONNECT_MAX)
+            self.mqtt_client.connect_async(self.mqtt_endpoint, 8883)
             self.mqtt_client.loop_start() 
         
         except Exception as e:
@@ -104,9 +330,8 @@ class AWSHandler:
         log.warning("MQTT listener is currently disabled. Please configure certificates and endpoint in aws_handler.py.")
 
     def stop_mqtt_listener(self):
-        # MQTT 리스너를 중지합니다.
-        if self.mqtt_client.is_connected():
-            log.info("Stopping MQTT listener...")
-            self.mqtt_client.loop_stop()
-            self.mqtt_client.disconnect()
-            log.info("MQTT listener stopped.")
+        # MQTT 리스너를 중지합니다. 연결되지 않았더라도 재연결을 시도하는 네트워크 스레드는 멈춤
+        log.info("Stopping MQTT listener...")
+        self.mqtt_client.disconnect()
+        self.mqtt_client.loop_stop()
+        log.info("MQTT listener stopped.")
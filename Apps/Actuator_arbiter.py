@@ -0,0 +1,201 @@
+# =================================================================================
+# Actuator_arbiter.py
+# 여러 제어 주체(안전, 촬영, 수동, 자동)의 액추에이터 요청을 우선순위로 중재
+# 액추에이터별로 가장 높은 우선순위의 유효한 요청이 최종 출력이 되며,
+# 요청이 바뀐 액추에이터만 다시 계산하여 상태 파일과 아두이노에 즉시 반영한다.
+# =================================================================================
+
+import threading
+import heapq
+
+from Utility import log, system_clock
+import Config
+from _System_ import SystemState
+
+# 우선순위가 높은 순서
+SOURCES = ("SAFETY", "CAPTURE", "MANUAL", "AUTO")
+ACTUATORS = ("FAN", "PUMP", "HEAT_PANNEL", "GROW_LIGHT", "WHITE_LED")
+
+class ActuatorArbiter:
+    def __init__(self, state: SystemState, hardware=None, clock=None):
+        self.state = state
+        self.hardware = hardware        # 없으면 상태 파일에만 반영 (시뮬레이션 등)
+        self.clock = clock or system_clock
+        self.lock = threading.RLock()
+        self.stop_event = threading.Event()
+        self.wakeup_event = threading.Event()  # 새 만료 시각이 생기면 만료 스레드를 깨움
+        self.scheduler = None
+
+        # 요청이 없는 액추에이터의 기본값: 조명은 마지막 저장값, 나머지는 꺼짐
+        saved = state.get_all_data().get("ACTUATOR", {})
+        self.defaults = {name: 0 for name in ACTUATORS}
+        self.defaults["GROW_LIGHT"] = saved.get("GROW_LIGHT", 0)
+        self.defaults["WHITE_LED"] = saved.get("WHITE_LED", 0)
+
+        self.layers = {source: {} for source in SOURCES}   # source -> {액추에이터: (값, 만료 시각 또는 None)}
+        self.expiry_heap = []                               # (만료 시각, source, 액추에이터)
+        self.effective = dict(self.defaults)
+        self.owner = {name: "DEFAULT" for name in ACTUATORS}
+        self.over_temp = False
+
+        # 상태 파일에 최종 출력을 쓰는 것은 sync_state()에서 (생성자는 상태를 바꾸지 않음)
+        self.state.add_sample_listener(self._check_safety)
+
+    # --- 요청/해제 ---
+    def request(self, source: str, values: dict, ttl: float = None) -> dict:
+        """source 레이어에 액추에이터 값을 요청합니다. ttl초가 지나면 요청이 자동으로 해제됩니다.
+        반영 후의 최종 출력을 반환합니다."""
+        if source not in self.layers:
+            raise ValueError(f"알 수 없는 제어 주체입니다: {source}")
+        with self.lock:
+            now = self.clock.time()
+            expires_at = now + ttl if ttl else None
+            layer = self.layers[source]
+            changed = []
+            for name, value in values.items():
+                if name not in self.defaults:
+                    log.warning(f"[Arbiter] 알 수 없는 액추에이터 요청을 무시합니다: {name}")
+                    continue
+                if layer.get(name) == (value, expires_at):
+                    continue
+                layer[name] = (value, expires_at)
+                if expires_at is not None:
+                    heapq.heappush(self.expiry_heap, (expires_at, source, name))
+                changed.append(name)
+            if expires_at is not None and changed:
+                self._schedule_expiry(ttl)
+            return self._recompute(changed, now)
+
+    def release(self, source: str, names=None) -> dict:
+        """source 레이어의 요청을 해제합니다. names가 없으면 모든 요청을 해제합니다."""
+        with self.lock:
+            layer = self.layers[source]
+            names = list(layer) if names is None else [name for name in names if name in layer]
+            for name in names:
+                del layer[name]
+            return self._recompute(names, self.clock.time())
+
+    def set_default(self, values: dict) -> dict:
+        """요청이 없을 때 사용할 기본값을 변경합니다. (수동 모드에서의 제어)"""
+        with self.lock:
+            names = [name for name in values if name in self.defaults]
+            for name in names:
+                self.defaults[name] = values[name]
+            return self._recompute(names, self.clock.time())
+
+    def set_mode(self, mode: str) -> dict:
+        """운전 모드 변경을 반영합니다. 수동 모드로 바뀌면 자동 제어 요청을 해제하고 팬, 펌프, 히터를 끕니다.
+        모드가 실제로 바뀌었을 때만 호출해야 합니다. (같은 모드로 다시 호출하면 수동 설정값이 초기화됨)"""
+        with self.lock:
+            if mode == "MANUAL":
+                self.release("AUTO")
+                return self.set_default({"FAN": 0, "PUMP": 0, "HEAT_PANNEL": 0})
+            # 자동 모드로 돌아가면 남아 있는 수동 오버라이드를 해제하여 자동 제어가 바로 적용되도록 함
+            return self.release("MANUAL")
+
+    # --- 최종 출력 계산 ---
+    def _resolve(self, name: str, now: float):
+        for source in SOURCES:
+            claim = self.layers[source].get(name)
+            if claim and (claim[1] is None or claim[1] > now):
+                return claim[0], source
+        return self.defaults[name], "DEFAULT"
+
+    def _recompute(self, names, now: float) -> dict:
+        """names에 해당하는 액추에이터만 다시 계산하고, 바뀐 값이 있으면 즉시 반영합니다. (lock 보유 상태에서 호출)"""
+        changes = {}
+        for name in names:
+            value, source = self._resolve(name, now)
+            self.owner[name] = source
+            if self.effective[name] != value:
+                self.effective[name] = value
+                changes[name] = value
+        if changes:
+            self.state.update_actuators(changes)
+            if self.hardware:
+                self.hardware.send_actuators(self.effective)
+            log.debug(f"[Arbiter] 액추에이터 출력 변경: {changes}")
+        return dict(self.effective)
+
+    def expire(self) -> dict:
+        """만료된 요청을 해제하고 해당 액추에이터만 다시 계산합니다."""
+        with self.lock:
+            now = self.clock.time()
+            expired = set()
+            while self.expiry_heap and self.expiry_heap[0][0] <= now:
+                expires_at, source, name = heapq.heappop(self.expiry_heap)
+                claim = self.layers[source].get(name)
+                # 같은 액추에이터에 대한 이후 요청으로 갱신된 항목은 건너뜀
+                if claim and claim[1] == expires_at:
+                    del self.layers[source][name]
+                    expired.add(name)
+                    log.info(f"[Arbiter] {source}의 {name} 요청이 만료되었습니다.")
+            return self._recompute(expired, now)
+
+    def next_expiry(self):
+        """다음 만료까지 남은 시간(초)을 반환합니다. 만료 예정 요청이 없으면 None입니다."""
+        with self.lock:
+            if not self.expiry_heap:
+                return None
+            return max(0.0, self.expiry_heap[0][0] - self.clock.time())
+
+    def _schedule_expiry(self, ttl: float):
+        if self.scheduler:
+            self.scheduler.after(ttl, self.expire, name="arbiter_expire")
+        else:
+            self.wakeup_event.set()
+
+    # --- 안전 ---
+    def _check_safety(self):
+        """새 센서 샘플마다 과열 여부를 확인하여 히터를 차단하고 팬을 최대로 돌립니다."""
+        temp = float(self.state.get_all_data()["SENSOR"]["TEMP"])
+        if not self.over_temp and temp >= Config.SAFETY_MAX_TEMP:
+            self.over_temp = True
+            log.warning(f"[Arbiter] 온도 {temp}도가 안전 한계를 넘었습니다. 히터를 차단합니다.")
+            self.request("SAFETY", {"HEAT_PANNEL": 0, "FAN": 255})
+        elif self.over_temp and temp < Config.SAFETY_MAX_TEMP - Config.SAFETY_TEMP_HYSTERESIS:
+            self.over_temp = False
+            log.info(f"[Arbiter] 온도 {temp}도로 안전 범위에 돌아왔습니다. 안전 차단을 해제합니다.")
+            self.release("SAFETY")
+
+    def sync_state(self) -> dict:
+        """현재 최종 출력 전체를 상태 파일에 반영합니다. 이전 실행에서 남은 액추에이터 값을 정리할 때 사용합니다."""
+        with self.lock:
+            self.state.update_actuators(self.effective)
+            return dict(self.effective)
+
+    def snapshot(self) -> dict:
+        """최종 출력과 액추에이터별 결정 주체, 레이어별 요청을 반환합니다."""
+        with self.lock:
+            now = self.clock.time()
+            return {
+                "effective": dict(self.effective),
+                "owner": dict(self.owner),
+                "defaults": dict(self.defaults),
+                "layers": {source: {name: {"value": value, "expires_in": None if expires_at is None else round(expires_at - now, 1)}
+                                    for name, (value, expires_at) in layer.items()}
+                           for source, layer in self.layers.items()},
+            }
+
+    # --- 시작/정지 ---
+    def _expiry_thread(self):
+        while not self.stop_event.is_set():
+            self.wakeup_event.wait(self.next_expiry())
+            self.wakeup_event.clear()
+            try:
+                self.expire()
+            except Exception as e:
+                log.error(f"[Arbiter] 요청 만료 처리 중 오류 발생: {e}")
+
+    def start(self, scheduler=None):
+        log.info("액추에이터 중재기를 시작합니다.")
+        self.sync_state()
+        self.scheduler = scheduler
+        if scheduler:
+            return
+        threading.Thread(target=self._expiry_thread, daemon=True).start()
+
+    def stop(self):
+        log.info("액추에이터 중재기를 정지합니다.")
+        self.stop_event.set()
+        self.wakeup_event.set()
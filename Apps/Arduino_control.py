@@ -5,20 +5,33 @@
 import serial
 import serial.tools.list_ports
 import threading
-import time
+import math
 import json # JSON 형식은 아니지만, 혹시 모를 로깅을 위해 유지
 
-from Utility import log
+from Utility import log, system_clock
 import Config
 from _System_ import SystemState
+from Sensor_filter import SensorFilterPipeline
 
 class HardwareController:
-    def __init__(self, state: SystemState):
+    def __init__(self, state: SystemState, clock=None):
         self.state = state
+        self.clock = clock or system_clock
         self.ser = None
-        self.last_heartbeat_time = time.time()
+        self.last_heartbeat_time = self.clock.time()
         self.stop_event = threading.Event()
         self.reconnect_event = threading.Event()
+        self.write_lock = threading.Lock()  # 여러 스레드의 시리얼 쓰기 충돌 방지
+        self.sensor_interval_ms = None      # 아두이노가 응답한 현재 센서 전송 간격 (미확인 시 None)
+        self.sensor_filter = SensorFilterPipeline()
+        self.last_raw_sensor = None         # 필터 적용 전 마지막 원시 값 (디버깅용)
+        self.scheduler = None               # start(scheduler)로 지정되면 스레드 대신 스케줄러 사용
+        # 액추에이터 명령 적용 확인(ACK:)과 조도 즉시 측정(LIGHT:) 응답 대기용
+        self.response_condition = threading.Condition()
+        self.actuator_seq = 0               # 마지막으로 전송한 액추에이터 명령 번호
+        self.acked_seq = 0                  # 아두이노가 적용을 확인한 마지막 명령 번호
+        self.light_reading = None           # LIGHT? 요청에 대한 마지막 조도 응답 (lux)
+        self.light_count = 0                # 받은 조도 응답 수 (새 응답 판별용)
 
     # ... (_find_serial_port, connect, trigger_reconnect, start, stop 메서드는 이전과 동일) ...
     def _find_serial_port(self):
@@ -29,98 +42,195 @@ class HardwareController:
                 return port.device
         return None
     
+    def _try_connect(self) -> bool:
+        """시리얼 포트 연결을 한 번 시도합니다."""
+        port = Config.SERIAL_PORT or self._find_serial_port()
+        if port:
+            try:
+                self.ser = serial.Serial(port, Config.BAUD_RATE, timeout=1)
+                log.info(f"성공적으로 아두이노가 포트에서 연결되었습니다: {port}")
+                self.reconnect_event.clear()
+                self.last_heartbeat_time = self.clock.time()
+                self.sensor_interval_ms = None  # 아두이노 리셋 시 펌웨어 기본값으로 돌아감
+                with self.response_condition:
+                    self.acked_seq = self.actuator_seq  # 리셋 전에 보낸 명령의 응답은 오지 않음
+                return True
+            except serial.SerialException as e:
+                log.warning(f"{port}에 연결을 실패했습니다: {e}")
+        else:
+            log.warning("연결할 시리얼 포트를 찾지 못하였습니다.")
+        return False
+
     def connect(self):
         while not self.stop_event.is_set():
-            port = Config.SERIAL_PORT or self._find_serial_port()
-            if port:
-                try:
-                    self.ser = serial.Serial(port, Config.BAUD_RATE, timeout=1)
-                    log.info(f"성공적으로 아두이노가 포트에서 연결되었습니다: {port}")
-                    self.reconnect_event.clear()
-                    self.last_heartbeat_time = time.time()
-                    return True
-                except serial.SerialException as e:
-                    log.warning(f"{port}에 연결을 실패했습니다: {e}")
-            else:
-                log.warning("연결할 시리얼 포트를 찾지 못하였습니다.")
-            
+            if self._try_connect():
+                return True
             log.warning(f"{Config.RECONNECT_DELAY}초 후 재연결을 시도합니다.")
-            time.sleep(Config.RECONNECT_DELAY)
+            self.clock.sleep(Config.RECONNECT_DELAY)
         return False
 
+    def handle_line(self, line: str):
+        """아두이노로부터 받은 한 줄을 해석하여 상태를 처리합니다."""
+        try:
+            # ★★★ 핵심 수정 1: 텍스트 형식 파싱 ★★★
+            if line.startswith("SENSOR:"):
+                data_part = line[7:]  # "SENSOR:" 부분 제거
+                items = data_part.split(',')
+
+                if len(items) == 4:
+                    # 아두이노가 보내는 순서: TEMP, SOIL, HUMID, LIGHT
+                    raw_values = [float(item) for item in items]
+                    if not all(math.isfinite(value) for value in raw_values):
+                        raise ValueError("센서 값에 nan/inf가 포함되어 있습니다.")
+                    self.last_raw_sensor = raw_values
+                    filtered = self.sensor_filter.process(raw_values)
+
+                    current_state = self.state.update_sensors(filtered)
+                    log.debug(f"센서 값 수신 및 업데이트 완료: {current_state['SENSOR']} (원시 값: {raw_values})")
+                else:
+                    log.warning(f"수신한 센서 데이터 형식이 올바르지 않습니다: {line}")
+
+            elif line.startswith("HEARTBEAT:"):
+                self.last_heartbeat_time = self.clock.time()
+                log.debug("HeartBeat 신호를 수신하였습니다.")
+
+            elif line.startswith("RATE:"):
+                # 아두이노가 적용한 센서 전송 간격 응답
+                self.sensor_interval_ms = int(line[5:])
+                log.info(f"아두이노 센서 전송 간격이 {self.sensor_interval_ms}ms로 변경되었습니다.")
+
+            elif line.startswith("ACK:"):
+                # 아두이노가 액추에이터 명령을 적용했다는 응답
+                seq = int(line[4:])
+                with self.response_condition:
+                    self.acked_seq = max(self.acked_seq, seq)
+                    self.response_condition.notify_all()
+                log.debug(f"액추에이터 명령 {seq}번 적용 응답을 수신하였습니다.")
+
+            elif line.startswith("LIGHT:"):
+                # LIGHT? 요청에 대한 조도 즉시 측정 응답
+                lux = float(line[6:])
+                with self.response_condition:
+                    self.light_reading = lux
+                    self.light_count += 1
+                    self.response_condition.notify_all()
+
+        except ValueError as e:
+            log.warning(f"시리얼 데이터 처리 중 오류 발생: {e} | 원본 데이터: {line}")
+
+    def _read_once(self):
+        """수신 버퍼에 쌓인 줄을 모두 읽어 처리합니다."""
+        while not self.reconnect_event.is_set() and self.ser and self.ser.in_waiting:
+            try:
+                line = self.ser.readline().decode('utf-8').strip()
+            except UnicodeDecodeError as e:
+                log.warning(f"시리얼 데이터 처리 중 오류 발생: {e}")
+                continue
+            if line:
+                self.handle_line(line)
+
     def _read_thread_worker(self):
         """(스레드 1) 아두이노로부터 텍스트 데이터를 읽고 상태를 처리합니다."""
         while not self.stop_event.is_set():
             if self.reconnect_event.is_set():
-                time.sleep(1)
+                self.clock.sleep(1)
                 continue
+            try:
+                self._read_once()
+            except Exception as e:
+                log.warning(f"시리얼 데이터 수신 중 오류 발생: {e}")
+            self.clock.sleep(0.1)
+
+    def build_actuator_command(self, actuator_data: dict, seq: int = None) -> str:
+        # ★★★ 핵심 수정 2: 쉼표로 구분된 텍스트 형식으로 변경 ★★★
+        cmd_list = [
+            str(actuator_data.get("FAN", 0)),
+            str(actuator_data.get("PUMP", 0)),
+            str(actuator_data.get("HEAT_PANNEL", 0)),
+            str(actuator_data.get("GROW_LIGHT", 0)),
+            str(actuator_data.get("WHITE_LED", 0))
+        ]
+        if seq is not None:
+            cmd_list.append(str(seq))  # 아두이노가 적용 후 "ACK:<seq>"로 응답
+        return ','.join(cmd_list)
+
+    def send_actuators(self, actuator_data: dict) -> bool:
+        """액추에이터 명령을 주기를 기다리지 않고 즉시 전송합니다. 적용 여부는 wait_for_ack()로 확인합니다."""
+        with self.response_condition:
+            self.actuator_seq += 1
+            seq = self.actuator_seq
+        cmd_str = self.build_actuator_command(actuator_data, seq)
+        if self.send_line(cmd_str):
+            log.debug(f"액추에이터 명령 전송: {cmd_str}")
+            return True
+        return False
 
-            if self.ser and self.ser.in_waiting:
-                try:
-                    line = self.ser.readline().decode('utf-8').strip()
-                    if not line:
-                        continue
-                    
-                    # ★★★ 핵심 수정 1: 텍스트 형식 파싱 ★★★
-                    if line.startswith("SENSOR:"):
-                        data_part = line[7:]  # "SENSOR:" 부분 제거
-                        items = data_part.split(',')
-                        
-                        if len(items) == 4:
-                            current_state = self.state.get_all_data()
-                            # 아두이노가 보내는 순서: TEMP, SOIL, HUMID, LIGHT
-                            current_state["SENSOR"]["TEMP"] = float(items[0])
-                            current_state["SENSOR"]["SOIL"] = float(items[1])
-                            current_state["SENSOR"]["HUMID"] = float(items[2])
-                            current_state["SENSOR"]["LIGHT"] = float(items[3])
-                            
-                            self.state._write_state(current_state)
-                            log.debug(f"센서 값 수신 및 업데이트 완료: {current_state['SENSOR']}")
-                        else:
-                            log.warning(f"수신한 센서 데이터 형식이 올바르지 않습니다: {line}")
-
-                    elif line.startswith("HEARTBEAT:"):
-                        self.last_heartbeat_time = time.time()
-                        log.debug("HeartBeat 신호를 수신하였습니다.")
-
-                except (UnicodeDecodeError, ValueError) as e:
-                    log.warning(f"시리얼 데이터 처리 중 오류 발생: {e} | 원본 데이터: {line}")
-            
-            time.sleep(0.1)
+    def wait_for_ack(self, seq: int = None, timeout: float = None) -> bool:
+        """seq번(생략 시 마지막으로 전송한) 액추에이터 명령이 아두이노에 적용될 때까지 기다립니다."""
+        with self.response_condition:
+            if seq is None:
+                seq = self.actuator_seq
+            return self.response_condition.wait_for(lambda: self.acked_seq >= seq, timeout)
+
+    def read_light(self, timeout: float = None):
+        """아두이노에 조도 즉시 측정(LIGHT?)을 요청하고 응답(lux)을 반환합니다. 응답이 없으면 None을 반환합니다."""
+        with self.response_condition:
+            count = self.light_count
+        if not self.send_line("LIGHT?"):
+            return None
+        with self.response_condition:
+            if not self.response_condition.wait_for(lambda: self.light_count > count, timeout):
+                return None
+            return self.light_reading
+
+    def _write_once(self):
+        """최신 액추에이터 상태를 텍스트로 아두이노에 한 번 전송합니다."""
+        if not self.reconnect_event.is_set() and self.ser and self.ser.is_open:
+            try:
+                self.send_actuators(self.state.get_all_data()["ACTUATOR"])
+            except Exception as e:
+                log.warning(f"[아두이노] 액추에이터 전송에 실패하였습니다: {e}")
 
     def _write_thread_worker(self):
         """(스레드 2) 주기적으로 최신 액추에이터 상태를 텍스트로 아두이노에 전송합니다."""
         while not self.stop_event.is_set():
-            if not self.reconnect_event.is_set() and self.ser and self.ser.is_open:
-                try:
-                    actuator_data = self.state.get_all_data()["ACTUATOR"]
-                    
-                    # ★★★ 핵심 수정 2: 쉼표로 구분된 텍스트 형식으로 변경 ★★★
-                    cmd_list = [
-                        str(actuator_data.get("FAN", 0)),
-                        str(actuator_data.get("PUMP", 0)),
-                        str(actuator_data.get("HEAT_PANNEL", 0)),
-                        str(actuator_data.get("GROW_LIGHT", 0)),
-                        str(actuator_data.get("WHITE_LED", 0))
-                    ]
-                    
-                    cmd_str = ','.join(cmd_list) + "\n"
-                    self.ser.write(cmd_str.encode('utf-8'))
-                    log.debug(f"액추에이터 명령 전송: {cmd_str.strip()}")
-
-                except Exception as e:
-                    log.warning(f"[아두이노] 액추에이터 전송에 실패하였습니다: {e}")
-            
-            time.sleep(Config.CONTROL_INTERVAL)
+            self._write_once()
+            self.clock.sleep(Config.CONTROL_INTERVAL)
+
+    def send_line(self, line: str) -> bool:
+        """한 줄의 명령을 아두이노로 전송합니다. 연결되지 않은 경우 False를 반환합니다."""
+        if self.reconnect_event.is_set() or not (self.ser and self.ser.is_open):
+            return False
+        try:
+            with self.write_lock:
+                self.ser.write((line + "\n").encode('utf-8'))
+            return True
+        except Exception as e:
+            log.warning(f"[아두이노] 명령 전송에 실패하였습니다: {e} | 명령: {line}")
+            return False
+
+    def set_sensor_interval(self, interval_ms: int) -> bool:
+        """아두이노에 센서 전송 간격 변경을 요청합니다. 적용 여부는 RATE: 응답으로 확인합니다."""
+        return self.send_line(f"RATE:{int(interval_ms)}")
+
+    def _watchdog_once(self):
+        if not self.reconnect_event.is_set():
+            if self.clock.time() - self.last_heartbeat_time > Config.HEARTBEAT_TIMEOUT:
+                log.warning("지정된 시간 내에 HeartBeat이 수신되지 않았습니다. 재연결을 시작합니다.")
+                self.trigger_reconnect()
 
     def _watchdog_thread(self):
         """(스레드 3) Heartbeat를 감시하여 연결 상태를 확인합니다."""
         while not self.stop_event.is_set():
-            if not self.reconnect_event.is_set():
-                if time.time() - self.last_heartbeat_time > Config.HEARTBEAT_TIMEOUT:
-                    log.warning("지정된 시간 내에 HeartBeat이 수신되지 않았습니다. 재연결을 시작합니다.")
-                    self.trigger_reconnect()
-            time.sleep(1)
+            self._watchdog_once()
+            self.clock.sleep(1)
+
+    def _reconnect_job(self):
+        """(스케줄러 모드) 재연결을 한 번 시도하고, 실패하면 RECONNECT_DELAY 후 다시 예약합니다."""
+        if self.stop_event.is_set() or self._try_connect():
+            return
+        log.warning(f"{Config.RECONNECT_DELAY}초 후 재연결을 시도합니다.")
+        self.scheduler.after(Config.RECONNECT_DELAY, self._reconnect_job, name="serial_reconnect")
 
     def trigger_reconnect(self):
         if self.reconnect_event.is_set():
@@ -137,14 +247,24 @@ class HardwareController:
             finally:
                 self.ser = None
 
-        reconnect_thread = threading.Thread(target=self.connect, daemon=True)
-        reconnect_thread.start()
+        if self.scheduler:
+            self.scheduler.after(0, self._reconnect_job, name="serial_reconnect")
+        else:
+            reconnect_thread = threading.Thread(target=self.connect, daemon=True)
+            reconnect_thread.start()
 
-    def start(self):
+    def start(self, scheduler=None):
         log.info("하드웨어 컨트롤러를 시작합니다.")
         if not self.connect():
             log.error("초기 연결에 실패하였습니다. 프로그램을 종료합니다.")
             return
+        self.scheduler = scheduler
+        if scheduler:
+            scheduler.every(0.1, self._read_once, name="serial_read")
+            scheduler.every(Config.CONTROL_INTERVAL, self._write_once, name="serial_write")
+            scheduler.every(1, self._watchdog_once, name="serial_watchdog")
+            log.info("하드웨어 컨트롤러의 작업이 스케줄러에 등록되었습니다.")
+            return
         threading.Thread(target=self._read_thread_worker, daemon=True).start()
         threading.Thread(target=self._write_thread_worker, daemon=True).start()
         threading.Thread(target=self._watchdog_thread, daemon=True).start()
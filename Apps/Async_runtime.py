@@ -0,0 +1,282 @@
+# =================================================================================
+# Async_runtime.py
+# 모든 컴포넌트를 하나의 asyncio 이벤트 루프에서 실행하는 런타임 (RUNTIME_MODE = "ASYNC")
+# 시리얼 입출력, 자동 제어, 주기 촬영, MQTT, API 서버가 같은 루프를 공유하며
+# 촬영(rpicam-still)과 S3 업로드처럼 블로킹되는 작업만 executor에서 실행한다.
+# =================================================================================
+
+import asyncio
+import contextlib
+import signal
+from concurrent.futures import ThreadPoolExecutor
+
+import uvicorn
+
+from Utility import log
+import Config
+import API
+
+class _EmbeddedServer(uvicorn.Server):
+    """시그널 처리는 런타임이 담당하므로 uvicorn의 시그널 처리를 사용하지 않습니다."""
+    @contextlib.contextmanager
+    def capture_signals(self):
+        yield
+
+    def install_signal_handlers(self):
+        pass
+
+class AsyncMQTTAdapter:
+    """paho 클라이언트의 소켓을 이벤트 루프에 등록하여 loop_start() 스레드 없이 동작시킵니다."""
+    def __init__(self, client, loop: asyncio.AbstractEventLoop):
+        self.client = client
+        self.loop = loop
+        # connect()는 executor에서 호출되므로 루프 조작은 call_soon_threadsafe로 넘김
+        client.on_socket_open = lambda c, u, sock: loop.call_soon_threadsafe(self._on_open, sock)
+        client.on_socket_close = lambda c, u, sock: loop.call_soon_threadsafe(self._on_close, sock)
+        client.on_socket_register_write = lambda c, u, sock: loop.call_soon_threadsafe(self._on_register_write, sock)
+        client.on_socket_unregister_write = lambda c, u, sock: loop.call_soon_threadsafe(self._on_unregister_write, sock)
+
+    def _on_open(self, sock):
+        self.loop.add_reader(sock, self.client.loop_read)
+
+    def _on_close(self, sock):
+        self.loop.remove_reader(sock)
+        self.loop.remove_writer(sock)
+
+    def _on_register_write(self, sock):
+        self.loop.add_writer(sock, self.client.loop_write)
+
+    def _on_unregister_write(self, sock):
+        self.loop.remove_writer(sock)
+
+class AsyncRuntime:
+    def __init__(self, state, hardware, arbiter, auto_control, sampling, aws, camera, telemetry=None, state_sync=None):
+        self.state = state
+        self.hardware = hardware
+        self.arbiter = arbiter
+        self.auto_control = auto_control
+        self.sampling = sampling
+        self.aws = aws
+        self.camera = camera
+        self.telemetry = telemetry
+        self.state_sync = state_sync
+        self.stop_event = None
+        self.serial_lost = None
+        self.sample_event = None
+        self.line_buffer = bytearray()
+
+    # --- 시리얼 ---
+    def _on_serial_readable(self):
+        """시리얼 포트에 읽을 데이터가 있을 때 루프에서 호출됩니다."""
+        ser = self.hardware.ser
+        try:
+            self.line_buffer += ser.read(ser.in_waiting or 1)
+        except Exception as e:
+            log.warning(f"[Async] 시리얼 수신 중 오류 발생: {e}")
+            self.serial_lost.set()
+            return
+        while b"\n" in self.line_buffer:
+            raw, _, rest = self.line_buffer.partition(b"\n")
+            self.line_buffer = bytearray(rest)
+            try:
+                line = raw.decode("utf-8").strip()
+            except UnicodeDecodeError as e:
+                log.warning(f"시리얼 데이터 처리 중 오류 발생: {e}")
+                continue
+            if line:
+                self.hardware.handle_line(line)
+
+    async def _serial_task(self):
+        """연결, 수신 등록, 연결 끊김 시 재연결을 담당합니다."""
+        loop = asyncio.get_running_loop()
+        while True:
+            if not (self.hardware.ser and self.hardware.ser.is_open):
+                if not await loop.run_in_executor(None, self.hardware._try_connect):
+                    log.warning(f"{Config.RECONNECT_DELAY}초 후 재연결을 시도합니다.")
+                    await asyncio.sleep(Config.RECONNECT_DELAY)
+                    continue
+
+            fd = self.hardware.ser.fileno()
+            self.serial_lost.clear()
+            self.line_buffer.clear()
+            loop.add_reader(fd, self._on_serial_readable)
+            try:
+                await self.serial_lost.wait()
+            finally:
+                loop.remove_reader(fd)
+            log.info("재연결 과정을 시작합니다.")
+            self.hardware.reconnect_event.set()
+            try:
+                self.hardware.ser.close()
+            except Exception as e:
+                log.error(f"시리얼 포트 종료 중 오류 발생: {e}")
+            self.hardware.ser = None
+
+    async def _serial_write_task(self):
+        while True:
+            self.hardware._write_once()
+            await asyncio.sleep(Config.CONTROL_INTERVAL)
+
+    async def _watchdog_task(self):
+        while True:
+            await asyncio.sleep(1)
+            if self.hardware.ser and self.hardware.clock.time() - self.hardware.last_heartbeat_time > Config.HEARTBEAT_TIMEOUT:
+                log.warning("지정된 시간 내에 HeartBeat이 수신되지 않았습니다. 재연결을 시작합니다.")
+                self.serial_lost.set()
+
+    # --- 제어 ---
+    async def _arbiter_task(self):
+        """중재기의 만료된 요청을 정리합니다. 새 요청이 생길 수 있으므로 최대 1초마다 확인합니다."""
+        while True:
+            delay = None
+            try:
+                self.arbiter.expire()
+                delay = self.arbiter.next_expiry()
+            except Exception as e:
+                log.error(f"[Arbiter] 만료 요청 정리 중 오류 발생: {e}")
+            await asyncio.sleep(1 if delay is None else min(delay, 1))
+
+    async def _control_task(self):
+        auto = self.auto_control
+        if auto.trigger != "EVENT":
+            while True:
+                # 한 번의 오류로 작업이 끝나 자동 제어가 멈추지 않도록 매 실행마다 처리
+                try:
+                    auto._control_once()
+                except Exception as e:
+                    log.error(f"[Auto Control] Error in control loop: {e}")
+                await asyncio.sleep(auto.control_interval)
+
+        last_seq = self.state.sample_seq
+        while True:
+            try:
+                await asyncio.wait_for(self.sample_event.wait(), Config.CONTROL_FALLBACK_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self.sample_event.clear()
+            seq, sample_time = self.state.sample_seq, self.state.sample_time
+            is_new_sample = seq != last_seq
+            last_seq = seq
+            try:
+                auto._event_step(is_new_sample, sample_time)
+            except Exception as e:
+                log.error(f"[Auto Control] Error in control loop: {e}")
+
+    async def _sampling_task(self):
+        while True:
+            try:
+                self.sampling._sampling_once()
+            except Exception as e:
+                log.error(f"[Sampling] 샘플링 조절 중 오류 발생: {e}")
+            await asyncio.sleep(self.sampling.check_interval)
+
+    async def _capture_task(self):
+        while True:
+            # 촬영은 촬영 작업 스레드, S3 업로드는 업로드 큐의 작업 스레드가 담당
+            try:
+                self.camera.request_capture()
+            except Exception as e:
+                log.error(f"[Camera] 촬영 요청 중 오류 발생: {e}")
+            await asyncio.sleep(self.camera.capture_interval)
+
+    # --- MQTT ---
+    async def _mqtt_task(self):
+        loop = asyncio.get_running_loop()
+        client = self.aws.mqtt_client
+        AsyncMQTTAdapter(client, loop)
+        delay = 1
+        while True:
+            if client.socket() is None:
+                try:
+                    log.info("MQTT 브로커에 연결을 시도합니다.")
+                    await loop.run_in_executor(None, client.connect, self.aws.mqtt_endpoint, 8883)
+                    delay = 1
+                except Exception as e:
+                    log.error(f"MQTT connection failed: {e}. {delay}초 후 재시도합니다.")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 60)
+                    continue
+            client.loop_misc()  # keepalive 처리
+            await asyncio.sleep(1)
+
+    async def _manifest_task(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(Config.S3_MANIFEST_FLUSH_INTERVAL)
+            # S3 PUT은 블로킹되므로 executor에서 실행 (오류는 flush_pending이 기록)
+            await loop.run_in_executor(None, self.aws.manifests.flush_pending)
+
+    async def _telemetry_task(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(Config.TELEMETRY_WINDOW)
+            # 수신 확인(PUBACK)과 보관 파일 입출력을 기다리므로 executor에서 실행
+            try:
+                await loop.run_in_executor(None, self.telemetry.flush)
+            except Exception as e:
+                log.error(f"[Telemetry] 원격 측정 발행 중 오류 발생: {e}")
+
+    async def _state_sync_task(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # 수신 확인(PUBACK)을 기다리므로 executor에서 실행, 보고 요청(delta 반영, 수동 변경)이 오면 바로 보고
+            try:
+                await loop.run_in_executor(None, self.state_sync.sync_once)
+            except Exception as e:
+                log.error(f"[Shadow] 상태 동기화 중 오류 발생: {e}")
+            await loop.run_in_executor(None, self.state_sync.wait, Config.SHADOW_SYNC_INTERVAL)
+
+    # --- 실행/종료 ---
+    def request_stop(self):
+        log.info("강제 종료를 인식하였습니다. 종료를 시작합니다.")
+        self.stop_event.set()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=Config.ASYNC_EXECUTOR_WORKERS))
+        self.stop_event = asyncio.Event()
+        self.serial_lost = asyncio.Event()
+        self.sample_event = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.request_stop)
+        self.state.add_sample_listener(lambda: loop.call_soon_threadsafe(self.sample_event.set))
+
+        API.setup_api(self.state, self.hardware, self.camera, is_async=True, arbiter_instance=self.arbiter,
+                      command_router_instance=self.aws.command_router)
+        server = _EmbeddedServer(uvicorn.Config(API.app, host="0.0.0.0", port=8000))
+
+        log.info("asyncio 런타임을 시작합니다.")
+        self.arbiter.sync_state()
+        await loop.run_in_executor(None, self.camera.start_services)
+        tasks = [asyncio.create_task(coro) for coro in (
+            self._serial_task(), self._serial_write_task(), self._watchdog_task(), self._arbiter_task(),
+            self._control_task(), self._sampling_task(), self._capture_task(), self._mqtt_task(),
+            self._manifest_task(),
+        )]
+        if self.telemetry:
+            tasks.append(asyncio.create_task(self._telemetry_task()))
+        if self.state_sync:
+            tasks.append(asyncio.create_task(self._state_sync_task()))
+        api_task = asyncio.create_task(server.serve())
+
+        await self.stop_event.wait()
+
+        # API 서버부터 정상 종료시킨 뒤 나머지 작업을 취소
+        server.should_exit = True
+        await api_task
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.state_sync:
+            self.state_sync.stop()  # executor에서 대기 중인 보고 주기를 깨움
+
+        await loop.run_in_executor(None, self.camera.stop)
+        await loop.run_in_executor(None, self.aws.manifests.stop)
+        if self.telemetry:
+            await loop.run_in_executor(None, self.telemetry.stop)
+        if self.aws.mqtt_client.is_connected():
+            self.aws.mqtt_client.disconnect()
+        if self.hardware.ser and self.hardware.ser.is_open:
+            self.hardware.ser.close()
+        await loop.shutdown_default_executor()
+        log.info("모든 기능 정지. 이제 나가 주시길 바랍니다.")
@@ -2,80 +2,174 @@
 # Auto_control.py
 # 시스템의 자동 제어 로직 담당
 # 별도의 스레드에서 주기적 실행, 온도와 토양 습도 관리를 중점으로 한다.
+# CONTROL_TRIGGER가 "EVENT"이면 새 센서 샘플마다 한 번씩 실행한다.
 # =================================================================================
 
 import threading
-import time
-from Utility import log, PID
+from Utility import log, PID, system_clock
 import Config
 from _System_ import SystemState
 from Arduino_control import HardwareController
+from Actuator_arbiter import ActuatorArbiter
 
 class AutoController:
-    def __init__(self, state: SystemState, hardware: HardwareController):
+    def __init__(self, state: SystemState, hardware: HardwareController, arbiter: ActuatorArbiter, clock=None):
         self.state = state
         self.hardware = hardware # hardware 객체를 다시 사용합니다.
+        self.clock = clock or system_clock
+        self.arbiter = arbiter
         self.last_pump_time = 0
-        
+        # 자동 제어가 AUTO 레이어에 요청 중인 값 (다른 주체가 덮어써도 자동 제어의 판단은 이 값을 기준으로 함)
+        self.outputs = {"FAN": 0, "PUMP": 0, "HEAT_PANNEL": 0}
+
         current_data = self.state.get_all_data()
-        self.pid = PID(Config.PID_KP, Config.PID_KI, Config.PID_KD, current_data["TARGET"]["TARGET_TEMP"])
-        
+        self.pid = PID(Config.PID_KP, Config.PID_KI, Config.PID_KD, current_data["TARGET"]["TARGET_TEMP"], self.clock)
+
         self.stop_event = threading.Event()
         self.control_interval = Config.CONTROL_INTERVAL
+        self.trigger = Config.CONTROL_TRIGGER
+
+        # 샘플 수신 ~ 액추에이터 반영까지의 지연 통계 (초)
+        self.latency_stats = {"count": 0, "last": 0.0, "mean": 0.0, "max": 0.0}
+        self.is_stale = False
+
+    def _control_step(self, current_data: dict, fresh: bool = True):
+        """제어 1회분을 계산하여 중재기의 AUTO 레이어에 요청합니다. current_data["ACTUATOR"]는 최종 출력으로 갱신됩니다.
+        fresh가 False이면 새 센서 값이 없으므로 PID 계산과 급수 시작은 건너뛰고 펌프 정지만 처리합니다."""
+        sensors = current_data["SENSOR"]
+        targets = current_data["TARGET"]
+        outputs = dict(self.outputs)
+
+        # --- 온도 제어 ---
+        if fresh:
+            self.pid.setpoint = float(targets["TARGET_TEMP"])
+            pid_output = self.pid.compute(float(sensors["TEMP"]))
+
+            if pid_output > 2:
+                outputs["FAN"] = 0
+                outputs["HEAT_PANNEL"] = 1
+            elif pid_output < -2:
+                outputs["FAN"] = 200
+                outputs["HEAT_PANNEL"] = 0
+            else:
+                outputs["FAN"] = 0
+                outputs["HEAT_PANNEL"] = 0
+
+        # --- 토양 습도 제어 (non-blocking 방식) ---
+        current_time = self.clock.time()
+        is_pumping = outputs["PUMP"] > 0
+
+        if fresh and not is_pumping and float(sensors["SOIL"]) < float(targets["TARGET_SOIL_MOISTURE"]) and (current_time - self.last_pump_time > 10):
+            log.info("[Auto Control] Soil moisture low. Activating PUMP.")
+            outputs["PUMP"] = 160
+            self.last_pump_time = current_time
+
+        elif is_pumping and (current_time - self.last_pump_time > 2):
+            log.info("[Auto Control] Stopping PUMP.")
+            outputs["PUMP"] = 0
+
+        # 바뀐 액추에이터만 중재기를 거쳐 상태 파일과 아두이노에 즉시 반영
+        self.outputs = outputs
+        current_data["ACTUATOR"] = self.arbiter.request("AUTO", outputs)
+
+    def _record_latency(self, sample_time: float):
+        latency = self.clock.time() - sample_time
+        stats = self.latency_stats
+        stats["count"] += 1
+        stats["last"] = latency
+        stats["mean"] += (latency - stats["mean"]) / stats["count"]
+        stats["max"] = max(stats["max"], latency)
+        log.debug(f"[Auto Control] 샘플 수신 후 제어 반영까지 {latency * 1000:.1f}ms")
+
+    def _release(self):
+        """자동 모드가 아닐 때 AUTO 레이어의 요청을 해제합니다."""
+        self.outputs = {name: 0 for name in self.outputs}
+        self.arbiter.release("AUTO")
+
+    def _control_once(self):
+        current_data = self.state.get_all_data()
+
+        if current_data.get("MODE") == "AUTO":
+            self._control_step(current_data)
+        else:
+            self._release()
 
     def _control_loop_worker(self):
         while not self.stop_event.is_set():
             try:
-                current_data = self.state.get_all_data()
-                
-                if current_data.get("MODE") != "AUTO":
-                    time.sleep(self.control_interval)
-                    continue
-
-                sensors = current_data["SENSOR"]
-                targets = current_data["TARGET"]
-                
-                # --- 온도 제어 ---
-                self.pid.setpoint = float(targets["TARGET_TEMP"])
-                pid_output = self.pid.compute(float(sensors["TEMP"]))
-
-                if pid_output > 2:
-                    current_data["ACTUATOR"]["FAN"] = 0
-                    current_data["ACTUATOR"]["HEAT_PANNEL"] = 1
-                elif pid_output < -2:
-                    current_data["ACTUATOR"]["FAN"] = 200
-                    current_data["ACTUATOR"]["HEAT_PANNEL"] = 0
-                else:
-                    current_data["ACTUATOR"]["FAN"] = 0
-                    current_data["ACTUATOR"]["HEAT_PANNEL"] = 0
-                
-                # --- 토양 습도 제어 (non-blocking 방식) ---
-                current_time = time.time()
-                is_pumping = current_data["ACTUATOR"].get("PUMP", 0) > 0
-
-                if not is_pumping and float(sensors["SOIL"]) < float(targets["TARGET_SOIL_MOISTURE"]) and (current_time - self.last_pump_time > 10):
-                    log.info("[Auto Control] Soil moisture low. Activating PUMP.")
-                    current_data["ACTUATOR"]["PUMP"] = 160
-                    self.last_pump_time = current_time
-                
-                elif is_pumping and (current_time - self.last_pump_time > 2):
-                    log.info("[Auto Control] Stopping PUMP.")
-                    current_data["ACTUATOR"]["PUMP"] = 0
-                
-                # ★★★ 핵심 수정: 변경된 모든 내용을 파일에 한 번에 저장 ★★★
-                self.state._write_state(current_data)
+                self._control_once()
+            except Exception as e:
+                log.error(f"[Auto Control] Error in control loop: {e}")
+
+            self.clock.sleep(self.control_interval)
+
+    def _event_step(self, is_new_sample: bool, sample_time):
+        """새 샘플(또는 대체 타이머) 하나에 대해 제어를 실행합니다."""
+        current_data = self.state.get_all_data()
+        if current_data.get("MODE") != "AUTO":
+            self._release()
+            return
 
+        # 오래된 센서 값으로 히터/팬을 계속 구동하지 않도록 안전 상태로 전환
+        is_stale = sample_time is None or self.clock.time() - sample_time > Config.CONTROL_MAX_STALENESS
+        if is_stale and not self.is_stale:
+            log.warning("[Auto Control] 센서 값이 오래되어 히터와 팬을 정지합니다.")
+        self.is_stale = is_stale
+        if is_stale:
+            self.outputs["FAN"] = 0
+            self.outputs["HEAT_PANNEL"] = 0
+
+        self._control_step(current_data, fresh=is_new_sample and not is_stale)
+        if is_new_sample and not is_stale:
+            self._record_latency(sample_time)
+
+    def _event_loop_worker(self):
+        """새 센서 샘플마다 한 번 제어를 실행합니다. 샘플이 없으면 CONTROL_FALLBACK_INTERVAL마다 실행합니다."""
+        last_seq = self.state.sample_seq
+        while not self.stop_event.is_set():
+            seq, sample_time = self.state.wait_for_sample(last_seq, Config.CONTROL_FALLBACK_INTERVAL)
+            is_new_sample = seq != last_seq
+            last_seq = seq
+            if self.stop_event.is_set():
+                break
+
+            try:
+                self._event_step(is_new_sample, sample_time)
             except Exception as e:
                 log.error(f"[Auto Control] Error in control loop: {e}")
 
-            time.sleep(self.control_interval)
+    def _event_job(self):
+        """(스케줄러 모드) 새 샘플 알림 또는 대체 타이머로 실행됩니다. 최근에 실행했다면 대체 타이머 실행은 건너뜁니다."""
+        with self.step_lock:
+            seq, sample_time = self.state.sample_seq, self.state.sample_time
+            now = self.clock.time()
+            is_new_sample = seq != self._last_seq
+            if not is_new_sample and now - self._last_run_time < Config.CONTROL_FALLBACK_INTERVAL:
+                return
+            self._last_seq = seq
+            self._last_run_time = now
+            self._event_step(is_new_sample, sample_time)
+
+    def get_latency_stats(self) -> dict:
+        return dict(self.latency_stats)
 
-    def start(self):
-        log.info("자동 제어 스레드를 시작합니다.")
-        threading.Thread(target=self._control_loop_worker, daemon=True).start()
+    def start(self, scheduler=None):
+        log.info(f"자동 제어 스레드를 시작합니다. (실행 방식: {self.trigger})")
+        if scheduler:
+            if self.trigger == "EVENT":
+                self.step_lock = threading.Lock()
+                self._last_seq, self._last_run_time = self.state.sample_seq, self.clock.time()
+                self.state.add_sample_listener(lambda: scheduler.after(0, self._event_job, name="auto_control_sample"))
+                scheduler.every(Config.CONTROL_FALLBACK_INTERVAL, self._event_job, name="auto_control_fallback")
+            else:
+                scheduler.every(self.control_interval, self._control_once, name="auto_control")
+            log.info("자동 제어 작업이 스케줄러에 등록되었습니다.")
+            return
+        worker = self._event_loop_worker if self.trigger == "EVENT" else self._control_loop_worker
+        threading.Thread(target=worker, daemon=True).start()
         log.info("자동 제어가 진행중입니다.")
 
     def stop(self):
         log.info("자동 제어를 정지합니다.")
         self.stop_event.set()
-        log.info("자동 제어가 정지되었습니다.")
\ No newline at end of file
+        log.info("자동 제어가 정지되었습니다.")
@@ -1,68 +1,134 @@
 import threading
-import time
 import subprocess
 import os
+import time
 from datetime import datetime
-from Utility import log
+from Utility import log, system_clock
+import Config
 from AWS_control import AWSHandler
 from Arduino_control import HardwareController
+from Actuator_arbiter import ActuatorArbiter
+from Camera_backend import make_camera_backend, OneShotCamera, CameraError
+from Upload_queue import UploadQueue
+from Capture_jobs import CaptureJobManager
+from Image_processing import ImageProcessor
+from Image_hash import DuplicateFilter
+from Image_store import ImageStore
+from Image_bundle import ImageBundler
+from Storage_layout import object_key, partition_of
 from _System_ import SystemState
 
 class CameraHandler:
-    def __init__(self, state: SystemState, hardware: HardwareController, aws: AWSHandler):
+    def __init__(self, state: SystemState, hardware: HardwareController, aws: AWSHandler, arbiter: ActuatorArbiter, clock=None):
         self.state = state
+        self.clock = clock or system_clock
         self.hardware = hardware
+        self.arbiter = arbiter
         self.aws = aws
         self.stop_event = threading.Event()
         self.capture_interval = 300  # 5분
 
-        home_dir = os.path.expanduser("~")
-        self.camera_command_path = os.path.join(home_dir, "rpicam-apps/build/apps/rpicam-still")
+        self.camera = make_camera_backend()
+        self.fallback_camera = OneShotCamera()  # 상주 프로세스가 응답하지 않을 때 사용
+        self.camera_command_path = self.camera.command_path
+        self.upload_queue = UploadQueue(aws)
+        # 묶음 업로드 모드에서는 사진을 모아 tar 하나로 업로드 (단건 모드에서는 None)
+        self.bundler = ImageBundler(self.upload_queue) if Config.UPLOAD_MODE == "BUNDLE" else None
+        self.in_memory = Config.CAMERA_OUTPUT == "MEMORY"   # 임시 파일 없이 메모리로 촬영/업로드
+        self.image_processor = ImageProcessor()  # 업로드 전 축소/잘라내기 (별도 프로세스)
+        self.duplicate_filter = DuplicateFilter()  # 최근 사진과 거의 같은 사진은 업로드하지 않음
+        self.image_store = ImageStore()  # 최근 사진을 로컬에 보관 (API에서 바로 제공)
+        # 주기 촬영과 사용자 요청 촬영 모두 이 관리자를 거쳐 한 번에 하나씩 실행
+        self.capture_jobs = CaptureJobManager(self.capture_and_upload)
+
+    def request_capture(self, shots: int = 1, source: str = "PERIODIC"):
+        """촬영 작업을 요청합니다. (작업, 기존 대기 작업에 합쳐졌는지 여부)를 반환합니다."""
+        return self.capture_jobs.submit(shots, source)
 
     def _capture_loop(self):
-        """5분마다 사진 촬영 및 업로드를 반복하는 메인 루프입니다."""
+        """5분마다 사진 촬영 및 업로드를 요청하는 메인 루프입니다."""
         while not self.stop_event.is_set():
-            self.capture_and_upload()
+            self.request_capture()
             self.stop_event.wait(self.capture_interval)
 
-    def capture_and_upload(self):
-        """조명 상태를 저장 및 복원하며 안전하게 사진을 촬영하고 업로드합니다."""
-        log.info("사진 촬영 시퀀스를 시작합니다...")
-
-        # 1. 현재 조명 상태를 파일에서 직접 읽어와 저장
-        current_data = self.state.get_all_data()
-        original_actuators = current_data.get("ACTUATOR", {})
-        original_grow_light = original_actuators.get("GROW_LIGHT", 0)
-        original_white_led = original_actuators.get("WHITE_LED", 0)
-        log.info(f"촬영 전 조명 상태 저장: 생장등={original_grow_light}, 백색등={original_white_led}")
+    def _capture_still(self, output_path: str) -> str:
+        """설정된 백엔드로 한 장을 촬영합니다. 상주 프로세스가 실패하면 단발 실행으로 다시 촬영합니다."""
+        try:
+            return self.camera.capture(output_path)
+        except CameraError as e:
+            log.warning(f"{self.camera.name} 카메라 촬영 실패: {e} | 단발 실행으로 다시 촬영합니다.")
+            return self.fallback_camera.capture(output_path)
 
-        local_filepath = ""
+    def _capture_still_bytes(self) -> bytes:
+        """설정된 백엔드로 한 장을 촬영하여 JPEG 바이트로 받습니다. 임시 파일을 만들지 않습니다."""
         try:
-            # 2. 사진 촬영을 위한 조명으로 변경 (*** 여기가 수정된 부분 ***)
-            # send_command 대신 state.update_values 사용
-            log.info("사진 촬영용 조명으로 변경합니다...")
-            update_data_for_capture = {
-                "ACTUATOR": {
-                    "GROW_LIGHT": 0,
-                    "WHITE_LED": 1
-                }
-            }
-            self.state.update_values(update_data_for_capture)
-            time.sleep(2)  # 조명이 안정화되고 Arduino가 상태를 반영할 때까지 대기
+            return self.camera.capture_bytes()
+        except CameraError as e:
+            log.warning(f"{self.camera.name} 카메라 촬영 실패: {e} | 단발 실행으로 다시 촬영합니다.")
+            return self.fallback_camera.capture_bytes()
+
+    def _wait_for_capture_light(self) -> bool:
+        """촬영 조명 명령이 아두이노에 적용되고 조도가 백색등 밝기로 안정될 때까지 기다립니다.
+        시간 안에 확인되지 않아도 촬영은 진행하며, 안정이 확인되었는지 여부를 반환합니다."""
+        if self.hardware is None:
+            return False
+        started = time.monotonic()
+
+        # 1) 조명 명령 적용 확인: 중재기가 요청 즉시 전송한 명령(또는 그 이후 명령)의 ACK
+        if not self.hardware.wait_for_ack(timeout=Config.CAPTURE_ACK_TIMEOUT):
+            log.warning(f"촬영 조명 명령의 적용 응답이 {Config.CAPTURE_ACK_TIMEOUT}초 안에 오지 않았습니다.")
 
-            # 3. 사진 촬영
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{timestamp}.jpg"
-            local_filepath = f"/tmp/{filename}"
+        # 2) 조도 안정 확인: 최근 측정값이 모두 최소 조도 이상이고 변화가 허용 범위 이내
+        deadline = started + Config.CAPTURE_LIGHT_TIMEOUT
+        readings = []
+        while time.monotonic() < deadline:
+            lux = self.hardware.read_light(timeout=max(0.0, deadline - time.monotonic()))
+            if lux is not None:
+                readings = (readings + [lux])[-Config.CAPTURE_LIGHT_SAMPLES:]
+                if (len(readings) == Config.CAPTURE_LIGHT_SAMPLES
+                        and min(readings) >= Config.CAPTURE_LIGHT_MIN_LUX
+                        and max(readings) - min(readings) <= Config.CAPTURE_LIGHT_TOLERANCE * max(readings)):
+                    log.info(f"촬영 조명이 안정되었습니다: {lux:.0f} lux ({(time.monotonic() - started) * 1000:.0f}ms)")
+                    return True
+            self.clock.sleep(Config.CAPTURE_LIGHT_POLL)
+
+        log.warning(f"조도가 {Config.CAPTURE_LIGHT_TIMEOUT}초 안에 안정되지 않았습니다. 그대로 촬영합니다. (최근 측정값: {readings})")
+        return False
+
+    def capture_and_upload(self, shots: int = 1):
+        """촬영용 조명을 CAPTURE 레이어로 요청한 상태에서 사진을 촬영하고, 조명을 바로 복원한 뒤 업로드 큐에 넘깁니다.
+        shots가 2 이상이면 조명을 유지한 채 연속으로 촬영합니다. 업로드 큐에 넘긴 S3 객체 이름 목록을 반환합니다.
+        동시에 실행되지 않도록 capture_jobs를 통해 호출합니다."""
+        log.info("사진 촬영 시퀀스를 시작합니다...")
 
-            command = [self.camera_command_path, "-o", local_filepath, "-t", "500", "--width", "1920", "--height", "1080", "--nopreview"]
-            log.info(f"카메라 촬영 실행: {' '.join(command)}")
-            subprocess.run(command, check=True, capture_output=True, text=True)
-            log.info(f"사진 촬영 성공: {local_filepath}")
+        local_filepaths = []
+        sensors = {}
+        captured_at = datetime.now()
+        captured = []   # 메모리 촬영 시 (파일 이름, JPEG 바이트)
+        try:
+            # 1~2. 사진 촬영을 위한 조명으로 변경
+            # CAPTURE 레이어는 수동/자동 제어보다 우선하므로 촬영 중에 덮어써지지 않으며, 아두이노에 즉시 전송됨
+            # (프로세스가 중간에 멈춰도 CAPTURE_LIGHT_TTL 후에는 자동으로 원래 조명으로 돌아감)
+            log.info("사진 촬영용 조명으로 변경합니다...")
+            self.arbiter.request("CAPTURE", {"GROW_LIGHT": 0, "WHITE_LED": 1}, ttl=Config.CAPTURE_LIGHT_TTL)
+            self._wait_for_capture_light()  # 명령 적용 응답과 조도 안정을 확인한 뒤 촬영
 
-            # 4. S3에 업로드
-            s3_object_name = f"images/{filename}"
-            self.aws.upload_to_s3(local_filepath, s3_object_name)
+            # 3. 사진 촬영 (촬영 당시 센서 값을 사진과 함께 보관)
+            sensors = self.state.get_all_data()["SENSOR"]
+            captured_at = datetime.now()
+            timestamp = captured_at.strftime("%Y%m%d_%H%M%S")
+            filenames = [f"{timestamp}.jpg"] if shots <= 1 else [f"{timestamp}_{i + 1}.jpg" for i in range(shots)]
+            for filename in filenames:
+                started = time.monotonic()
+                if self.in_memory:
+                    data = self._capture_still_bytes()
+                    captured.append((filename, data))
+                    log.info(f"사진 촬영 성공: {filename} ({len(data)} bytes, {(time.monotonic() - started) * 1000:.0f}ms)")
+                    continue
+                local_filepath = f"/tmp/{filename}"
+                self._capture_still(local_filepath)
+                local_filepaths.append(local_filepath)
+                log.info(f"사진 촬영 성공: {local_filepath} ({(time.monotonic() - started) * 1000:.0f}ms)")
 
         except FileNotFoundError:
             log.error(f"카메라 실행 파일을 찾을 수 없습니다: '{self.camera_command_path}'")
@@ -71,29 +137,116 @@ class CameraHandler:
         except Exception as e:
             log.error(f"사진 촬영 시퀀스 중 예기치 않은 오류 발생: {e}")
         finally:
-            # 5. 조명을 원래 상태로 복원 (가장 중요!) (*** 여기가 수정된 부분 ***)
-            log.info(f"조명 상태를 원래대로 복원합니다: 생장등={original_grow_light}, 백색등={original_white_led}")
-            update_data_for_restore = {
-                "ACTUATOR": {
-                    "GROW_LIGHT": original_grow_light,
-                    "WHITE_LED": original_white_led
-                }
+            # 4. 노출이 끝나면 바로 조명을 원래 상태로 복원 (가장 중요!)
+            # 촬영 중에 바뀐 수동 설정이 있으면 그 값으로 돌아감
+            restored = self.arbiter.release("CAPTURE")
+            log.info(f"조명 상태를 원래대로 복원합니다: 생장등={restored['GROW_LIGHT']}, 백색등={restored['WHITE_LED']}")
+
+        # 5. 조명을 복원한 뒤 파생 이미지를 만들어 업로드 큐에 넘김 (S3 업로드와 임시 파일 삭제는 업로드 작업 스레드가 담당)
+        object_names = []
+        # 연속 촬영은 일부러 여러 장을 요청한 것이므로 중복 검사를 하지 않음
+        dedup = shots <= 1
+        for filename, data in captured:
+            object_names += self._submit_image(filename, data, sensors, dedup, captured_at)
+        for local_filepath in local_filepaths:
+            object_names += self._submit_image(os.path.basename(local_filepath), local_filepath, sensors, dedup, captured_at)
+        if self.bundler:
+            self.bundler.flush_if_due()
+        log.info("사진 촬영 시퀀스를 종료합니다.")
+        return object_names
+
+    def _submit_image(self, filename: str, source, sensors: dict, dedup: bool = True, captured_at: datetime = None) -> list:
+        """원본(JPEG 바이트 또는 임시 파일 경로)과 파생 이미지를 로컬 저장소에 보관하고 업로드 큐에 넘긴 뒤,
+        넘긴 S3 객체 키 목록을 반환합니다. 파생 이미지를 만들지 못했으면 원본을 images/에 그대로 올립니다.
+        S3 키는 S3_KEY_LAYOUT에 따라 만들고, 날짜 파티션을 켰으면 업로드가 끝난 뒤 그 파티션의 매니페스트에 기록됩니다.
+        최근 사진과 거의 같으면 올리지 않고, 참조하는 사진의 객체 키 목록을 반환합니다."""
+        is_file = isinstance(source, str)
+        captured_at = captured_at or datetime.now()
+        hashes = self.image_processor.hashes(filename, source)
+        duplicate = self.duplicate_filter.find_duplicate(hashes) if hashes and dedup else None
+        if duplicate:
+            self.duplicate_filter.record_reference(filename, duplicate)
+            self.image_store.put_reference(filename, duplicate["filename"], sensors, captured_at)
+            if is_file:
+                os.remove(source)
+            return duplicate["object_names"]
+
+        derivatives = self.image_processor.process(filename, source)
+        # (변형 이름, 평면 경로, 데이터) - 평면 경로는 묶음 안의 경로로, S3 키는 object_key로 만듦
+        uploads = list(derivatives)
+        variants = {name: data for name, _, data in derivatives}
+        if not derivatives or Config.IMAGE_UPLOAD_ORIGINAL:
+            uploads.append(("original", f"images/original/{filename}" if derivatives else f"images/{filename}", source))
+        if not derivatives or Config.IMAGE_STORE_ORIGINAL:
+            variants["original"] = source
+
+        if self.bundler:
+            keys = self.bundler.add(filename, [(name, data) for _, name, data in uploads], sensors, captured_at)
+        else:
+            keys = [object_key(name, captured_at) for _, name, _ in uploads]
+
+        # 업로드 작업 스레드가 임시 파일을 지우기 전에 로컬 저장소에 복사
+        self.image_store.put(filename, variants, sensors, keys, captured_at)
+
+        object_names = []
+        if self.bundler:
+            object_names = keys
+        else:
+            meta = {
+                "filename": filename,
+                "captured_at": captured_at.isoformat(timespec="seconds"),
+                "ahash": f"{hashes[0]:016x}" if hashes else None,
+                "dhash": f"{hashes[1]:016x}" if hashes else None,
+                "sensors": sensors,
             }
-            self.state.update_values(update_data_for_restore)
-            
-            # 임시 파일 삭제
-            if local_filepath and os.path.exists(local_filepath):
-                os.remove(local_filepath)
-                log.info(f"임시 파일 삭제: {local_filepath}")
-            
-            log.info("사진 촬영 시퀀스를 종료합니다.")
-
-    def start(self):
+            for (variant, name, data), key in zip(uploads, keys):
+                item_meta = dict(meta, partition=partition_of(name, captured_at), variant=variant)
+                if isinstance(data, str):
+                    submitted = self.upload_queue.submit(data, key, meta=item_meta)
+                else:
+                    submitted = self.upload_queue.submit_bytes(data, key, meta=item_meta)
+                if submitted:
+                    object_names.append(key)
+        # 묶음에는 데이터를 읽어 넣었고, 업로드 큐에 넘기지 않은 임시 파일은 더 이상 필요 없음
+        if is_file and (self.bundler or all(data is not source for _, _, data in uploads)):
+            os.remove(source)
+
+        if hashes and object_names:
+            self.duplicate_filter.remember(filename, hashes, object_names)
+        return object_names
+
+    def start(self, scheduler=None):
         log.info("주기적 사진 촬영 스레드를 시작합니다.")
+        self.start_services()
+        if scheduler:
+            scheduler.every(self.capture_interval, self.request_capture, name="camera_capture", delay=0)
+            log.info("사진 촬영 작업이 스케줄러에 등록되었습니다.")
+            return
         threading.Thread(target=self._capture_loop, daemon=True).start()
         log.info("사진 촬영 스레드가 실행 중입니다.")
 
+    def start_services(self):
+        """카메라 프로세스, 이미지 처리 프로세스, 업로드 작업 스레드, 촬영 작업 스레드를 시작합니다."""
+        self.start_camera()
+        self.image_processor.start()
+        self.upload_queue.start()
+        self.capture_jobs.start()
+
+    def start_camera(self):
+        """상주 카메라 프로세스를 미리 띄워 첫 촬영 전에 자동 노출이 수렴하도록 합니다."""
+        try:
+            self.camera.start()
+        except OSError as e:
+            log.error(f"카메라 프로세스를 시작하지 못했습니다: {e}")
+
     def stop(self):
         log.info("사진 촬영 스레드를 정지합니다.")
         self.stop_event.set()
+        self.capture_jobs.stop()
+        self.camera.stop()
+        self.image_processor.stop()
+        if self.bundler:
+            self.bundler.flush()    # 모으던 사진은 스풀에 넘겨 다음 실행 시 업로드
+        self.upload_queue.stop()
+        self.image_store.flush()
         log.info("사진 촬영 스레드가 정지되었습니다.")
\ No newline at end of file
@@ -0,0 +1,308 @@
+# =================================================================================
+# Camera_backend.py
+# rpicam-still 실행 방식별 촬영 백엔드
+# ONESHOT: 촬영할 때마다 rpicam-still을 새로 실행 (카메라 초기화와 자동 노출을 매번 수행)
+# PERSISTENT: rpicam-still을 "-t 0" 상태로 계속 띄워 두고 시그널/키 입력으로 즉시 촬영
+# CAMERA_OUTPUT이 "MEMORY"이면 "-o -"로 표준 출력에 JPEG를 받아 임시 파일 없이 메모리로 처리한다.
+# Config.CAMERA_COMMAND_PATH를 Fake_camera.py로 지정하면 카메라 없이 시험할 수 있다.
+# =================================================================================
+
+import os
+import queue
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+
+from Utility import log
+import Config
+
+class CameraError(Exception):
+    """카메라 프로세스가 응답하지 않거나 사진 파일을 만들지 못했을 때 발생합니다."""
+
+class JpegStreamSplitter:
+    """연속된 JPEG 바이트 스트림을 마커 구조에 따라 한 장씩 잘라냅니다.
+    EXIF 썸네일 안의 SOI/EOI는 세그먼트 길이로 건너뛰고, 압축 데이터 안의 FF는 FF00/RST로 구분합니다."""
+    def __init__(self):
+        self.buffer = bytearray()
+        self.pos = 0            # 현재 프레임에서 다음에 해석할 위치 (0이면 SOI를 찾는 중)
+        self.in_scan = False    # SOS 이후 압축 데이터 구간 여부
+
+    def feed(self, data: bytes) -> list:
+        """데이터를 추가하고 완성된 JPEG 프레임들을 반환합니다."""
+        self.buffer += data
+        frames = []
+        while True:
+            frame = self._next_frame()
+            if frame is None:
+                return frames
+            frames.append(frame)
+
+    def _next_frame(self):
+        buf = self.buffer
+        if self.pos == 0:
+            start = buf.find(b"\xff\xd8")
+            if start < 0:
+                del buf[:max(0, len(buf) - 1)]
+                return None
+            del buf[:start]
+            self.pos = 2
+            self.in_scan = False
+
+        while True:
+            if self.in_scan:
+                i = buf.find(b"\xff", self.pos)
+                # FF00(바이트 채움)과 RST 마커는 압축 데이터의 일부
+                while 0 <= i < len(buf) - 1 and (buf[i + 1] == 0 or 0xD0 <= buf[i + 1] <= 0xD7):
+                    i = buf.find(b"\xff", i + 2)
+                if i < 0 or i == len(buf) - 1:
+                    self.pos = len(buf) if i < 0 else i
+                    return None
+                self.pos = i
+                self.in_scan = False
+                continue
+
+            if len(buf) < self.pos + 2:
+                return None
+            if buf[self.pos] != 0xFF:
+                # 스트림이 깨졌으면 다음 SOI부터 다시 찾음
+                del buf[:self.pos]
+                self.pos = 0
+                return self._next_frame()
+            marker = buf[self.pos + 1]
+            if marker == 0xFF:
+                self.pos += 1
+            elif marker == 0xD9:
+                end = self.pos + 2
+                frame = bytes(buf[:end])
+                del buf[:end]
+                self.pos = 0
+                return frame
+            elif 0xD0 <= marker <= 0xD7 or marker == 0x01:
+                self.pos += 2
+            else:
+                if len(buf) < self.pos + 4:
+                    return None
+                length = (buf[self.pos + 2] << 8) | buf[self.pos + 3]
+                if len(buf) < self.pos + 2 + length:
+                    return None
+                self.pos += 2 + length
+                self.in_scan = marker == 0xDA
+
+def default_command_path() -> str:
+    if Config.CAMERA_COMMAND_PATH:
+        return Config.CAMERA_COMMAND_PATH
+    return os.path.join(os.path.expanduser("~"), "rpicam-apps/build/apps/rpicam-still")
+
+class OneShotCamera:
+    """촬영할 때마다 rpicam-still을 실행합니다."""
+    name = "ONESHOT"
+
+    def __init__(self, command_path: str = None, width: int = None, height: int = None):
+        self.command_path = command_path or default_command_path()
+        self.width = width or Config.CAMERA_WIDTH
+        self.height = height or Config.CAMERA_HEIGHT
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def _command(self, output: str) -> list:
+        return [self.command_path, "-o", output, "-t", "500",
+                "--width", str(self.width), "--height", str(self.height), "--nopreview"]
+
+    def capture(self, output_path: str) -> str:
+        """사진 한 장을 output_path에 저장합니다. 실패 시 FileNotFoundError 또는 CalledProcessError가 발생합니다."""
+        command = self._command(output_path)
+        log.info(f"카메라 촬영 실행: {' '.join(command)}")
+        subprocess.run(command, check=True, capture_output=True, text=True)
+        return output_path
+
+    def capture_bytes(self) -> bytes:
+        """사진 한 장을 표준 출력으로 받아 JPEG 바이트로 반환합니다."""
+        command = self._command("-")
+        log.info(f"카메라 촬영 실행: {' '.join(command)}")
+        result = subprocess.run(command, check=True, capture_output=True)
+        if not result.stdout:
+            raise CameraError("카메라가 사진 데이터를 출력하지 않았습니다.")
+        return result.stdout
+
+class PersistentCamera:
+    """rpicam-still을 계속 실행해 두고 SIGUSR1(signal 모드) 또는 Enter(keypress 모드)로 촬영합니다."""
+    name = "PERSISTENT"
+
+    def __init__(self, command_path: str = None, width: int = None, height: int = None, trigger: str = None,
+                 output: str = None):
+        self.command_path = command_path or default_command_path()
+        self.width = width or Config.CAMERA_WIDTH
+        self.height = height or Config.CAMERA_HEIGHT
+        self.trigger = trigger or Config.CAMERA_TRIGGER
+        self.output = output or Config.CAMERA_OUTPUT   # "MEMORY": 표준 출력, "FILE": 번호 붙은 파일
+        self.frames = queue.Queue()                     # MEMORY 모드에서 표준 출력으로 받은 프레임
+        self.process = None
+        self.workdir = None
+        self.frame_number = 0
+        self.ready_time = 0.0           # 자동 노출이 수렴했다고 보는 시각
+        self.lock = threading.Lock()    # 한 번에 한 장씩 촬영
+
+    def _frame_path(self, number: int) -> str:
+        return os.path.join(self.workdir, f"frame{number:04d}.jpg")
+
+    def start(self):
+        with self.lock:
+            self._start_process()
+
+    def _start_process(self):
+        """카메라 프로세스를 실행합니다. (lock 보유 상태에서 호출)"""
+        if self.process and self.process.poll() is None:
+            return
+        if self.workdir is None:
+            self.workdir = tempfile.mkdtemp(prefix="smartfarm_camera_")
+        self.frame_number = 0
+        mode = "--signal" if self.trigger == "SIGNAL" else "--keypress"
+        output = "-" if self.output == "MEMORY" else os.path.join(self.workdir, "frame%04d.jpg")
+        command = [self.command_path, "-t", "0", mode, "-o", output,
+                   "--framestart", "0", "--width", str(self.width), "--height", str(self.height), "--nopreview"]
+        log.info(f"상주 카메라 프로세스를 시작합니다: {' '.join(command)}")
+        # stderr를 PIPE로 두면 버퍼가 차서 프로세스가 멈출 수 있으므로 버림
+        stdout = subprocess.PIPE if self.output == "MEMORY" else subprocess.DEVNULL
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=stdout, stderr=subprocess.DEVNULL)
+        self.ready_time = time.monotonic() + Config.CAMERA_WARMUP
+        if self.output == "MEMORY":
+            self.frames = queue.Queue()
+            threading.Thread(target=self._stdout_reader, args=(self.process, self.frames), daemon=True).start()
+
+    def _stdout_reader(self, process, frames: queue.Queue):
+        """카메라 프로세스의 표준 출력을 읽어 JPEG 프레임 단위로 큐에 넣습니다."""
+        splitter = JpegStreamSplitter()
+        while True:
+            chunk = process.stdout.read1(65536)
+            if not chunk:
+                frames.put(None)    # 프로세스 종료
+                return
+            for frame in splitter.feed(chunk):
+                frames.put(frame)
+
+    def _trigger(self):
+        if self.trigger == "SIGNAL":
+            self.process.send_signal(signal.SIGUSR1)
+        else:
+            self.process.stdin.write(b"\n")
+            self.process.stdin.flush()
+
+    def _wait_for_file(self, path: str, deadline: float):
+        """파일이 생기고 크기가 더 이상 변하지 않을 때까지 기다립니다."""
+        last_size = -1
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise CameraError(f"카메라 프로세스가 종료되었습니다. (코드 {self.process.returncode})")
+            try:
+                size = os.path.getsize(path)
+            except FileNotFoundError:
+                size = -1
+            if size > 0 and size == last_size:
+                return
+            last_size = size
+            time.sleep(Config.CAMERA_POLL_INTERVAL)
+        raise CameraError(f"{Config.CAMERA_CAPTURE_TIMEOUT}초 안에 사진이 저장되지 않았습니다.")
+
+    def _prepare(self):
+        """프로세스를 띄우고, 막 띄운 경우에만 자동 노출 수렴을 기다립니다. (lock 보유 상태에서 호출)"""
+        self._start_process()
+        remaining = self.ready_time - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def capture_bytes(self) -> bytes:
+        """사진 한 장을 JPEG 바이트로 반환합니다. FILE 모드에서는 파일을 읽은 뒤 지웁니다."""
+        if self.output != "MEMORY":
+            with self.lock:
+                self._prepare()
+                frame_path = self._capture_file()
+                with open(frame_path, "rb") as f:
+                    data = f.read()
+                os.remove(frame_path)
+                return data
+
+        with self.lock:
+            self._prepare()
+            # 이전 요청에서 늦게 도착한 프레임은 버림
+            while not self.frames.empty():
+                if self.frames.get_nowait() is None:
+                    self._stop_process()
+                    self._prepare()
+            try:
+                self._trigger()
+                frame = self.frames.get(timeout=Config.CAMERA_CAPTURE_TIMEOUT)
+            except queue.Empty:
+                self._stop_process()
+                raise CameraError(f"{Config.CAMERA_CAPTURE_TIMEOUT}초 안에 사진 데이터가 도착하지 않았습니다.")
+            except OSError as e:
+                self._stop_process()
+                raise CameraError(str(e)) from e
+            if frame is None:
+                code = self.process.poll()
+                self._stop_process()
+                raise CameraError(f"카메라 프로세스가 종료되었습니다. (코드 {code})")
+            return frame
+
+    def capture(self, output_path: str) -> str:
+        """사진 한 장을 output_path에 저장합니다. 실패하면 프로세스를 정리하고 CameraError를 발생시킵니다."""
+        if self.output == "MEMORY":
+            data = self.capture_bytes()
+            with open(output_path, "wb") as f:
+                f.write(data)
+            return output_path
+        with self.lock:
+            self._prepare()
+            shutil.move(self._capture_file(), output_path)
+            return output_path
+
+    def _capture_file(self) -> str:
+        """촬영을 요청하고 저장이 끝난 프레임 파일 경로를 반환합니다. (lock 보유 상태에서 호출)"""
+        frame_path = self._frame_path(self.frame_number)
+        try:
+            self._trigger()
+            self._wait_for_file(frame_path, time.monotonic() + Config.CAMERA_CAPTURE_TIMEOUT)
+        except (CameraError, OSError) as e:
+            self._stop_process()
+            raise CameraError(str(e)) from e
+        self.frame_number += 1
+        return frame_path
+
+    def _stop_process(self):
+        """카메라 프로세스를 종료합니다. (lock 보유 상태에서 호출)"""
+        if not self.process:
+            return
+        if self.process.poll() is None:
+            try:
+                if self.trigger == "SIGNAL":
+                    self.process.send_signal(signal.SIGUSR2)
+                else:
+                    self.process.stdin.write(b"x\n")
+                    self.process.stdin.flush()
+                self.process.wait(timeout=3)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+
+    def stop(self):
+        with self.lock:
+            self._stop_process()
+            if self.workdir:
+                shutil.rmtree(self.workdir, ignore_errors=True)
+                self.workdir = None
+
+def make_camera_backend(kind: str = None):
+    """Config.CAMERA_BACKEND에 맞는 백엔드를 생성합니다."""
+    kind = (kind or Config.CAMERA_BACKEND).upper()
+    if kind == "PERSISTENT":
+        return PersistentCamera()
+    if kind == "ONESHOT":
+        return OneShotCamera()
+    raise ValueError(f"알 수 없는 카메라 백엔드입니다: {kind}")
@@ -0,0 +1,127 @@
+# =================================================================================
+# Capture_jobs.py
+# 촬영 요청을 작업(job)으로 관리하여 한 번에 하나의 촬영만 실행
+# 대기 중인 작업이 있으면 새 요청은 그 작업에 합쳐지므로(coalescing),
+# 요청이 몰려도 실행 중 1개 + 대기 1개 이상으로 쌓이지 않는다.
+# 작업이 끝나면 등록된 리스너(WebSocket 알림 등)를 호출한다.
+# =================================================================================
+
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from Utility import log
+import Config
+
+class CaptureJob:
+    def __init__(self, shots: int, source: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.shots = shots
+        self.sources = [source]
+        self.requests = 1               # 이 작업에 합쳐진 요청 수
+        self.status = "QUEUED"          # QUEUED -> RUNNING -> DONE / FAILED
+        self.requested_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.images = []                # 업로드 큐에 넘긴 S3 객체 이름
+        self.error = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "shots": self.shots,
+            "sources": self.sources,
+            "requests": self.requests,
+            "requested_at": self.requested_at.isoformat(timespec="seconds"),
+            "started_at": self.started_at.isoformat(timespec="seconds") if self.started_at else None,
+            "finished_at": self.finished_at.isoformat(timespec="seconds") if self.finished_at else None,
+            "images": self.images,
+            "error": self.error,
+        }
+
+class CaptureJobManager:
+    def __init__(self, capture_fn, history: int = None):
+        self.capture_fn = capture_fn    # capture_fn(shots) -> 업로드 큐에 넘긴 객체 이름 목록
+        self.history = history or Config.CAPTURE_JOB_HISTORY
+        self.condition = threading.Condition()
+        self.stop_event = threading.Event()
+        self.pending = None
+        self.running = None
+        self.jobs = OrderedDict()       # 상태 조회용 최근 작업
+        self.listeners = []
+        self.thread = None
+
+    def submit(self, shots: int = 1, source: str = "API"):
+        """촬영 작업을 요청합니다. (작업, 기존 대기 작업에 합쳐졌는지 여부)를 반환합니다."""
+        with self.condition:
+            if self.pending:
+                job = self.pending
+                job.shots = max(job.shots, shots)
+                job.requests += 1
+                if source not in job.sources:
+                    job.sources.append(source)
+                log.info(f"[Capture] 촬영 요청을 대기 중인 작업 {job.id}에 합칩니다. (요청 {job.requests}개)")
+                return job, True
+
+            job = CaptureJob(shots, source)
+            self.pending = job
+            self.jobs[job.id] = job
+            while len(self.jobs) > self.history:
+                self.jobs.popitem(last=False)
+            self.condition.notify_all()
+        log.info(f"[Capture] 촬영 작업 {job.id}을(를) 등록했습니다. (요청: {source}, {shots}장)")
+        return job, False
+
+    def get(self, job_id: str):
+        with self.condition:
+            job = self.jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def add_listener(self, callback):
+        """작업이 끝날 때마다 작업 정보(dict)를 인자로 호출할 콜백을 등록합니다."""
+        self.listeners.append(callback)
+
+    def _worker(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending or self.stop_event.is_set())
+                if self.stop_event.is_set():
+                    return
+                job, self.pending = self.pending, None
+                self.running = job
+                job.status = "RUNNING"
+                job.started_at = datetime.now()
+
+            try:
+                job.images = self.capture_fn(job.shots) or []
+                job.status = "DONE" if job.images else "FAILED"
+                if not job.images:
+                    job.error = "촬영된 사진이 없습니다."
+            except Exception as e:
+                log.error(f"[Capture] 촬영 작업 {job.id} 실행 중 오류 발생: {e}")
+                job.status = "FAILED"
+                job.error = str(e)
+
+            with self.condition:
+                job.finished_at = datetime.now()
+                self.running = None
+                result = job.to_dict()
+            log.info(f"[Capture] 촬영 작업 {job.id} 종료: {job.status}")
+            for listener in self.listeners:
+                try:
+                    listener(result)
+                except Exception as e:
+                    log.warning(f"[Capture] 작업 완료 알림 중 오류 발생: {e}")
+
+    def start(self):
+        if self.thread:
+            return
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.stop_event.set()
+            self.condition.notify_all()
@@ -0,0 +1,178 @@
+# =================================================================================
+# Commands.py
+# REST API와 MQTT 명령 채널이 함께 사용하는 제어 명령 처리기
+# 모드 변경, 목표값 설정, 액추에이터 제어, 촬영 요청의 검증과 반영을 한곳에서 처리하므로
+# 어느 경로로 들어온 명령이든 같은 규칙이 적용된다.
+#
+# MQTT 명령 (COMMAND_TOPIC, QoS 1)
+#   {"id": 요청 ID, "type": "mode" | "setpoint" | "actuator" | "capture", "ts": 보낸 시각(epoch 초, 선택), ...}
+#     mode:     {"mode": "AUTO" | "MANUAL"}
+#     setpoint: {"targets": {"TARGET_TEMP": 25.0, ...}}
+#     actuator: {"device": "FAN", "value": 1}
+#     capture:  {"shots": 1}
+# 처리 결과는 COMMAND_ACK_TOPIC으로 {"id", "status": "ok" | "error", "result" 또는 "code"/"error"}를 발행한다.
+# QoS 1은 같은 메시지를 다시 전달할 수 있으므로, 최근 요청 ID의 결과를 기억했다가 같은 ID가 오면
+# 다시 실행하지 않고 기억한 결과만 다시 보낸다. COMMAND_MAX_AGE보다 오래된 명령은 실행하지 않는다.
+# 목표값은 TARGET_RANGES에 있는 이름과 범위 안의 유한한 숫자만, 액추에이터 값은 ACTUATOR_RANGES 범위의 정수만 받는다.
+# (액추에이터 값은 그대로 시리얼 명령의 한 칸이 되므로 문자열 등은 반드시 거부해야 함)
+# =================================================================================
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from Utility import log
+import Config
+from _System_ import SystemState
+from Actuator_arbiter import ACTUATORS
+
+class CommandError(Exception):
+    """명령이 잘못되었거나 처리할 수 없을 때 발생합니다. status는 HTTP 상태 코드와 같은 의미입니다."""
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+def validate_targets(targets) -> dict:
+    """목표값 목록을 검증하여 숫자로 바꾼 사본을 반환합니다. 하나라도 잘못되면 아무것도 반영하지 않도록 CommandError가 발생합니다."""
+    if not isinstance(targets, dict) or not targets:
+        raise CommandError(400, "Invalid setpoints format.")
+    validated = {}
+    for name, value in targets.items():
+        if name not in Config.TARGET_RANGES:
+            raise CommandError(400, f"Unknown setpoint: {name}. Must be one of {list(Config.TARGET_RANGES)}.")
+        low, high = Config.TARGET_RANGES[name]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or not low <= value <= high:
+            raise CommandError(400, f"{name} must be a number between {low} and {high}.")
+        validated[name] = float(value)
+    return validated
+
+def validate_actuator(device, value) -> int:
+    """액추에이터 이름과 값을 검증하여 정수 값을 반환합니다."""
+    if device not in ACTUATORS:
+        raise CommandError(400, f"Unknown device. Must be one of {list(ACTUATORS)}.")
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    low, high = Config.ACTUATOR_RANGES[device]
+    if isinstance(value, bool) or not isinstance(value, int) or not low <= value <= high:
+        raise CommandError(400, f"{device} value must be an integer between {low} and {high}.")
+    return value
+
+class CommandRouter:
+    TYPES = ("mode", "setpoint", "actuator", "capture")
+
+    def __init__(self, state: SystemState, arbiter, camera=None):
+        self.state = state
+        self.arbiter = arbiter
+        self.camera = camera
+        self.lock = threading.Lock()
+        self.recent = OrderedDict()     # 요청 ID -> (처리 시각, 응답) (중복 수신 확인용)
+        self.counts = {"executed": 0, "duplicates": 0, "rejected": 0}
+        self.listeners = []             # 명령으로 값이 바뀔 때마다 호출할 콜백 (출처, 바뀐 항목 경로 목록)
+
+    def add_listener(self, callback):
+        """명령으로 상태가 바뀔 때마다 callback(source, paths)를 호출합니다. paths는 "MODE", "TARGET.TARGET_TEMP" 같은 경로입니다."""
+        self.listeners.append(callback)
+
+    def _notify(self, source: str, paths: list):
+        for listener in self.listeners:
+            listener(source, paths)
+
+    # --- 명령 ---
+
+    def set_mode(self, mode, source: str = "API") -> dict:
+        if not isinstance(mode, str) or mode.upper() not in ["AUTO", "MANUAL"]:
+            raise CommandError(400, "Invalid mode value. Must be 'AUTO' or 'MANUAL'.")
+        mode = mode.upper()
+        changed = self.state.get_all_data()["MODE"] != mode
+        # SystemState의 update_values를 재활용하여 모드를 변경합니다.
+        self.state.update_values({"MODE": mode})
+        # 같은 모드를 다시 요청한 경우(API 재전송, 섀도 delta 반복)에는 사용자가 설정한 수동 값을 유지
+        if changed:
+            self.arbiter.set_mode(mode)
+        self._notify(source, ["MODE"])
+        return {"updated_mode": self.state.get_all_data()["MODE"]}
+
+    def set_setpoints(self, targets, source: str = "API") -> dict:
+        targets = validate_targets(targets)
+        # update_values 메서드를 사용하여 TARGET 값만 업데이트
+        updated_data = self.state.update_values({"TARGET": targets})
+        self._notify(source, [f"TARGET.{name}" for name in targets])
+        return {"updated_targets": updated_data["TARGET"]}
+
+    def control(self, device, value, source: str = "API") -> dict:
+        value = validate_actuator(device, value)
+        # 수동 모드에서는 기본값을 바꾸고, 자동 모드에서는 MANUAL_OVERRIDE_TTL 동안만 자동 제어보다 우선
+        if self.state.get_all_data()["MODE"] == "MANUAL":
+            effective = self.arbiter.set_default({device: value})
+        else:
+            effective = self.arbiter.request("MANUAL", {device: value}, ttl=Config.MANUAL_OVERRIDE_TTL)
+        self._notify(source, [f"ACTUATOR.{device}"])
+        return {"actuators": effective}
+
+    def capture(self, shots: int = 1, source: str = "API") -> dict:
+        if not isinstance(shots, int) or not 1 <= shots <= Config.CAMERA_MAX_SHOTS:
+            raise CommandError(400, f"shots must be between 1 and {Config.CAMERA_MAX_SHOTS}.")
+        if not self.camera:
+            raise CommandError(503, "Camera handler not available.")
+        # 촬영은 촬영 작업 스레드에서 하나씩 실행되며, 대기 중인 작업이 있으면 그 작업에 합쳐짐
+        job, coalesced = self.camera.request_capture(shots, source=source)
+        return {"job_id": job.id, "coalesced": coalesced}
+
+    # --- MQTT 명령 ---
+
+    def _remember(self, request_id: str, response: dict):
+        now = time.monotonic()
+        with self.lock:
+            self.recent[request_id] = (now, response)
+            while self.recent and (len(self.recent) > Config.COMMAND_DEDUP_SIZE
+                                   or now - next(iter(self.recent.values()))[0] > Config.COMMAND_DEDUP_TTL):
+                self.recent.popitem(last=False)
+
+    def execute(self, command: dict, source: str = "MQTT") -> dict:
+        """요청 ID가 있는 명령을 실행하고 응답을 반환합니다. 이미 처리한 요청 ID이면 실행하지 않고 이전 응답을 반환합니다."""
+        request_id = command.get("id") if isinstance(command, dict) else None
+        if not isinstance(request_id, str) or not request_id:
+            self.counts["rejected"] += 1
+            return {"id": None, "status": "error", "code": 400, "error": "Command id is required."}
+
+        with self.lock:
+            seen = self.recent.get(request_id)
+        if seen:
+            self.counts["duplicates"] += 1
+            log.info(f"[Command] 이미 처리한 요청입니다: {request_id}")
+            return dict(seen[1], duplicate=True)
+
+        sent_at = command.get("ts")
+        try:
+            if isinstance(sent_at, (int, float)) and time.time() - sent_at > Config.COMMAND_MAX_AGE:
+                raise CommandError(408, "Command expired.")
+            command_type = command.get("type")
+            if command_type == "mode":
+                result = self.set_mode(command.get("mode"), source=source)
+            elif command_type == "setpoint":
+                result = self.set_setpoints(command.get("targets"), source=source)
+            elif command_type == "actuator":
+                result = self.control(command.get("device"), command.get("value"), source=source)
+            elif command_type == "capture":
+                result = self.capture(command.get("shots", 1), source=source)
+            else:
+                raise CommandError(400, f"Unknown command type. Must be one of {list(self.TYPES)}.")
+            response = {"id": request_id, "status": "ok", "result": result}
+            self.counts["executed"] += 1
+            log.info(f"[Command] {source} 명령 처리: {command_type} ({request_id})")
+        except CommandError as e:
+            response = {"id": request_id, "status": "error", "code": e.status, "error": e.message}
+            self.counts["rejected"] += 1
+            log.warning(f"[Command] {source} 명령 거부: {e.message} ({request_id})")
+        except Exception as e:
+            response = {"id": request_id, "status": "error", "code": 500, "error": str(e)}
+            self.counts["rejected"] += 1
+            log.error(f"[Command] {source} 명령 처리 중 오류 발생: {e} ({request_id})")
+        self._remember(request_id, response)
+        return response
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"remembered": len(self.recent), **self.counts}
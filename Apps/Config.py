@@ -18,6 +18,10 @@ HEARTBEAT_TIMEOUT = 15  # 하드웨어 연결이 끊김을 판단하는 시간 (
 TARGET_TEMP = 25.0          # 목표 온도 (섭씨)
 TARGET_SOIL_MOISTURE = 400  # 목표 토양 습도
 
+# 명령으로 바꿀 수 있는 값의 범위 (REST API, MQTT 명령, 장치 섀도에 공통 적용)
+TARGET_RANGES = {"TARGET_TEMP": (5.0, 40.0), "TARGET_SOIL_MOISTURE": (0, 1023)}   # 목표값 이름 -> (최솟값, 최댓값)
+ACTUATOR_RANGES = {"FAN": (0, 255), "PUMP": (0, 255), "HEAT_PANNEL": (0, 1), "GROW_LIGHT": (0, 1), "WHITE_LED": (0, 1)}  # 정수 출력 범위
+
 # PID 게인 설정 (float 사용)
 PID_KP = 5.0    # 비례 게인
 PID_KI = 0.1    # 적분 게인
@@ -30,6 +34,8 @@ API_SECRET_KEY = "HANIUMA20K197WS3STECH21SAFE75E9O"
 # AWS 설정
 AWS_REGION = "ap-northeast-2"                           # AWS 리전
 AWS_S3_BUCKET_NAME = "receivedphotohanium2025smartfarm" # S3 버킷 이름
+DEVICE_ID = "smartfarm-pi-hanium"                       # 장치 ID (S3 키 경로에 사용)
+FARM_ZONE = "zone1"                                     # 재배 구역 (S3 키 경로에 사용)
 
 # LOGGING 설정
 LOG_DIRECTORY = "logs"                  # 로그 파일 저장 디렉토리
@@ -38,4 +44,179 @@ LOG_FILE_BACKUP_COUNT = 5               # 로그 파일 백업 최대 개수
 
 # 제어 설정
 RECONNECT_DELAY = 2
-CONTROL_INTERVAL = 2
\ No newline at end of file
+CONTROL_INTERVAL = 2
+
+# 적응형 센서 샘플링 설정
+# 아두이노의 센서 전송 간격을 상황에 따라 조절 (밀리초 단위)
+SAMPLE_INTERVAL_FAST = 1000     # 과도 상태 (펌프/히터 동작, 큰 오차) - DHT22 특성상 1초 이하는 의미 없음
+SAMPLE_INTERVAL_NORMAL = 2000   # 기본 간격 (펌웨어 초기값과 동일)
+SAMPLE_INTERVAL_SLOW = 10000    # 안정 상태
+SAMPLE_STABLE_HOLD = 60         # 과도 상태 종료 후 안정 상태로 판단하기까지의 시간 (초)
+SAMPLE_TEMP_ERROR_THRESHOLD = 2.0   # 과도 상태로 판단하는 온도 오차 (섭씨)
+SAMPLE_SOIL_ERROR_THRESHOLD = 100   # 과도 상태로 판단하는 토양 습도 오차
+SAMPLE_CHECK_INTERVAL = 1       # 샘플링 간격 판단 주기 (초)
+SAMPLE_RESEND_INTERVAL = 5      # 아두이노 응답이 없을 때 명령 재전송 간격 (초)
+
+# 센서 필터 설정
+# 채널별 필터 종류: "NONE", "MEDIAN", "EMA", "KALMAN"
+SENSOR_FILTERS = {"TEMP": "KALMAN", "HUMID": "EMA", "SOIL": "MEDIAN", "LIGHT": "NONE"}
+FILTER_MEDIAN_WINDOW = 5    # 중앙값 필터 샘플 수
+FILTER_EMA_ALPHA = 0.3      # EMA 가중치 (0~1, 작을수록 부드러움)
+FILTER_KALMAN_Q = 0.01      # 칼만 필터 프로세스 잡음 분산
+FILTER_KALMAN_R = 0.25      # 칼만 필터 측정 잡음 분산 (DHT22 약 ±0.5도)
+
+# 자동 제어 실행 방식
+# "TIMER": CONTROL_INTERVAL마다 실행, "EVENT": 새 센서 샘플이 들어올 때마다 한 번 실행
+CONTROL_TRIGGER = "EVENT"
+CONTROL_MAX_STALENESS = 15      # 이 시간(초)보다 오래된 센서 값으로는 온도/급수 판단을 하지 않음
+CONTROL_FALLBACK_INTERVAL = 2   # 샘플이 들어오지 않아도 이 간격(초)마다 한 번 실행 (펌프 정지 등)
+
+# 시뮬레이션 설정
+SIM_SETTLE_BAND = 0.5   # 정착 시간 판단 기준 (목표 온도 ± 섭씨)
+
+# 실행 방식 설정
+# "THREAD": 컴포넌트별 스레드, "SCHEDULER": 타이머 휠 스케줄러 하나로 모든 주기 작업 실행
+# "ASYNC": 모든 컴포넌트를 하나의 asyncio 이벤트 루프에서 실행
+RUNTIME_MODE = "THREAD"
+SCHEDULER_TICK = 0.05           # 타이머 휠 틱 간격 (초)
+SCHEDULER_WORKERS = 3           # 작업 실행 스레드 수 (촬영 같은 긴 작업이 다른 작업을 막지 않도록 2개 이상)
+SCHEDULER_REPORT_INTERVAL = 600 # 지터/오버런 통계 로그 주기 (초, 0이면 기록 안 함)
+ASYNC_EXECUTOR_WORKERS = 2      # ASYNC 모드에서 블로킹 작업(촬영, 업로드)을 실행할 스레드 수
+
+# 액추에이터 중재 설정
+# 우선순위: 안전 > 촬영 > 수동 > 자동
+MANUAL_OVERRIDE_TTL = 60        # 자동 모드에서 수동 제어가 유지되는 시간 (초)
+CAPTURE_LIGHT_TTL = 60          # 촬영 조명 요청의 최대 유지 시간 (초, 촬영 중 오류 대비)
+CAPTURE_ACK_TIMEOUT = 1.0       # 촬영 조명 명령의 아두이노 적용 응답(ACK:) 최대 대기 시간 (초)
+CAPTURE_LIGHT_TIMEOUT = 2.0     # 조도가 백색등 밝기로 안정될 때까지의 최대 대기 시간 (초, 초과 시 그대로 촬영)
+CAPTURE_LIGHT_MIN_LUX = 100     # 백색등이 켜진 것으로 보는 최소 조도 (lux, 설치 환경에 맞게 보정)
+CAPTURE_LIGHT_TOLERANCE = 0.05  # 연속 측정값의 변화가 이 비율 이내이면 안정된 것으로 판단
+CAPTURE_LIGHT_SAMPLES = 3       # 안정 판단에 사용하는 연속 조도 측정 수
+CAPTURE_LIGHT_POLL = 0.1        # 조도 측정 요청(LIGHT?) 간격 (초)
+SAFETY_MAX_TEMP = 40.0          # 히터를 강제로 차단하는 온도 (섭씨)
+SAFETY_TEMP_HYSTERESIS = 2.0    # 안전 차단 해제 온도 = SAFETY_MAX_TEMP - 이 값
+
+# 카메라 설정
+CAMERA_COMMAND_PATH = None      # rpicam-still 경로 (None이면 ~/rpicam-apps/build/apps/rpicam-still, 시험 시 Fake_camera.py)
+CAMERA_BACKEND = "PERSISTENT"   # "PERSISTENT": 상주 프로세스에 촬영 요청, "ONESHOT": 촬영마다 프로세스 실행
+CAMERA_TRIGGER = "SIGNAL"       # 상주 프로세스 촬영 방식 ("SIGNAL": SIGUSR1, "KEYPRESS": Enter 입력)
+CAMERA_OUTPUT = "MEMORY"        # "MEMORY": 표준 출력으로 받아 메모리에서 바로 업로드(실패하거나 밀리면 스풀에 기록), "FILE": /tmp 임시 파일 사용
+CAMERA_WIDTH = 1920             # 촬영 해상도
+CAMERA_HEIGHT = 1080
+CAMERA_WARMUP = 2.0             # 상주 프로세스 시작 후 자동 노출이 수렴할 때까지 기다리는 시간 (초)
+CAMERA_CAPTURE_TIMEOUT = 5.0    # 촬영 요청 후 사진 파일이 저장될 때까지의 최대 대기 시간 (초)
+CAMERA_POLL_INTERVAL = 0.02     # 사진 파일 저장 완료 확인 간격 (초)
+CAMERA_MAX_SHOTS = 10           # 한 번의 요청으로 연속 촬영할 수 있는 최대 장수
+CAPTURE_JOB_HISTORY = 50        # 상태 조회를 위해 보관하는 최근 촬영 작업 수
+
+# 이미지 처리 설정 (촬영 후 업로드 전 축소/잘라내기)
+IMAGE_PROCESSING = True         # False이면 원본만 업로드
+IMAGE_UPLOAD_ORIGINAL = False   # 파생 이미지와 함께 원본도 images/original/에 업로드할지 여부
+IMAGE_WORKERS = 1               # 이미지 처리 프로세스 수
+IMAGE_PROCESS_TIMEOUT = 30      # 사진 한 장 처리의 최대 대기 시간 (초, 초과 시 원본 업로드)
+IMAGE_QUALITY_MIN = 40          # 목표 크기를 맞추기 위해 내려갈 수 있는 최저 JPEG 품질
+IMAGE_QUALITY_MAX = 90          # 최고 JPEG 품질
+# 파생 이미지: 이름 -> 최대 크기(가로, 세로), 목표 바이트 수, S3 경로 접두사
+# 분석용 이미지는 기존 원본과 같은 images/ 경로에 올려 분석 쪽이 그대로 사용할 수 있게 함
+IMAGE_DERIVATIVES = {
+    "analysis": {"max_size": (1280, 720), "max_bytes": 200_000, "prefix": "images/"},
+    "thumbnail": {"max_size": (320, 180), "max_bytes": 15_000, "prefix": "images/thumbnail/"},
+}
+# 관심 영역: 이름 -> 상대 좌표 (x0, y0, x1, y1), 최대 크기, 목표 바이트 수 (images/roi/<이름>/에 업로드)
+# 예: {"bed1": {"box": (0.1, 0.2, 0.5, 0.9), "max_size": (640, 640), "max_bytes": 80_000}}
+IMAGE_ROIS = {}
+
+# 중복 사진 검출 설정 (지각 해시)
+IMAGE_DEDUP = True              # 최근 사진과 거의 같은 사진은 업로드하지 않음
+IMAGE_DUPLICATE_THRESHOLD = 5   # aHash/dHash 해밍 거리(64비트 중)가 모두 이 값 이하이면 중복
+IMAGE_HASH_HISTORY = 12         # 비교할 최근 업로드 사진 수
+IMAGE_DUPLICATE_MAX_AGE = 3600  # 마지막 업로드 후 이 시간(초)이 지나면 변화가 없어도 업로드
+IMAGE_REFERENCE_FILE = "logs/image_references.jsonl"   # 중복 사진의 참조 기록 파일
+
+# 로컬 사진 저장소 설정
+IMAGE_STORE_DIR = "image_store"     # 사진 저장소 디렉토리 (objects/ + index.json)
+IMAGE_STORE_QUOTA_MB = 500          # 저장소 최대 크기 (MB, 초과 시 가장 오래 조회되지 않은 사진부터 삭제)
+IMAGE_STORE_ORIGINAL = True         # 업로드하지 않는 원본도 로컬 저장소에는 보관할지 여부
+
+# 사진 업로드 큐 설정
+UPLOAD_QUEUE_SIZE = 1000            # 업로드 대기 파일 최대 개수 (디스크 스풀에 보관되므로 오프라인 기간을 버틸 만큼 크게)
+UPLOAD_WORKERS = 2                  # 업로드 작업 스레드 수
+UPLOAD_QUEUE_POLICY = "DROP_OLDEST" # 큐가 가득 찼을 때: "DROP_OLDEST", "DROP_NEWEST", "BLOCK"
+UPLOAD_BLOCK_TIMEOUT = 5            # "BLOCK" 정책에서 자리가 나기를 기다리는 최대 시간 (초)
+UPLOAD_SPOOL_DIR = "upload_spool"   # 업로드 대기 파일과 매니페스트를 보관하는 디렉토리
+UPLOAD_RETRY_BASE = 2               # 첫 업로드 실패 후 재시도 대기 시간 (초, 연속 실패마다 2배)
+UPLOAD_RETRY_MAX = 300              # 재시도 대기 시간의 최댓값 (초)
+UPLOAD_MAX_ATTEMPTS = 10            # 한 파일이 이 횟수만큼 실패하면 스풀의 dead_letter/로 격리 (권한 오류 등은 바로 격리)
+UPLOAD_RATE_LIMIT_KBPS = 256        # 업로드 속도 상한 (KB/s, 0이면 제한 없음)
+UPLOAD_RATE_BURST_KB = 512          # 속도 제한에서 한 번에 몰아서 보낼 수 있는 최대 크기 (KB)
+UPLOAD_RATE_ADAPTIVE = True         # 관측된 처리량에 맞추어 업로드 상한을 자동으로 조정
+UPLOAD_RATE_MIN_KBPS = 32           # 자동 조정 시 업로드 상한의 최솟값 (KB/s)
+UPLOAD_BANDWIDTH_SHARE = 0.7        # 회선이 느릴 때 관측 처리량 중 업로드에 쓰는 비율 (나머지는 MQTT/API용)
+UPLOAD_RATE_SAMPLE_KB = 64          # 처리량 관측에 사용할 최소 업로드 크기 (KB, 작은 파일은 지연 시간이 지배적)
+
+# 묶음 업로드 설정
+UPLOAD_MODE = "SINGLE"              # "SINGLE": 사진마다 업로드, "BUNDLE": 여러 장을 tar 하나로 묶어 업로드
+BUNDLE_WINDOW = 1800                # 묶음 하나에 사진을 모으는 최대 시간 (초)
+BUNDLE_MAX_IMAGES = 12              # 묶음 하나의 최대 사진 수 (도달하면 바로 업로드)
+BUNDLE_ANALYSIS_TOPIC = "smartfarm/analysis/request"    # 묶음 업로드 후 분석 요청을 발행할 MQTT 토픽
+BUNDLE_PENDING_DIR = "bundle_pending"   # 모으는 중인 묶음의 사진을 보관하는 디렉토리 (재시작 후 이어서 모음)
+BUNDLE_NOTIFY_TIMEOUT = 5           # 분석 요청의 수신 확인(PUBACK)을 기다리는 시간 (초, 실패하면 다시 발행)
+
+# S3 전송 설정
+S3_MULTIPART_THRESHOLD_MB = 8       # 이 크기 이상은 멀티파트 업로드
+S3_MULTIPART_CHUNK_MB = 8           # 멀티파트 조각 크기 (MB, S3 최소 5MB)
+S3_MAX_CONCURRENCY = 2              # 파일 하나의 조각을 동시에 전송하는 스레드 수
+
+# S3 키 배치 설정 (Storage_layout.py)
+# 객체 키 템플릿. 기본값은 분석 쪽이 읽는 예전 평면 키(images/..., bundles/...)
+# 날짜 파티션과 매니페스트는 "{root}/{device}/{zone}/{yyyy}/{mm}/{dd}/{hh}/{name}"처럼 바꿔서 켬 (분석 쪽 경로도 함께 변경 필요)
+S3_KEY_LAYOUT = "{root}/{name}"
+S3_MANIFEST_DIR = "s3_manifests"    # 파티션 매니페스트의 로컬 사본을 보관하는 디렉토리
+S3_MANIFEST_FLUSH_INTERVAL = 300    # 바뀐 매니페스트를 S3에 올리는 간격 (초, 업로드가 없어도 이 주기로 올림)
+S3_MANIFEST_RETENTION_DAYS = 3      # 다 올린 매니페스트의 로컬 사본을 보관하는 기간 (일)
+
+# MQTT 명령 채널 설정 (Commands.py)
+COMMAND_TOPIC = f"smartfarm/{DEVICE_ID}/command"        # 원격 제어 명령을 받는 MQTT 토픽
+COMMAND_ACK_TOPIC = f"smartfarm/{DEVICE_ID}/command/ack"    # 명령 처리 결과를 발행하는 MQTT 토픽
+COMMAND_MAX_AGE = 30                # 보낸 시각(ts)으로부터 이 시간이 지난 명령은 실행하지 않음 (초)
+COMMAND_DEDUP_SIZE = 256            # 중복 수신 확인을 위해 기억하는 최근 요청 ID 수
+COMMAND_DEDUP_TTL = 600             # 요청 ID를 기억하는 시간 (초)
+
+# 클라우드 상태 동기화 설정 (State_sync.py, AWS IoT Device Shadow)
+SHADOW_ENABLED = True               # SystemState를 장치 섀도와 동기화
+SHADOW_THING_NAME = DEVICE_ID       # AWS IoT 사물(Thing) 이름
+SHADOW_SYNC_INTERVAL = 5            # 바뀐 항목을 확인하여 보고하는 간격 (초)
+SHADOW_FULL_SYNC_INTERVAL = 3600    # 전체 값을 다시 보고하는 간격 (초)
+SHADOW_SENSOR_DEADBAND = {"TEMP": 0.2, "HUMID": 1.0, "SOIL": 10, "LIGHT": 20}  # 이보다 작게 바뀐 센서 값은 보고하지 않음
+SHADOW_CONFLICT_POLICY = "NEWEST"   # 클라우드 값과 로컬 수동 변경이 겹칠 때: "LOCAL_WINS", "CLOUD_WINS", "NEWEST"
+SHADOW_LOCAL_HOLD = 300             # "LOCAL_WINS"일 때 로컬에서 바꾼 값을 클라우드 값보다 우선하는 시간 (초)
+SHADOW_PUBLISH_TIMEOUT = 5          # 보고의 수신 확인(PUBACK)을 기다리는 시간 (초)
+
+# MQTT 연결 설정
+MQTT_RECONNECT_MIN = 1              # 연결이 끊기거나 처음 연결에 실패했을 때 다시 연결을 시도하는 최소 간격 (초)
+MQTT_RECONNECT_MAX = 120            # 다시 연결 간격의 최댓값 (초, 실패할 때마다 2배로 늘어남)
+
+# 원격 측정(Telemetry) 설정 (Telemetry.py)
+TELEMETRY_ENABLED = True            # 센서/액추에이터 값을 MQTT로 묶어서 발행
+TELEMETRY_TOPIC = "smartfarm/telemetry"     # 원격 측정 묶음을 발행할 MQTT 토픽
+TELEMETRY_WINDOW = 60               # 샘플을 모아 한 메시지로 발행하는 간격 (초)
+TELEMETRY_SAMPLE_INTERVAL = 5       # 묶음에 넣는 샘플의 최소 간격 (초, 이보다 자주 들어온 샘플은 건너뜀)
+TELEMETRY_BUFFER_FILE = "telemetry_buffer.jsonl"    # 브로커에 연결되지 않은 동안 묶음을 보관하는 파일
+TELEMETRY_BUFFER_MAX_KB = 2048      # 보관 파일의 최대 크기 (KB, 넘으면 가장 오래된 묶음부터 버림)
+TELEMETRY_PUBLISH_TIMEOUT = 5       # 브로커의 수신 확인(PUBACK)을 기다리는 시간 (초)
+TELEMETRY_DRAIN_BATCHES = 30        # 다시 연결되었을 때 한 번에 재전송하는 보관 묶음 수
+
+# 데이터 직렬화 설정 (Payload_codec.py)
+# 코덱: "json", "msgpack", "cbor", 뒤에 "+zlib" 또는 "+zstd"를 붙이면 압축 (예: "msgpack+zlib")
+PAYLOAD_CODEC_DEFAULT = "json"      # 토픽/연결에 따로 지정하지 않았을 때의 코덱
+MQTT_TOPIC_CODECS = {               # MQTT 토픽별 코덱 (클라우드 수신 측과 같은 값, 라이브러리가 없으면 시작 시 오류 기록 후 json)
+    "smartfarm/telemetry": "msgpack+zlib",
+}
+PAYLOAD_COMPRESS_MIN_BYTES = 256    # 이보다 작은 데이터는 압축하지 않음 (bytes)
+PAYLOAD_ZLIB_LEVEL = 6              # zlib 압축 수준 (1~9)
+PAYLOAD_ZSTD_LEVEL = 3              # zstd 압축 수준
+
+# 클라우드 대체 구현 설정 (시험용)
+CLOUD_BACKEND = "AWS"               # "AWS": 실제 AWS 사용, "LOCAL": Local_cloud.py로 로컬 디렉토리에 업로드
+LOCAL_CLOUD_DIR = "local_cloud"     # "LOCAL"일 때 업로드된 객체를 저장할 디렉토리
+LOCAL_CLOUD_OFFLINE_FILE = "local_cloud/OFFLINE"    # 이 파일이 있으면 로컬 클라우드가 연결 끊김을 흉내 냄
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# =================================================================================
+# Fake_camera.py
+# rpicam-still 대신 실행할 수 있는 가짜 카메라 (카메라가 없는 환경에서 시험용)
+# Config.CAMERA_COMMAND_PATH에 이 파일의 경로를 지정하여 사용한다.
+# 지원 옵션: -o (파일 또는 "-"=표준 출력), -t, --signal(-s), --keypress(-k), --framestart, --width, --height
+# 카메라 초기화 시간은 환경 변수 FAKE_CAMERA_INIT_DELAY(초)로 흉내 낸다.
+# =================================================================================
+
+import argparse
+import base64
+import os
+import signal
+import sys
+import threading
+import time
+
+# Pillow가 없을 때 사용하는 8x8 JPEG
+_FALLBACK_JPEG = base64.b64decode(
+    "/9j/4AAQSkZJRgABAQAAAQABAAD/2wBDABALDA4MChAODQ4SERATGCgaGBYWGDEjJR0oOjM9PDkzODdASFxOQERXRTc4UG1RV19iZ2hnPk1xeXBkeFxlZ2P/"
+    "2wBDARESEhgVGC8aGi9jQjhCY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2P/wAARCAAIAAgDASIAAhEBAxEB/8QAHwAA"
+    "AQUBAQEBAQEAAAAAAAAAAAECAwQFBgcICQoL/8QAtRAAAgEDAwIEAwUFBAQAAAF9AQIDAAQRBRIhMUEGE1FhByJxFDKBkaEII0KxwRVS0fAkM2JyggkKFhcYGRol"
+    "JicoKSo0NTY3ODk6Q0RFRkdISUpTVFVWV1hZWmNkZWZnaGlqc3R1dnd4eXqDhIWGh4iJipKTlJWWl5iZmqKjpKWmp6ipqrKztLW2t7i5usLDxMXGx8jJytLT1NXW"
+    "19jZ2uHi4+Tl5ufo6erx8vP09fb3+Pn6/8QAHwEAAwEBAQEBAQEBAQAAAAAAAAECAwQFBgcICQoL/8QAtREAAgECBAQDBAcFBAQAAQJ3AAECAxEEBSExBhJBUQdh"
+    "cRMiMoEIFEKRobHBCSMzUvAVYnLRChYkNOEl8RcYGRomJygpKjU2Nzg5OkNERUZHSElKU1RVVldYWVpjZGVmZ2hpanN0dXZ3eHl6goOEhYaHiImKkpOUlZaXmJma"
+    "oqOkpaanqKmqsrO0tba3uLm6wsPExcbHyMnK0tPU1dbX2Nna4uPk5ebn6Onq8vP09fb3+Pn6/9oADAMBAAIRAxEAPwCnRRRXGZH/2Q=="
+)
+
+def make_jpeg(width: int, height: int) -> bytes:
+    """매번 조금씩 다른 잡음 이미지를 JPEG로 만듭니다."""
+    try:
+        from io import BytesIO
+        from PIL import Image
+    except ImportError:
+        return _FALLBACK_JPEG
+    noise = Image.effect_noise((width, height), 40)
+    image = Image.merge("RGB", (noise.point(lambda v: v * 0.6), noise, noise.point(lambda v: v * 0.5)))
+    buffer = BytesIO()
+    image.save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+def write_frame(path: str, width: int, height: int):
+    # 실제 카메라처럼 파일을 나누어 쓰므로, 읽는 쪽은 크기가 더 이상 변하지 않을 때까지 기다려야 함
+    data = make_jpeg(width, height)
+    if path == "-":
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+        return
+    with open(path, "wb") as f:
+        half = len(data) // 2
+        f.write(data[:half])
+        f.flush()
+        time.sleep(0.01)
+        f.write(data[half:])
+
+def main():
+    parser = argparse.ArgumentParser(description="rpicam-still 흉내")
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("-t", "--timeout", type=int, default=5000)
+    parser.add_argument("-s", "--signal", action="store_true")
+    parser.add_argument("-k", "--keypress", action="store_true")
+    parser.add_argument("--framestart", type=int, default=0)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    args, _ = parser.parse_known_args()
+
+    def output_name(number: int) -> str:
+        return args.output % number if "%" in args.output else args.output
+
+    # 초기화 중에 들어온 촬영 요청도 잃지 않도록 시그널 처리기를 먼저 등록
+    requested = threading.Event()
+    quit_event = threading.Event()
+    if args.signal:
+        signal.signal(signal.SIGUSR1, lambda signum, frame: requested.set())
+        signal.signal(signal.SIGUSR2, lambda signum, frame: (quit_event.set(), requested.set()))
+
+    time.sleep(float(os.environ.get("FAKE_CAMERA_INIT_DELAY", "1.0")))
+    frame = args.framestart
+
+    if args.signal:
+        while True:
+            requested.wait()
+            requested.clear()
+            if quit_event.is_set():
+                return 0
+            write_frame(output_name(frame), args.width, args.height)
+            frame += 1
+
+    if args.keypress:
+        for line in sys.stdin:
+            if line.strip().lower() == "x":
+                return 0
+            write_frame(output_name(frame), args.width, args.height)
+            frame += 1
+        return 0
+
+    time.sleep(args.timeout / 1000)
+    write_frame(args.output, args.width, args.height)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
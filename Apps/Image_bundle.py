@@ -0,0 +1,230 @@
+# =================================================================================
+# Image_bundle.py
+# 여러 번의 촬영을 하나의 tar 묶음(bundle)으로 모아 한 번에 업로드하는 묶음 업로드 모드
+# BUNDLE_WINDOW 동안(또는 BUNDLE_MAX_IMAGES장이 모일 때까지) 사진과 촬영 당시 센서 값을 모은 뒤
+#   bundles/<묶음 ID>.tar   (실제 S3 키는 묶음을 연 시각의 파티션에 배치됨, Storage_layout.py)
+#     ├─ manifest.json   열(column) 단위 메타데이터: 파일 이름, 촬영 시각, 센서 값, 묶음 안의 경로
+#     └─ images/...      사진 (단건 업로드 때와 같은 S3 경로를 묶음 안의 경로로 사용)
+# 하나의 객체로 업로드하고, 업로드가 끝나면 파티션 매니페스트에 기록한 뒤 BUNDLE_ANALYSIS_TOPIC으로 분석 요청을 한 번 발행한다.
+# 사진마다 PUT 요청과 분석 요청을 보내지 않으므로 요청 수에 따른 비용이 줄어든다.
+# 모으는 중인 사진은 BUNDLE_PENDING_DIR에 바로 기록하므로(메모리에는 경로만 보관) 프로그램이 멈추거나
+# 다시 시작되어도 잃지 않으며, 다시 시작하면 그 묶음에 이어서 모은다.
+#   <BUNDLE_PENDING_DIR>/bundle.json   묶음 ID, 묶음을 연 시각
+#   <BUNDLE_PENDING_DIR>/items.jsonl   사진마다 한 줄 (파일 이름, 촬영 시각, 센서 값, 묶음 안의 경로)
+#   <BUNDLE_PENDING_DIR>/files/...     사진 파일 (묶음 안의 경로와 같은 이름)
+# 업로드 큐에 넘겨 스풀에 기록된 뒤에야 지운다.
+# =================================================================================
+
+import io
+import json
+import os
+import shutil
+import tarfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from Utility import log
+import Config
+from Storage_layout import object_key, partition_of
+
+SENSOR_COLUMNS = ("TEMP", "HUMID", "SOIL", "LIGHT")
+
+def build_bundle(bundle_id: str, items: list) -> bytes:
+    """사진 목록으로 tar 묶음을 만듭니다. items는 {"filename", "captured_at", "sensors", "files": [(경로, 데이터)]} 목록입니다."""
+    manifest = {
+        "bundle_id": bundle_id,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "count": len(items),
+        "columns": {
+            "filename": [item["filename"] for item in items],
+            "captured_at": [item["captured_at"] for item in items],
+            **{name: [item["sensors"].get(name) for item in items] for name in SENSOR_COLUMNS},
+            "members": [[member for member, _ in item["files"]] for item in items],
+        },
+    }
+
+    buffer = io.BytesIO()
+    # JPEG는 이미 압축되어 있으므로 tar는 압축하지 않음
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        def add(name: str, data: bytes):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            tar.addfile(info, io.BytesIO(data))
+
+        add("manifest.json", json.dumps(manifest, ensure_ascii=False).encode("utf-8"))
+        for item in items:
+            for member, data in item["files"]:
+                add(member, data)
+    return buffer.getvalue()
+
+def _write_file(path: str, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+class ImageBundler:
+    def __init__(self, upload_queue, directory: str = None):
+        self.upload_queue = upload_queue
+        self.directory = directory or Config.BUNDLE_PENDING_DIR
+        self.lock = threading.Lock()
+        self.items = []             # {"filename", "captured_at", "sensors", "members": [묶음 안의 경로]}
+        self.bundle_id = None
+        self.opened_at = None
+        self.opened_time = None     # 묶음을 연 시각 (S3 키의 파티션)
+        self._load()
+
+    # --- 디스크 기록 ---
+
+    def _member_path(self, member: str) -> str:
+        return os.path.join(self.directory, "files", *member.split("/"))
+
+    def _load(self):
+        """이전 실행에서 모으던 묶음을 불러옵니다. 묶음을 연 시각은 그대로 유지되므로 BUNDLE_WINDOW가 지났으면 다음 확인 때 업로드됩니다."""
+        try:
+            with open(os.path.join(self.directory, "bundle.json"), "r", encoding="utf-8") as f:
+                bundle = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            shutil.rmtree(self.directory, ignore_errors=True)
+            return
+        items = []
+        try:
+            with open(os.path.join(self.directory, "items.jsonl"), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        item = json.loads(line)
+                    except json.JSONDecodeError:
+                        log.warning("[Bundle] 묶음 기록의 잘린 줄을 무시합니다.")
+                        continue
+                    if all(os.path.exists(self._member_path(member)) for member in item["members"]):
+                        items.append(item)
+        except FileNotFoundError:
+            pass
+        if not items:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            return
+        self.items = items
+        self.bundle_id = bundle["bundle_id"]
+        self.opened_time = datetime.fromisoformat(bundle["opened_time"])
+        self.opened_at = time.monotonic() - max(0.0, time.time() - bundle["opened_epoch"])
+        log.info(f"[Bundle] 이전 실행에서 모으던 묶음 {self.bundle_id}의 사진 {len(items)}장을 이어서 모읍니다.")
+
+    def _open_bundle(self, captured_at: datetime):
+        """새 묶음을 열고 디스크에 기록합니다. (lock 보유 상태에서 호출)"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
+        self.bundle_id = self._new_bundle_id()
+        self.opened_at = time.monotonic()
+        self.opened_time = captured_at
+        with open(os.path.join(self.directory, "bundle.json"), "w", encoding="utf-8") as f:
+            json.dump({"bundle_id": self.bundle_id, "opened_time": captured_at.isoformat(), "opened_epoch": time.time()}, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _new_bundle_id(self) -> str:
+        return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+    def _object_name(self) -> str:
+        return object_key(f"bundles/{self.bundle_id}.tar", self.opened_time)
+
+    def add(self, filename: str, files: list, sensors: dict, captured_at: datetime = None) -> list:
+        """사진 하나의 파일 목록 [(묶음 안의 경로, JPEG 바이트 또는 파일 경로)]을 현재 묶음에 추가하고,
+        묶음 안에서의 위치("<묶음 S3 키>/<경로>") 목록을 반환합니다. 묶음이 가득 차면 바로 업로드합니다.
+        파일 경로로 넘긴 임시 파일은 읽기만 하며, 지우는 것은 호출한 쪽이 합니다."""
+        captured_at = captured_at or datetime.now()
+        self.flush_if_due()
+        with self.lock:
+            if not self.items:
+                self._open_bundle(captured_at)
+            for member, source in files:
+                path = self._member_path(member)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if isinstance(source, str):
+                    shutil.copyfile(source, path)
+                else:
+                    _write_file(path, source)
+            item = {
+                "filename": filename,
+                "captured_at": captured_at.isoformat(timespec="seconds"),
+                "sensors": sensors or {},
+                "members": [member for member, _ in files],
+            }
+            with open(os.path.join(self.directory, "items.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps(item, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.items.append(item)
+            bundle_id = self.bundle_id
+            object_name = self._object_name()
+            full = len(self.items) >= Config.BUNDLE_MAX_IMAGES
+        log.info(f"[Bundle] {filename}을(를) 묶음 {bundle_id}에 추가했습니다.")
+        if full:
+            self.flush()
+        return [f"{object_name}/{member}" for member, _ in files]
+
+    def flush_if_due(self):
+        """묶음을 연 지 BUNDLE_WINDOW가 지났으면 업로드합니다."""
+        with self.lock:
+            due = self.items and time.monotonic() - self.opened_at >= Config.BUNDLE_WINDOW
+        if due:
+            self.flush()
+
+    def flush(self) -> bool:
+        """모인 사진을 tar 묶음으로 만들어 업로드 큐에 넘깁니다. 업로드가 끝나면 분석 요청이 발행됩니다.
+        스풀에 넘긴 뒤에 디스크의 묶음 기록을 지우며, 그동안 새 사진은 다음 묶음을 기다립니다.
+        큐가 가득 차 넘기지 못하면 묶음을 그대로 두고 False를 반환합니다."""
+        with self.lock:
+            items = self.items
+            if not items:
+                return False
+            bundle_id = self.bundle_id
+            object_name = self._object_name()
+            opened_time = self.opened_time
+
+            loaded = []
+            for item in items:
+                files = []
+                for member in item["members"]:
+                    with open(self._member_path(member), "rb") as f:
+                        files.append((member, f.read()))
+                loaded.append(dict(item, files=files))
+            data = build_bundle(bundle_id, loaded)
+            notify = {
+                "topic": Config.BUNDLE_ANALYSIS_TOPIC,
+                "payload": {
+                    "bucket": Config.AWS_S3_BUCKET_NAME,
+                    "key": object_name,
+                    "bundle_id": bundle_id,
+                    "count": len(items),
+                    "first_captured_at": items[0]["captured_at"],
+                    "last_captured_at": items[-1]["captured_at"],
+                },
+            }
+            meta = {
+                "partition": partition_of(f"bundles/{bundle_id}.tar", opened_time),
+                "bundle_id": bundle_id,
+                "filenames": [item["filename"] for item in items],
+                "first_captured_at": items[0]["captured_at"],
+                "last_captured_at": items[-1]["captured_at"],
+            }
+            log.info(f"[Bundle] 사진 {len(items)}장을 묶음 {object_name}({len(data)} bytes)으로 업로드합니다.")
+            # 묶음 기록을 지우기 전에 스풀에 기록되어야 하므로 durable로 넘김
+            submitted = self.upload_queue.submit_bytes(data, object_name, notify, meta, durable=True)
+            if not submitted:
+                # 큐가 가득 차 버려진 경우 묶음 기록을 그대로 두고 다음 flush_if_due에서 다시 넘김
+                log.warning(f"[Bundle] 업로드 큐에 넘기지 못해 묶음 {bundle_id}을(를) 보관하고 다음에 다시 시도합니다.")
+                return False
+            self.items = []
+            shutil.rmtree(self.directory, ignore_errors=True)
+        return True
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "bundle_id": self.bundle_id if self.items else None,
+                "pending": len(self.items),
+                "age_s": round(time.monotonic() - self.opened_at, 1) if self.items else 0,
+            }
@@ -0,0 +1,103 @@
+# =================================================================================
+# Image_hash.py
+# 지각 해시(perceptual hash)로 최근 촬영과 거의 같은 사진을 찾아 중복 업로드를 막음
+#   - aHash: 8x8 흑백 축소 이미지의 각 픽셀이 평균보다 밝은지 (전체 밝기 분포)
+#   - dHash: 9x8 흑백 축소 이미지에서 가로로 이웃한 픽셀의 밝기 증감 (윤곽 구조)
+# 두 해시 모두 최근 사진과의 해밍 거리가 IMAGE_DUPLICATE_THRESHOLD 이하이면 중복으로 본다.
+# 중복 사진은 업로드/분석하지 않고, 어느 사진과 같은지만 참조 기록(IMAGE_REFERENCE_FILE)에 남긴다.
+# =================================================================================
+
+import io
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from Utility import log
+import Config
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+HASH_SIZE = 8
+
+def compute_hashes(source) -> tuple:
+    """(프로세스 풀에서 실행) 원본(JPEG 바이트 또는 파일 경로)의 (aHash, dHash)를 64비트 정수로 계산합니다."""
+    with Image.open(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source) as image:
+        image.draft("L", (HASH_SIZE * 8, HASH_SIZE * 8))  # 축소 디코딩으로 전체 해상도 디코딩을 피함
+        gray = image.convert("L")
+        small = np.asarray(gray.resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR), dtype=np.int16)
+        average = np.asarray(gray.resize((HASH_SIZE, HASH_SIZE), Image.BILINEAR), dtype=np.float32)
+
+    weights = np.uint64(1) << np.arange(HASH_SIZE * HASH_SIZE, dtype=np.uint64)
+    a_bits = (average > average.mean()).ravel()
+    d_bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int(weights[a_bits].sum()), int(weights[d_bits].sum())
+
+def hamming_distances(hashes: np.ndarray, target: int) -> np.ndarray:
+    """해시 배열(uint64)의 각 원소와 target 사이의 해밍 거리를 한 번에 계산합니다."""
+    xor = np.bitwise_xor(hashes, np.uint64(target))
+    return np.unpackbits(xor.view(np.uint8)).reshape(len(hashes), 64).sum(axis=1)
+
+class DuplicateFilter:
+    def __init__(self, history: int = None, threshold: int = None):
+        self.history = deque(maxlen=history or Config.IMAGE_HASH_HISTORY)
+        self.threshold = Config.IMAGE_DUPLICATE_THRESHOLD if threshold is None else threshold
+        self.lock = threading.Lock()
+        self.counts = {"unique": 0, "duplicate": 0}
+
+    def find_duplicate(self, hashes: tuple):
+        """최근 업로드한 사진 중 hashes와 거의 같은 사진의 기록을 반환합니다. 없으면 None을 반환합니다.
+        마지막 업로드 후 IMAGE_DUPLICATE_MAX_AGE가 지났으면 변화가 없어도 새로 업로드하도록 None을 반환합니다."""
+        with self.lock:
+            if not self.history:
+                return None
+            if time.time() - self.history[-1]["uploaded_at"] > Config.IMAGE_DUPLICATE_MAX_AGE:
+                return None
+            records = list(self.history)
+        a_dist = hamming_distances(np.array([r["ahash"] for r in records], dtype=np.uint64), hashes[0])
+        d_dist = hamming_distances(np.array([r["dhash"] for r in records], dtype=np.uint64), hashes[1])
+        distance = np.maximum(a_dist, d_dist)
+        best = int(np.argmin(distance))
+        if distance[best] > self.threshold:
+            return None
+        return dict(records[best], distance=int(distance[best]))
+
+    def remember(self, filename: str, hashes: tuple, object_names: list):
+        """업로드한 사진의 해시를 비교 대상에 추가합니다."""
+        with self.lock:
+            self.history.append({"filename": filename, "ahash": hashes[0], "dhash": hashes[1],
+                                 "object_names": object_names, "uploaded_at": time.time()})
+            self.counts["unique"] += 1
+
+    def record_reference(self, filename: str, duplicate: dict):
+        """중복으로 판단된 사진이 어느 사진을 참조하는지 기록합니다."""
+        with self.lock:
+            self.counts["duplicate"] += 1
+        entry = {
+            "filename": filename,
+            "captured_at": datetime.now().isoformat(timespec="seconds"),
+            "reference": duplicate["filename"],
+            "object_names": duplicate["object_names"],
+            "distance": duplicate["distance"],
+        }
+        try:
+            directory = os.path.dirname(Config.IMAGE_REFERENCE_FILE)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(Config.IMAGE_REFERENCE_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except OSError as e:
+            log.warning(f"[Image] 중복 사진 참조 기록 저장 실패: {e}")
+        log.info(f"[Image] {filename}은(는) {duplicate['filename']}과(와) 거의 같아 업로드하지 않습니다. "
+                 f"(해밍 거리 {duplicate['distance']})")
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"history": len(self.history), "threshold": self.threshold, **self.counts}
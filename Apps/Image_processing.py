@@ -0,0 +1,133 @@
+# =================================================================================
+# Image_processing.py
+# 촬영한 원본 JPEG로부터 업로드할 파생 이미지를 만드는 처리 단계
+#   - IMAGE_DERIVATIVES: 분석용, 앱 썸네일 등 최대 크기로 축소한 이미지
+#   - IMAGE_ROIS: 원본의 관심 영역(상대 좌표)을 잘라낸 이미지
+# 각 파생 이미지는 목표 바이트 수(max_bytes) 이하가 되는 가장 높은 JPEG 품질을 이진 탐색으로 고른다.
+# 이미지 디코딩/인코딩은 CPU를 많이 쓰므로 별도 프로세스 풀에서 실행하여 제어 스레드를 막지 않는다.
+# =================================================================================
+
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from Utility import log
+import Config
+from Image_hash import compute_hashes
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+def encode_within_budget(image, max_bytes: int, quality_min: int, quality_max: int):
+    """max_bytes 이하가 되는 가장 높은 품질로 JPEG 인코딩합니다. (JPEG 바이트, 사용한 품질)을 반환합니다.
+    최저 품질로도 넘으면 최저 품질의 결과를 그대로 반환합니다."""
+    def encode(quality: int) -> bytes:
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=quality, optimize=True)
+        return buffer.getvalue()
+
+    best = None
+    low, high = quality_min, quality_max
+    while low <= high:
+        quality = (low + high) // 2
+        data = encode(quality)
+        if not max_bytes or len(data) <= max_bytes:
+            best = (data, quality)
+            low = quality + 1
+        else:
+            high = quality - 1
+    return best or (encode(quality_min), quality_min)
+
+def render_derivatives(source, specs: list, quality_min: int, quality_max: int) -> list:
+    """(프로세스 풀에서 실행) 원본(JPEG 바이트 또는 파일 경로)으로부터 파생 이미지를 만듭니다.
+    specs는 {"name", "box", "max_size", "max_bytes"} 목록이며, (이름, JPEG 바이트, 품질) 목록을 반환합니다."""
+    with Image.open(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source) as original:
+        # JPEG 디코더의 축소 디코딩으로 필요한 크기에 가깝게 읽어 메모리와 시간을 줄임
+        # (관심 영역이 있으면 원본 해상도가 필요하므로 사용하지 않음)
+        sizes = [spec["max_size"] for spec in specs if not spec.get("box")]
+        if sizes and len(sizes) == len(specs):
+            original.draft("RGB", (max(width for width, _ in sizes), max(height for _, height in sizes)))
+        original = original.convert("RGB")
+
+    results = []
+    for spec in specs:
+        if spec.get("box"):
+            x0, y0, x1, y1 = spec["box"]
+            width, height = original.size
+            image = original.crop((int(x0 * width), int(y0 * height), int(x1 * width), int(y1 * height)))
+        else:
+            image = original.copy()
+        image.thumbnail(tuple(spec["max_size"]), Image.LANCZOS)
+        data, quality = encode_within_budget(image, spec.get("max_bytes"), quality_min, quality_max)
+        results.append((spec["name"], data, quality))
+    return results
+
+def derivative_specs() -> list:
+    """Config의 파생 이미지/관심 영역 설정을 처리 단계에 넘길 목록으로 만듭니다."""
+    specs = []
+    for name, spec in Config.IMAGE_DERIVATIVES.items():
+        specs.append({"name": name, "box": None, "max_size": spec["max_size"], "max_bytes": spec.get("max_bytes"),
+                      "prefix": spec["prefix"]})
+    for name, spec in Config.IMAGE_ROIS.items():
+        specs.append({"name": f"roi_{name}", "box": spec["box"], "max_size": spec["max_size"],
+                      "max_bytes": spec.get("max_bytes"), "prefix": f"images/roi/{name}/"})
+    return specs
+
+class ImageProcessor:
+    def __init__(self, workers: int = None):
+        self.workers = workers or Config.IMAGE_WORKERS
+        self.specs = derivative_specs()
+        self.available = Image is not None
+        self.enabled = self.available and Config.IMAGE_PROCESSING and bool(self.specs)
+        self.executor = None
+        if not self.available:
+            log.warning("Pillow가 설치되어 있지 않아 이미지 처리 단계를 사용하지 않습니다. 원본을 그대로 업로드합니다.")
+
+    def hashes(self, filename: str, source):
+        """원본의 지각 해시 (aHash, dHash)를 계산합니다. 사용할 수 없거나 실패하면 None을 반환합니다."""
+        if not self.available or not Config.IMAGE_DEDUP:
+            return None
+        if self.executor is None:
+            self.start()
+        try:
+            return self.executor.submit(compute_hashes, source).result(timeout=Config.IMAGE_PROCESS_TIMEOUT)
+        except Exception as e:
+            log.error(f"[Image] {filename} 지각 해시 계산 중 오류 발생: {e}")
+            return None
+
+    def process(self, filename: str, source) -> list:
+        """원본(JPEG 바이트 또는 파일 경로)을 처리하여 (파생 이미지 이름, S3 객체 이름, JPEG 바이트) 목록을 반환합니다.
+        처리에 실패하면 빈 목록을 반환하므로, 호출하는 쪽은 원본을 업로드해야 합니다."""
+        if not self.enabled:
+            return []
+        if self.executor is None:
+            self.start()
+        specs = [{key: value for key, value in spec.items() if key != "prefix"} for spec in self.specs]
+        prefixes = {spec["name"]: spec["prefix"] for spec in self.specs}
+        try:
+            future = self.executor.submit(render_derivatives, source, specs,
+                                          Config.IMAGE_QUALITY_MIN, Config.IMAGE_QUALITY_MAX)
+            results = future.result(timeout=Config.IMAGE_PROCESS_TIMEOUT)
+        except Exception as e:
+            log.error(f"[Image] {filename} 파생 이미지 생성 중 오류 발생: {e}")
+            return []
+
+        outputs = []
+        for name, data, quality in results:
+            outputs.append((name, f"{prefixes[name]}{filename}", data))
+            log.info(f"[Image] {filename} -> {name}: {len(data)} bytes (품질 {quality})")
+        return outputs
+
+    def start(self):
+        if not self.available or self.executor:
+            return
+        # 여러 스레드가 동작 중인 프로세스에서 fork하지 않도록 spawn으로 작업 프로세스를 만듦
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        log.info(f"이미지 처리 프로세스 {self.workers}개를 시작합니다. (파생 이미지: {[spec['name'] for spec in self.specs]})")
+
+    def stop(self):
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
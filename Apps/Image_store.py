@@ -0,0 +1,260 @@
+# =================================================================================
+# Image_store.py
+# 촬영한 사진을 라즈베리파이에 보관하는 내용 주소(content-addressed) 저장소
+#   - 사진 데이터는 SHA-256 해시를 이름으로 objects/<앞 2글자>/<해시>.jpg에 한 번만 저장
+#     (중복 사진이나 같은 파생 이미지는 같은 파일을 가리킴)
+#   - index.json에 촬영 시각, 촬영 당시 센서 값(작물 환경), 종류별(원본/분석용/썸네일 등) 해시를 기록
+#   - 센서 값별로 정렬된 색인(메모리)을 두어 "온도 25~30도, 토양 습도 300 이하" 같은 작물 환경 조건으로 바로 조회
+#   - 전체 크기가 IMAGE_STORE_QUOTA_MB를 넘으면 가장 오래 조회되지 않은 사진부터 지움 (LRU)
+#   - 같은 파일 이름으로 다시 저장되어 더 이상 가리키는 사진이 없는 파일은 바로 지움
+# API 서버는 이 저장소에서 바로 목록과 사진을 제공하므로 LAN 안에서는 S3를 거치지 않는다.
+# =================================================================================
+
+import bisect
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from Utility import log
+import Config
+from Sensor_filter import SENSOR_CHANNELS
+
+class ImageStore:
+    def __init__(self, root: str = None, quota_mb: float = None):
+        self.root = root or Config.IMAGE_STORE_DIR
+        self.quota = int((quota_mb or Config.IMAGE_STORE_QUOTA_MB) * 1024 * 1024)
+        self.index_path = os.path.join(self.root, "index.json")
+        self.lock = threading.RLock()
+        self.images = {}        # 파일 이름 -> 메타데이터 (촬영 시각, 센서 값, 종류별 해시)
+        self.blob_sizes = {}    # 해시 -> 파일 크기
+        self.conditions = {channel: [] for channel in SENSOR_CHANNELS}  # 센서 -> (값, 파일 이름) 정렬 목록
+        self.dirty = False
+        self._load()
+
+    # --- 저장 경로와 색인 ---
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], f"{digest}.jpg")
+
+    def _load(self):
+        os.makedirs(self.root, exist_ok=True)
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.images = json.load(f).get("images", {})
+        except FileNotFoundError:
+            self.images = {}
+        except (json.JSONDecodeError, OSError) as e:
+            log.error(f"[ImageStore] 색인 파일을 읽지 못했습니다. 빈 저장소로 시작합니다: {e}")
+            self.images = {}
+
+        # 색인과 실제 파일을 맞춤 (파일이 없는 항목은 해당 종류를 제거)
+        for filename, entry in list(self.images.items()):
+            for variant, digest in list(entry["variants"].items()):
+                path = self.blob_path(digest)
+                if os.path.exists(path):
+                    self.blob_sizes[digest] = os.path.getsize(path)
+                else:
+                    del entry["variants"][variant]
+            if not entry["variants"]:
+                del self.images[filename]
+        for filename, entry in self.images.items():
+            self._index_add(filename, entry)
+        log.info(f"[ImageStore] 사진 {len(self.images)}장, {self.total_size() / 1024 / 1024:.1f}MB를 불러왔습니다.")
+
+    def _save(self):
+        """색인을 임시 파일에 쓴 뒤 교체하여, 쓰는 도중 전원이 꺼져도 이전 색인이 남도록 합니다."""
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"images": self.images}, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.index_path)
+        self.dirty = False
+
+    def flush(self):
+        """조회 시각처럼 저장하지 않고 미뤄 둔 변경이 있으면 색인을 디스크에 씁니다."""
+        with self.lock:
+            if self.dirty:
+                self._save()
+
+    # --- 작물 환경 색인 ---
+
+    def _condition_values(self, entry: dict):
+        for channel in SENSOR_CHANNELS:
+            value = entry["sensors"].get(channel)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                yield channel, float(value)
+
+    def _index_add(self, filename: str, entry: dict):
+        for channel, value in self._condition_values(entry):
+            bisect.insort(self.conditions[channel], (value, filename))
+
+    def _index_remove(self, filename: str, entry: dict):
+        for channel, value in self._condition_values(entry):
+            items = self.conditions[channel]
+            i = bisect.bisect_left(items, (value, filename))
+            if i < len(items) and items[i] == (value, filename):
+                del items[i]
+
+    def _match_conditions(self, ranges: dict) -> set:
+        """센서별 (최소, 최대) 범위를 모두 만족하는 파일 이름 집합을 반환합니다. None인 경계는 제한하지 않습니다."""
+        matched = None
+        for channel, (low, high) in ranges.items():
+            items = self.conditions.get(channel)
+            if items is None:
+                raise ValueError(f"알 수 없는 센서입니다: {channel}")
+            lo = 0 if low is None else bisect.bisect_left(items, (float(low), ""))
+            hi = len(items) if high is None else bisect.bisect_right(items, (float(high), "\uffff"))
+            names = {filename for _, filename in items[lo:hi]}
+            matched = names if matched is None else matched & names
+        return matched
+
+    # --- 저장 ---
+
+    def _write_blob(self, source) -> str:
+        """JPEG 바이트 또는 파일 경로를 해시 이름으로 저장하고 해시를 반환합니다. 이미 있으면 다시 쓰지 않습니다."""
+        if isinstance(source, str):
+            digest = hashlib.sha256()
+            with open(source, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            digest = digest.hexdigest()
+        else:
+            digest = hashlib.sha256(source).hexdigest()
+
+        path = self.blob_path(digest)
+        if digest not in self.blob_sizes:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + ".tmp"
+            if isinstance(source, str):
+                shutil.copyfile(source, tmp_path)
+            else:
+                with open(tmp_path, "wb") as f:
+                    f.write(source)
+            os.replace(tmp_path, path)
+            self.blob_sizes[digest] = os.path.getsize(path)
+        return digest
+
+    def _delete_blob(self, digest: str) -> int:
+        """파일을 지우고 확보한 크기를 반환합니다."""
+        size = self.blob_sizes.pop(digest, 0)
+        try:
+            os.remove(self.blob_path(digest))
+        except FileNotFoundError:
+            pass
+        return size
+
+    def _set_entry(self, filename: str, entry: dict):
+        """항목을 저장합니다. 같은 이름의 이전 항목이 있으면 색인에서 빼고, 더 이상 아무도 가리키지 않는 파일은 지웁니다."""
+        previous = self.images.get(filename)
+        if previous:
+            self._index_remove(filename, previous)
+        self.images[filename] = entry
+        self._index_add(filename, entry)
+        if previous:
+            orphaned = set(previous["variants"].values()) - set(entry["variants"].values())
+            if orphaned:
+                referenced = {digest for other in self.images.values() for digest in other["variants"].values()}
+                for digest in orphaned - referenced:
+                    self._delete_blob(digest)
+
+    def put(self, filename: str, variants: dict, sensors: dict = None, object_names: list = None,
+            captured_at: datetime = None):
+        """사진을 저장합니다. variants는 종류 이름 -> JPEG 바이트 또는 파일 경로입니다.
+        captured_at은 촬영 시각이며, 없으면 저장하는 시각을 사용합니다."""
+        with self.lock:
+            try:
+                digests = {variant: self._write_blob(source) for variant, source in variants.items()}
+            except OSError as e:
+                log.error(f"[ImageStore] {filename} 저장 실패: {e}")
+                return None
+            self._set_entry(filename, {
+                "captured_at": (captured_at or datetime.now()).isoformat(timespec="seconds"),
+                "sensors": sensors or {},
+                "variants": digests,
+                "object_names": object_names or [],
+                "reference": None,
+                "last_access": time.time(),
+            })
+            self._evict()
+            self._save()
+            return dict(self.images.get(filename, {}), filename=filename)
+
+    def put_reference(self, filename: str, reference: str, sensors: dict = None, captured_at: datetime = None):
+        """중복으로 판단된 사진을 참조 대상 사진의 데이터를 가리키는 항목으로 저장합니다."""
+        with self.lock:
+            target = self.images.get(reference)
+            if not target:
+                return None
+            target["last_access"] = time.time()
+            self._set_entry(filename, {
+                "captured_at": (captured_at or datetime.now()).isoformat(timespec="seconds"),
+                "sensors": sensors or {},
+                "variants": dict(target["variants"]),
+                "object_names": list(target["object_names"]),
+                "reference": reference,
+                "last_access": time.time(),
+            })
+            self._save()
+            return dict(self.images[filename], filename=filename)
+
+    def _evict(self):
+        """전체 크기가 할당량 이하가 될 때까지 가장 오래 조회되지 않은 사진을 지웁니다."""
+        total = self.total_size()
+        if total <= self.quota:
+            return
+        # 여러 사진(중복 사진 참조 등)이 같은 파일을 가리킬 수 있으므로 참조 수가 0이 된 파일만 지움
+        references = Counter(digest for entry in self.images.values() for digest in entry["variants"].values())
+        for filename in sorted(self.images, key=lambda name: self.images[name]["last_access"]):
+            if total <= self.quota or len(self.images) <= 1:
+                break
+            entry = self.images.pop(filename)
+            self._index_remove(filename, entry)
+            for digest in entry["variants"].values():
+                references[digest] -= 1
+                if references[digest] > 0 or digest not in self.blob_sizes:
+                    continue
+                total -= self._delete_blob(digest)
+            log.info(f"[ImageStore] 저장 공간 확보를 위해 {filename}을(를) 지웠습니다. (현재 {total / 1024 / 1024:.1f}MB)")
+
+    # --- 조회 ---
+
+    def total_size(self) -> int:
+        with self.lock:
+            return sum(self.blob_sizes.values())
+
+    def list_images(self, start: str = None, end: str = None, limit: int = 50, conditions: dict = None) -> list:
+        """촬영 시각(ISO 형식) 범위의 사진 메타데이터를 최신순으로 반환합니다.
+        conditions는 센서 -> (최소, 최대) 범위이며, 촬영 당시 센서 값이 모든 범위 안에 있는 사진만 반환합니다."""
+        with self.lock:
+            names = self.images if not conditions else self._match_conditions(conditions)
+            entries = [dict(entry, filename=filename) for filename, entry in ((name, self.images[name]) for name in names)
+                       if (not start or entry["captured_at"] >= start) and (not end or entry["captured_at"] <= end)]
+        entries.sort(key=lambda entry: entry["captured_at"], reverse=True)
+        return entries[:limit]
+
+    def get_path(self, filename: str, variant: str):
+        """사진의 해당 종류 파일 경로와 해시를 반환하고 조회 시각을 갱신합니다. 없으면 (None, None)을 반환합니다.
+        조회 경로에서는 디스크에 쓰지 않으며, 바뀐 조회 시각은 다음 저장이나 flush 때 함께 기록됩니다."""
+        with self.lock:
+            entry = self.images.get(filename)
+            if not entry or variant not in entry["variants"]:
+                return None, None
+            entry["last_access"] = time.time()
+            self.dirty = True
+            digest = entry["variants"][variant]
+            return self.blob_path(digest), digest
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "images": len(self.images),
+                "blobs": len(self.blob_sizes),
+                "size_mb": round(self.total_size() / 1024 / 1024, 1),
+                "quota_mb": round(self.quota / 1024 / 1024, 1),
+            }
@@ -0,0 +1,263 @@
+# =================================================================================
+# Local_cloud.py
+# AWS 없이 시험할 수 있도록 클라우드 서비스를 로컬 디렉토리로 흉내 내는 대체 구현
+#   - LocalS3Client: boto3 S3 클라이언트에서 사용하는 메서드를 같은 이름/인자로 제공하며,
+#     객체를 LOCAL_CLOUD_DIR/<버킷>/<키>에 저장한다.
+#   - LocalMQTTClient: paho MQTT 클라이언트에서 사용하는 메서드를 제공하는 브로커 대체 구현으로,
+#     발행된 메시지를 LOCAL_CLOUD_DIR/mqtt/<토픽>.jsonl에 기록하고 inject()로 구독 메시지를 흉내 낸다.
+# Config.CLOUD_BACKEND = "LOCAL"이면 AWSHandler가 boto3/paho 대신 이 클라이언트들을 사용한다.
+# 연결 끊김은 online 속성을 False로 하거나 LOCAL_CLOUD_OFFLINE_FILE 파일을 만들어 흉내 낸다.
+# S3 오류 응답은 LocalS3Client.errors에 {키 접두사: 오류 코드}(예: {"images/bad": "AccessDenied"})를 넣어 흉내 낸다.
+# =================================================================================
+
+import base64
+import io
+import json
+import os
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+from botocore.exceptions import ClientError
+
+import Config
+
+CHUNK_SIZE = 64 * 1024  # 전송 콜백 단위 (bytes)
+
+class LocalS3Client:
+    def __init__(self, root: str = None):
+        self.root = root or Config.LOCAL_CLOUD_DIR
+        self.online = True
+        self.lock = threading.Lock()
+        self.put_count = 0      # 업로드(PUT) 요청 수 (비용 확인용)
+        self.errors = {}        # 키 접두사 -> S3 오류 코드 (해당 키의 업로드가 ClientError로 실패)
+
+    def _check_online(self):
+        if not self.online or os.path.exists(Config.LOCAL_CLOUD_OFFLINE_FILE):
+            raise ConnectionError("로컬 클라우드가 오프라인 상태입니다.")
+
+    def _check_error(self, key: str):
+        for prefix, code in self.errors.items():
+            if key.startswith(prefix):
+                raise ClientError({"Error": {"Code": code, "Message": f"로컬 클라우드 오류: {code}"}}, "PutObject")
+
+    def _path(self, bucket: str, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, bucket, key))
+        if not path.startswith(os.path.normpath(os.path.join(self.root, bucket)) + os.sep):
+            raise ValueError(f"잘못된 객체 키입니다: {key}")
+        return path
+
+    def _write(self, bucket: str, key: str, write):
+        """임시 파일에 쓴 뒤 교체하여, 중간에 실패한 업로드가 객체로 남지 않도록 합니다."""
+        self._check_online()
+        self._check_error(key)
+        path = self._path(bucket, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+        with self.lock:
+            self.put_count += 1
+
+    # --- boto3 S3 클라이언트 호환 메서드 ---
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, Callback=None, Config=None):
+        with open(Filename, "rb") as source:
+            self.upload_fileobj(source, Bucket, Key, ExtraArgs, Callback, Config)
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, Callback=None, Config=None):
+        # boto3처럼 조각을 보낼 때마다 Callback(보낸 바이트 수)을 호출
+        def write(f):
+            for chunk in iter(lambda: Fileobj.read(CHUNK_SIZE), b""):
+                f.write(chunk)
+                if Callback:
+                    Callback(len(chunk))
+        self._write(Bucket, Key, write)
+
+    def put_object(self, Bucket, Key, Body=b"", **kwargs):
+        if isinstance(Body, str):
+            Body = Body.encode("utf-8")
+        elif hasattr(Body, "read"):
+            Body = Body.read()
+        self._write(Bucket, Key, lambda f: f.write(Body))
+        return {}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        # boto3처럼 Body는 read()로 읽는 스트림이고, 없는 키는 NoSuchKey ClientError
+        self._check_online()
+        try:
+            with open(self._path(Bucket, Key), "rb") as f:
+                return {"Body": io.BytesIO(f.read())}
+        except FileNotFoundError:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": f"없는 객체입니다: {Key}"}}, "GetObject")
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self._check_online()
+        return {"ContentLength": os.path.getsize(self._path(Bucket, Key))}
+
+    def list_objects_v2(self, Bucket, Prefix="", **kwargs):
+        self._check_online()
+        base = os.path.join(self.root, Bucket)
+        contents = []
+        for directory, _, files in os.walk(base):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                key = os.path.relpath(os.path.join(directory, name), base).replace(os.sep, "/")
+                if key.startswith(Prefix):
+                    contents.append({"Key": key, "Size": os.path.getsize(os.path.join(directory, name))})
+        contents.sort(key=lambda item: item["Key"])
+        return {"Contents": contents, "KeyCount": len(contents)}
+
+class LocalMessageInfo:
+    """paho의 MQTTMessageInfo처럼 발행 결과(rc, mid)와 PUBACK 대기를 제공합니다."""
+    def __init__(self, mid: int, rc: int):
+        self.mid = mid
+        self.rc = rc
+        self._published = threading.Event()
+
+    def wait_for_publish(self, timeout: float = None):
+        if self.rc not in (mqtt.MQTT_ERR_SUCCESS, mqtt.MQTT_ERR_NO_CONN):
+            raise RuntimeError(f"Message publish failed: {mqtt.error_string(self.rc)}")
+        self._published.wait(timeout)
+
+    def is_published(self) -> bool:
+        return self._published.is_set()
+
+class LocalMQTTClient:
+    def __init__(self, root: str = None):
+        self.root = os.path.join(root or Config.LOCAL_CLOUD_DIR, "mqtt")
+        self.online = True
+        self.lock = threading.Lock()
+        self.on_connect = None
+        self.on_disconnect = None
+        self.on_message = None
+        self.connect_requested = False  # connect() 이후 연결이 돌아오면 자동으로 다시 연결
+        self.connected = False
+        self.subscriptions = {}         # 토픽 필터 -> QoS
+        self.pending = []               # 연결이 끊긴 동안 보관한 QoS 1 이상 메시지 [(토픽, 데이터, QoS, LocalMessageInfo)]
+        self.published = []             # 브로커에 전달된 메시지 [(토픽, 데이터)] (시험 확인용)
+        self.mid = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def _broker_online(self) -> bool:
+        return self.online and not os.path.exists(Config.LOCAL_CLOUD_OFFLINE_FILE)
+
+    def _deliver(self, topic: str, payload: bytes, info: LocalMessageInfo):
+        """브로커에 메시지를 기록합니다. (호출 시 lock을 잡고 있어야 함)"""
+        os.makedirs(self.root, exist_ok=True)
+        try:
+            record = {"time": time.time(), "payload": payload.decode("utf-8")}
+        except UnicodeDecodeError:
+            record = {"time": time.time(), "payload_b64": base64.b64encode(payload).decode("ascii")}
+        with open(os.path.join(self.root, topic.replace("/", "__") + ".jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.published.append((topic, payload))
+        info._published.set()
+
+    def _check_link(self):
+        """브로커 상태가 바뀌었으면 연결/끊김 콜백을 호출하고, 다시 연결되면 보관한 메시지를 전달합니다."""
+        with self.lock:
+            online = self.connect_requested and self._broker_online()
+            if online == self.connected:
+                return
+            self.connected = online
+            if online:
+                for topic, payload, qos, info in self.pending:
+                    self._deliver(topic, payload, info)
+                self.pending.clear()
+        if online and self.on_connect:
+            self.on_connect(self, None, {}, 0, None)
+        elif not online and self.on_disconnect:
+            self.on_disconnect(self, None, {}, 1, None)
+
+    # --- paho 클라이언트 호환 메서드 ---
+
+    def tls_set(self, *args, **kwargs):
+        pass
+
+    def connect(self, host=None, port=None, keepalive=60):
+        if not self._broker_online():
+            raise ConnectionError("로컬 브로커가 오프라인 상태입니다.")
+        self.connect_requested = True
+        self._check_link()
+        return mqtt.MQTT_ERR_SUCCESS
+
+    def connect_async(self, host=None, port=None, keepalive=60):
+        """paho처럼 연결을 예약만 하고, loop_start()의 스레드가 브로커가 온라인이 되면 연결합니다."""
+        self.connect_requested = True
+        return mqtt.MQTT_ERR_SUCCESS
+
+    def reconnect_delay_set(self, min_delay=1, max_delay=120):
+        pass
+
+    def disconnect(self):
+        self.connect_requested = False
+        self._check_link()
+        return mqtt.MQTT_ERR_SUCCESS
+
+    def is_connected(self) -> bool:
+        self._check_link()
+        return self.connected
+
+    def socket(self):
+        return self if self.is_connected() else None
+
+    def loop_misc(self):
+        self._check_link()
+        return mqtt.MQTT_ERR_SUCCESS
+
+    def _loop(self):
+        while not self.stop_event.wait(0.2):
+            self._check_link()
+
+    def loop_start(self):
+        if self.thread is None:
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._loop, daemon=True)
+            self.thread.start()
+        return mqtt.MQTT_ERR_SUCCESS
+
+    def loop_stop(self):
+        self.stop_event.set()
+        self.thread = None
+        return mqtt.MQTT_ERR_SUCCESS
+
+    def subscribe(self, topic: str, qos: int = 0):
+        with self.lock:
+            self.subscriptions[topic] = qos
+            self.mid += 1
+            return mqtt.MQTT_ERR_SUCCESS, self.mid
+
+    def publish(self, topic: str, payload=None, qos: int = 0, retain: bool = False) -> LocalMessageInfo:
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        payload = bytes(payload or b"")
+        self._check_link()
+        with self.lock:
+            self.mid += 1
+            if self.connected:
+                info = LocalMessageInfo(self.mid, mqtt.MQTT_ERR_SUCCESS)
+                self._deliver(topic, payload, info)
+                return info
+            # paho처럼 연결이 끊겨 있으면 QoS 1 이상 메시지는 보관했다가 다시 연결되면 전송
+            info = LocalMessageInfo(self.mid, mqtt.MQTT_ERR_NO_CONN)
+            if qos > 0:
+                self.pending.append((topic, payload, qos, info))
+            return info
+
+    # --- 시험용 ---
+
+    def inject(self, topic: str, payload) -> bool:
+        """클라우드에서 이 장치로 메시지를 보낸 것처럼 구독 콜백을 호출합니다. 구독 중인 토픽이 아니면 False를 반환합니다."""
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        if not self.is_connected() or not any(mqtt.topic_matches_sub(sub, topic) for sub in self.subscriptions):
+            return False
+        message = mqtt.MQTTMessage(topic=topic.encode("utf-8"))
+        message.payload = payload
+        if self.on_message:
+            self.on_message(self, None, message)
+        return True
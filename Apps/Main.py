@@ -7,35 +7,60 @@
 
 # 외부 모듈 호출
 import signal
+import asyncio
 
 # 내부 모듈 호출
 from Utility import log
 from _System_ import SystemState
 from Arduino_control import HardwareController
+from Actuator_arbiter import ActuatorArbiter
 from Auto_control import AutoController
+from Sampling_control import SamplingController
 from AWS_control import AWSHandler
 from CLI_control import CameraHandler
+from Telemetry import TelemetryPublisher
+from Commands import CommandRouter
+from State_sync import StateSync
 from API import run_api_server
+from Scheduler import Scheduler
+import Config
 
 # 전역 인스턴스, 핵심 컴포넌트들을 담을 변수
 state: SystemState = None
 hardware: HardwareController = None
+arbiter: ActuatorArbiter = None
 auto_control: AutoController = None
+sampling: SamplingController = None
 aws: AWSHandler = None
 cli: CameraHandler = None
+telemetry: TelemetryPublisher = None
+state_sync: StateSync = None
+scheduler: Scheduler = None
 
 def graceful_shutdown(signum, frame):
     """Ctrl+C와 같은 종료 신호를 받았을 때 안전하게 종료하는 함수."""
     log.info("강제 종료를 인식하였습니다. 종료를 시작합니다.")
     
+    if sampling:
+        sampling.stop()
     if auto_control:
         auto_control.stop()
+    if arbiter:
+        arbiter.stop()
     if hardware:
         hardware.stop()
+    if telemetry:
+        telemetry.stop()
+    if state_sync:
+        state_sync.stop()
     if aws:
         aws.stop_mqtt_listener()
     if cli:
         cli.stop()
+    if aws:
+        aws.manifests.stop()
+    if scheduler:
+        scheduler.stop()
     
     log.info("모든 기능 정지. 이제 나가 주시길 바랍니다.")
     exit(0)
@@ -54,16 +79,42 @@ if __name__ == "__main__":
         log.info("중요 요소들을 초기화합니다.")
         state = SystemState()
         hardware = HardwareController(state)
+        arbiter = ActuatorArbiter(state, hardware)
         aws = AWSHandler(state)
-        cli = CameraHandler(state, hardware, aws)
-        auto_control = AutoController(state, hardware)
+        cli = CameraHandler(state, hardware, aws, arbiter)
+        auto_control = AutoController(state, hardware, arbiter)
+        sampling = SamplingController(state, hardware, auto_control)
+        # REST API와 MQTT 명령 채널이 같은 명령 처리기를 사용 (같은 검증 규칙, 요청 ID 중복 확인 공유)
+        command_router = CommandRouter(state, arbiter, cli)
+        aws.set_command_router(command_router)
+        if Config.SHADOW_ENABLED:
+            state_sync = StateSync(state, aws, command_router)
+        if Config.TELEMETRY_ENABLED:
+            telemetry = TelemetryPublisher(state, aws)
         log.info("모든 요소들이 초기화되엇습니다.")
 
+        # ASYNC 모드: 모든 컴포넌트와 API 서버를 하나의 이벤트 루프에서 실행 (종료 신호도 런타임이 처리)
+        if Config.RUNTIME_MODE == "ASYNC":
+            from Async_runtime import AsyncRuntime
+            asyncio.run(AsyncRuntime(state, hardware, arbiter, auto_control, sampling, aws, cli, telemetry, state_sync).run())
+            exit(0)
+
         # 백그라운드 스레드 시작
         # 하드웨어 통신과 자동 제어는 백그라운드에서 계속 실행
-        hardware.start()
-        auto_control.start()
-        cli.start()
+        # SCHEDULER 모드에서는 컴포넌트별 스레드 대신 스케줄러에 작업을 등록
+        if Config.RUNTIME_MODE == "SCHEDULER":
+            scheduler = Scheduler()
+            scheduler.start()
+        hardware.start(scheduler)
+        arbiter.start(scheduler)
+        auto_control.start(scheduler)
+        sampling.start(scheduler)
+        cli.start(scheduler)
+        aws.manifests.start(scheduler)
+        if telemetry:
+            telemetry.start(scheduler)
+        if state_sync:
+            state_sync.start(scheduler)
         
         # AWS MQTT 리스너 시작 (인증서 설정 후 주석 해제 필요)
         aws.start_mqtt_listener()
@@ -74,7 +125,10 @@ if __name__ == "__main__":
         run_api_server(
             state_instance=state,
             hardware_instance=hardware,
-            camera_instance=cli
+            camera_instance=cli,
+            scheduler_instance=scheduler,
+            arbiter_instance=arbiter,
+            command_router_instance=command_router
         ) 
 
     except Exception as e:
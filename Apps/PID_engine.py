@@ -0,0 +1,132 @@
+# =================================================================================
+# PID_engine.py
+# 여러 개의 PID 루프(온도, 습도, 토양 습도 x 구역)를 numpy 배열로 묶어 한 번에 계산
+# 게인, 적분값, 이전 오차, 출력 제한을 루프별 배열로 보관하며
+# 개별 루프는 Utility.PID와 같은 compute() 인터페이스로도 사용할 수 있다.
+# =================================================================================
+
+import numpy as np
+
+from Utility import system_clock
+
+class PIDLoop:
+    """PIDEngine 안의 루프 하나를 Utility.PID처럼 다루기 위한 뷰 객체입니다."""
+    def __init__(self, engine, index: int, name: str):
+        self.engine = engine
+        self.index = index
+        self.name = name
+
+    def compute(self, measured_value, now=None):
+        return self.engine.compute_one(self.index, measured_value, now)
+
+    def reset(self):
+        self.engine.reset(self.index)
+
+    def _get(self, array_name):
+        return float(getattr(self.engine, array_name)[self.index])
+
+    def _set(self, array_name, value):
+        getattr(self.engine, array_name)[self.index] = value
+
+    setpoint = property(lambda self: self._get("setpoint"), lambda self, v: self._set("setpoint", v))
+    Kp = property(lambda self: self._get("kp"), lambda self, v: self._set("kp", v))
+    Ki = property(lambda self: self._get("ki"), lambda self, v: self._set("ki", v))
+    Kd = property(lambda self: self._get("kd"), lambda self, v: self._set("kd", v))
+    integral = property(lambda self: self._get("integral"), lambda self, v: self._set("integral", v))
+    last_error = property(lambda self: self._get("last_error"), lambda self, v: self._set("last_error", v))
+    last_time = property(lambda self: self._get("last_time"), lambda self, v: self._set("last_time", v))
+
+class PIDEngine:
+    # 루프별 상태 배열 이름
+    _ARRAYS = ("kp", "ki", "kd", "setpoint", "integral", "last_error", "last_time", "out_min", "out_max", "output")
+
+    def __init__(self, capacity: int = 8, clock=None):
+        self.clock = clock or system_clock
+        self.size = 0
+        self.names = []
+        self.loops = {}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        """배열을 capacity 크기로 (재)할당하고 기존 값을 복사합니다."""
+        for array_name in self._ARRAYS:
+            new_array = np.zeros(capacity)
+            if hasattr(self, array_name):
+                new_array[:self.size] = getattr(self, array_name)[:self.size]
+            setattr(self, array_name, new_array)
+        self.capacity = capacity
+
+    def add_loop(self, name: str, Kp, Ki, Kd, setpoint, out_min=-np.inf, out_max=np.inf, now=None) -> PIDLoop:
+        """새 루프를 등록하고 해당 루프의 뷰를 반환합니다."""
+        if name in self.loops:
+            raise ValueError(f"이미 등록된 PID 루프입니다: {name}")
+        if self.size == self.capacity:
+            self._allocate(self.capacity * 2)
+
+        i = self.size
+        self.kp[i], self.ki[i], self.kd[i] = Kp, Ki, Kd
+        self.setpoint[i] = setpoint
+        self.integral[i], self.last_error[i], self.output[i] = 0.0, 0.0, 0.0
+        self.out_min[i], self.out_max[i] = out_min, out_max
+        self.last_time[i] = self.clock.time() if now is None else now
+
+        self.size += 1
+        self.names.append(name)
+        self.loops[name] = PIDLoop(self, i, name)
+        return self.loops[name]
+
+    def loop(self, name: str) -> PIDLoop:
+        return self.loops[name]
+
+    def step(self, measured, now=None):
+        """등록된 모든 루프를 한 번에 계산합니다.
+        measured는 등록 순서대로의 측정값 배열이며, nan인 루프는 이번 계산에서 제외됩니다.
+        반환되는 배열은 내부 버퍼이므로 다음 step 호출 전에 필요한 값을 복사해야 합니다."""
+        n = self.size
+        now = self.clock.time() if now is None else now
+        measured = np.asarray(measured, dtype=float)
+
+        dt = now - self.last_time[:n]
+        active = (dt > 0) & np.isfinite(measured)
+        safe_dt = np.where(active, dt, 1.0)
+
+        error = self.setpoint[:n] - measured
+        integral = self.integral[:n] + np.where(active, error * safe_dt, 0.0)
+        derivative = (error - self.last_error[:n]) / safe_dt
+        raw = self.kp[:n] * error + self.ki[:n] * integral + self.kd[:n] * derivative
+        output = np.clip(raw, self.out_min[:n], self.out_max[:n])
+
+        # 출력이 포화된 방향으로는 적분을 누적하지 않음 (anti-windup)
+        windup = (raw != output) & (np.sign(error) == np.sign(raw))
+        np.copyto(self.integral[:n], integral, where=active & ~windup)
+        np.copyto(self.last_error[:n], error, where=active)
+        np.copyto(self.last_time[:n], now, where=active)
+        self.output[:n] = np.where(active, output, 0.0)
+        return self.output[:n]
+
+    def compute_one(self, i: int, measured_value, now=None):
+        """루프 하나만 계산합니다. Utility.PID.compute와 같은 결과를 반환합니다."""
+        now = self.clock.time() if now is None else now
+        dt = now - self.last_time[i]
+        if dt <= 0: return 0
+
+        error = self.setpoint[i] - measured_value
+        integral = self.integral[i] + error * dt
+        derivative = (error - self.last_error[i]) / dt
+        raw = self.kp[i] * error + self.ki[i] * integral + self.kd[i] * derivative
+        output = min(max(raw, self.out_min[i]), self.out_max[i])
+
+        windup = raw != output and np.sign(error) == np.sign(raw)
+        if not windup:
+            self.integral[i] = integral
+        self.last_error[i] = error
+        self.last_time[i] = now
+        self.output[i] = output
+        return float(output)
+
+    def reset(self, i=None):
+        """적분값과 이전 오차를 초기화합니다. i가 없으면 모든 루프를 초기화합니다."""
+        target = slice(0, self.size) if i is None else i
+        self.integral[target] = 0.0
+        self.last_error[target] = 0.0
+        self.output[target] = 0.0
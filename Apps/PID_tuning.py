@@ -0,0 +1,246 @@
+# =================================================================================
+# PID_tuning.py
+# 기록된 센서/액추에이터 이력으로 온실 모델을 추정하고,
+# 수천 개의 (Kp, Ki, Kd) 조합을 numpy 배치 시뮬레이션으로 한 번에 평가하는 오프라인 튜닝 도구
+# 오버슈트, 정착 시간, 액추에이터 가동률 기준의 파레토 최적 게인을 출력한다.
+# 사용 예: python PID_tuning.py --history hist.csv --hours 6
+# 이력은 다음 중 하나를 사용할 수 있다.
+#   - CSV: time(epoch 초 또는 ISO 시각), TEMP, SOIL, FAN, PUMP, HEAT_PANNEL 열 (Simulation.py --export, 실제 기록 모두 가능)
+#     TEMP_RAW/SOIL_RAW 열(필터 전 측정값)이 있으면 모델과 측정 잡음을 그 값으로 추정한다.
+#   - JSONL: 원격 측정 묶음(Telemetry.py 형식)을 한 줄에 하나씩 모은 파일 (TELEMETRY_BUFFER_FILE 등)
+# 필터를 거친 값만 있으면 측정 잡음이 필터 후 잡음으로 추정되므로, 시뮬레이션에서 필터를 다시 적용하지 않는다.
+# =================================================================================
+
+import argparse
+import csv
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+
+import Config
+from PID_engine import PIDEngine
+from Sensor_filter import make_filter
+from Simulation import PlantParams
+
+REQUIRED_FIELDS = ("time", "TEMP", "SOIL", "FAN", "PUMP", "HEAT_PANNEL")
+OPTIONAL_FIELDS = ("TEMP_RAW", "SOIL_RAW")
+
+def _parse_time(text: str) -> float:
+    try:
+        return float(text)
+    except ValueError:
+        return datetime.fromisoformat(text).timestamp()
+
+def _load_csv(path: str) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        missing = [name for name in REQUIRED_FIELDS if name not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"이력 CSV에 필요한 열이 없습니다: {missing}")
+        fields = REQUIRED_FIELDS + tuple(name for name in OPTIONAL_FIELDS if name in reader.fieldnames)
+        rows = []
+        for row in reader:
+            # 값이 빠진 줄(기록 중 누락)은 건너뜀
+            if any(row[name] in (None, "") for name in fields):
+                continue
+            rows.append({name: _parse_time(row[name]) if name == "time" else float(row[name]) for name in fields})
+    return rows
+
+def _load_telemetry(path: str) -> list:
+    """원격 측정 묶음(JSONL)을 샘플 단위로 풉니다. 센서 값은 scale로 나누어 원래 값으로 되돌립니다."""
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            batch = json.loads(line)
+            scale = batch.get("scale", 1)
+            for i, offset in enumerate(batch["dt"]):
+                sensors = {name: values[i] for name, values in batch["sensor"].items()}
+                actuators = {name: values[i] for name, values in batch["actuator"].items()}
+                if any(sensors.get(name) is None for name in ("TEMP", "SOIL")):
+                    continue
+                rows.append({"time": batch["t0"] + offset,
+                             "TEMP": sensors["TEMP"] / scale, "SOIL": sensors["SOIL"] / scale,
+                             **{name: float(actuators.get(name) or 0) for name in ("FAN", "PUMP", "HEAT_PANNEL")}})
+    return rows
+
+def load_history(path: str) -> dict:
+    """이력 파일(CSV 또는 원격 측정 JSONL)을 열 이름별 numpy 배열로 읽어옵니다.
+    시각 순으로 정렬하고 같은 시각의 중복 샘플은 하나만 남깁니다."""
+    rows = _load_telemetry(path) if path.endswith(".jsonl") else _load_csv(path)
+    if len(rows) < 3:
+        raise ValueError(f"이력 샘플이 너무 적습니다: {len(rows)}개")
+    rows.sort(key=lambda row: row["time"])
+    rows = [row for i, row in enumerate(rows) if i == 0 or row["time"] > rows[i - 1]["time"]]
+    return {name: np.array([row[name] for row in rows]) for name in rows[0]}
+
+def has_raw_series(history: dict) -> bool:
+    """필터 전 측정값이 기록되어 있는지 반환합니다."""
+    return "TEMP_RAW" in history and "SOIL_RAW" in history
+
+def fit_plant(history: dict) -> PlantParams:
+    """최소제곱법으로 1차 온도/토양 모델 파라미터를 추정합니다.
+    dT/dt = -(loss + fan_rate*fan)(T - T_out) + heater_rate*heater
+    dS/dt = -dry_rate + pump_rate*pump
+    외기 온도는 기록 구간 동안 일정하다고 가정합니다. 필터 전 측정값(*_RAW)이 있으면 그 값으로 추정합니다.
+    필터를 거친 값으로 추정하면 temp_noise는 필터 후의 잡음입니다."""
+    t = history["time"]
+    raw = has_raw_series(history)
+    temp = history["TEMP_RAW"] if raw else history["TEMP"]
+    soil = history["SOIL_RAW"] if raw else history["SOIL"]
+    fan = history["FAN"][:-1] / 255
+    heater = (history["HEAT_PANNEL"][:-1] > 0).astype(float)
+    pump = history["PUMP"][:-1] / 255
+    dt = np.diff(t)
+    dtemp = np.diff(temp) / dt
+    dsoil = np.diff(soil) / dt
+    T = temp[:-1]
+
+    # dT/dt = c0 + c1*T + c2*heater + c3*fan + c4*fan*T
+    A = np.column_stack([np.ones_like(T), T, heater, fan, fan * T])
+    c, *_ = np.linalg.lstsq(A, dtemp, rcond=None)
+    loss_rate = max(-c[1], 1e-6)
+    residual = dtemp - A @ c
+
+    B = np.column_stack([-np.ones_like(pump), pump])
+    s, *_ = np.linalg.lstsq(B, dsoil, rcond=None)
+
+    return PlantParams(
+        outside_temp=float(c[0] / loss_rate),
+        outside_swing=0.0,
+        loss_rate=float(loss_rate),
+        heater_rate=float(max(c[2], 0.0)),
+        fan_rate=float(max(-c[4], 0.0)),
+        soil_dry_rate=float(max(s[0], 0.0)),
+        pump_rate=float(max(s[1], 0.0)),
+        # 차분 잡음은 측정 잡음의 약 sqrt(2)배
+        temp_noise=float(np.std(residual) * np.median(dt) / np.sqrt(2)),
+    )
+
+def batch_simulate(params: PlantParams, kp, ki, kd, target_temp: float, initial_temp: float,
+                   hours: float, dt: float = None, seed: int = 0, apply_filter: bool = True) -> dict:
+    """게인 조합 G개를 동시에 시뮬레이션하여 조합별 지표 배열을 반환합니다.
+    제어 규칙은 AutoController와 동일합니다 (출력 > 2: 히터, < -2: 팬 200).
+    apply_filter가 False이면 temp_noise가 이미 필터 후의 잡음이므로 센서 필터를 다시 적용하지 않습니다."""
+    dt = Config.SAMPLE_INTERVAL_NORMAL / 1000 if dt is None else dt
+    steps = int(hours * 3600 / dt)
+    G = len(kp)
+    rng = np.random.default_rng(seed)
+
+    engine = PIDEngine(capacity=G)
+    for i in range(G):
+        engine.add_loop(str(i), kp[i], ki[i], kd[i], target_temp, now=0.0)
+    temp_filter = make_filter(Config.SENSOR_FILTERS.get("TEMP", "NONE") if apply_filter else "NONE", G)
+
+    temp = np.full(G, float(initial_temp))
+    heater = np.zeros(G)
+    fan = np.zeros(G)
+    sign = 1.0 if initial_temp <= target_temp else -1.0
+    crossed = np.zeros(G, dtype=bool)
+    overshoot = np.zeros(G)
+    last_outside = np.zeros(G)
+    heater_on = np.zeros(G)
+    fan_on = np.zeros(G)
+    switches = np.zeros(G)
+
+    for k in range(1, steps + 1):
+        now = k * dt
+        # 모든 조합에 같은 잡음을 주어 공정하게 비교
+        temp += (-(params.loss_rate + params.fan_rate * fan / 255) * (temp - params.outside_temp)
+                 + params.heater_rate * heater) * dt
+        measured = temp_filter.update(temp + rng.normal(0, params.temp_noise))
+        output = engine.step(measured, now)
+
+        new_heater = (output > 2).astype(float)
+        new_fan = np.where(output < -2, 200.0, 0.0)
+        switches += (new_heater != heater) + (new_fan != fan)
+        heater, fan = new_heater, new_fan
+        heater_on += heater
+        fan_on += fan > 0
+
+        excursion = sign * (temp - target_temp)
+        crossed |= excursion >= 0
+        overshoot = np.where(crossed, np.maximum(overshoot, excursion), overshoot)
+        last_outside = np.where(np.abs(temp - target_temp) > Config.SIM_SETTLE_BAND, now, last_outside)
+
+    duration = steps * dt
+    settling = np.where(last_outside >= duration, np.inf, last_outside)
+    return {
+        "overshoot": overshoot,
+        "settling_time": settling,
+        "duty": (heater_on + fan_on) / steps,
+        "switches": switches,
+    }
+
+def pareto_front(objectives: np.ndarray, chunk: int = 512) -> np.ndarray:
+    """모든 목표를 최소화할 때 다른 점에 지배당하지 않는 점들의 인덱스를 반환합니다."""
+    n = len(objectives)
+    dominated = np.zeros(n, dtype=bool)
+    for start in range(0, n, chunk):
+        block = objectives[start:start + chunk, None, :]
+        better_or_equal = np.all(objectives[None, :, :] <= block, axis=2)
+        strictly_better = np.any(objectives[None, :, :] < block, axis=2)
+        dominated[start:start + chunk] = np.any(better_or_equal & strictly_better, axis=1)
+    return np.nonzero(~dominated)[0]
+
+def tune(params: PlantParams, kp_values, ki_values, kd_values, target_temp: float, initial_temp: float,
+         hours: float, seed: int = 0, apply_filter: bool = True) -> list:
+    """게인 격자 전체를 평가하고 파레토 최적 조합을 정착 시간 순으로 반환합니다."""
+    kp, ki, kd = (grid.ravel() for grid in np.meshgrid(kp_values, ki_values, kd_values, indexing="ij"))
+    result = batch_simulate(params, kp, ki, kd, target_temp, initial_temp, hours, seed=seed, apply_filter=apply_filter)
+
+    objectives = np.column_stack([result["overshoot"], result["settling_time"], result["duty"]])
+    front = pareto_front(objectives)
+    settled = front[np.isfinite(result["settling_time"][front])]
+    front = settled if len(settled) else front
+    front = front[np.argsort(result["settling_time"][front])]
+    return [{
+        "Kp": round(float(kp[i]), 4), "Ki": round(float(ki[i]), 4), "Kd": round(float(kd[i]), 4),
+        "overshoot_c": round(float(result["overshoot"][i]), 3),
+        "settling_time_s": float(result["settling_time"][i]),
+        "duty": round(float(result["duty"][i]), 3),
+        "switches": int(result["switches"][i]),
+    } for i in front]
+
+def _parse_range(text: str):
+    """'시작:끝:개수' 형식을 np.linspace 배열로 변환합니다."""
+    start, stop, count = text.split(":")
+    return np.linspace(float(start), float(stop), int(count))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="기록 기반 PID 게인 배치 튜닝")
+    parser.add_argument("--history", default=None, help="이력 CSV 또는 원격 측정 JSONL (없으면 Simulation.py의 기본 모델 사용)")
+    parser.add_argument("--hours", type=float, default=6.0, help="조합별 시뮬레이션 시간 (시간)")
+    parser.add_argument("--kp", default="0.5:20:20", help="Kp 범위 (시작:끝:개수)")
+    parser.add_argument("--ki", default="0:0.5:20", help="Ki 범위 (시작:끝:개수)")
+    parser.add_argument("--kd", default="0:40:25", help="Kd 범위 (시작:끝:개수)")
+    parser.add_argument("--target-temp", type=float, default=Config.TARGET_TEMP, help="목표 온도")
+    parser.add_argument("--initial-temp", type=float, default=None, help="초기 온도 (기본: 이력의 첫 값)")
+    parser.add_argument("--top", type=int, default=15, help="출력할 파레토 조합 수")
+    args = parser.parse_args()
+
+    apply_filter = True
+    if args.history:
+        history = load_history(args.history)
+        plant = fit_plant(history)
+        apply_filter = has_raw_series(history)
+        if not apply_filter:
+            print("필터 전 측정값(TEMP_RAW/SOIL_RAW)이 없어 필터 후 값으로 추정했습니다. 시뮬레이션에서 필터를 다시 적용하지 않습니다.")
+        initial_temp = float(history["TEMP"][0]) if args.initial_temp is None else args.initial_temp
+    else:
+        plant = PlantParams(outside_swing=0.0)
+        initial_temp = 15.0 if args.initial_temp is None else args.initial_temp
+    print(f"온실 모델: {plant}")
+
+    started = time.perf_counter()
+    kp_values, ki_values, kd_values = _parse_range(args.kp), _parse_range(args.ki), _parse_range(args.kd)
+    front = tune(plant, kp_values, ki_values, kd_values, args.target_temp, initial_temp, args.hours,
+                 apply_filter=apply_filter)
+    combos = len(kp_values) * len(ki_values) * len(kd_values)
+    print(f"{combos}개 조합 평가 완료 ({time.perf_counter() - started:.1f}초), 파레토 최적 {len(front)}개")
+    print(f"현재 설정: Kp={Config.PID_KP}, Ki={Config.PID_KI}, Kd={Config.PID_KD}")
+    for row in front[:args.top]:
+        print(row)
@@ -0,0 +1,129 @@
+# =================================================================================
+# Payload_codec.py
+# MQTT/WebSocket으로 보내는 데이터의 직렬화 방식(codec)
+# 코덱 이름은 "<형식>" 또는 "<형식>+<압축>"으로 쓴다.
+#   형식: "json" (텍스트), "msgpack", "cbor" (이진)
+#   압축: "zlib", "zstd" (zstd 라이브러리가 없으면 zlib으로 대신 압축)
+# 압축을 지정하면 데이터 앞에 1바이트 프레임 표시를 붙인다. (0x00: 압축 안 함, 0x01: zlib, 0x02: zstd)
+# PAYLOAD_COMPRESS_MIN_BYTES보다 작은 데이터는 압축해도 작아지지 않으므로 0x00으로 그대로 보낸다.
+# 받는 쪽은 같은 코덱 이름으로 decode하면 되며, 압축 방식은 프레임 표시로 알 수 있다.
+# MQTT는 토픽별(MQTT_TOPIC_CODECS), WebSocket은 연결별(/ws?codec=...)로 코덱을 고른다.
+# 토픽에 지정한 코덱의 라이브러리(msgpack, cbor2)가 없으면 시작할 때 오류를 기록하고 그 토픽은 "json"으로 보낸다.
+# (JSON 메시지는 '{'로 시작하므로 수신 측은 이진 코덱 메시지와 구별할 수 있음)
+# =================================================================================
+
+import json
+import zlib
+
+from Utility import log
+import Config
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+FRAME_RAW = 0x00
+FRAME_ZLIB = 0x01
+FRAME_ZSTD = 0x02
+
+def _cbor_default(encoder, value):
+    encoder.encode(str(value))
+
+class PayloadCodec:
+    def __init__(self, name: str):
+        self.name = name
+        self.format, _, self.compression = name.partition("+")
+        if self.format not in ("json", "msgpack", "cbor"):
+            raise ValueError(f"알 수 없는 직렬화 형식입니다: {self.format}")
+        if self.compression not in ("", "zlib", "zstd"):
+            raise ValueError(f"알 수 없는 압축 방식입니다: {self.compression}")
+        if self.format == "msgpack" and msgpack is None:
+            raise ValueError("msgpack 라이브러리가 설치되어 있지 않습니다.")
+        if self.format == "cbor" and cbor2 is None:
+            raise ValueError("cbor2 라이브러리가 설치되어 있지 않습니다.")
+        if self.compression == "zstd" and zstandard is None:
+            log.warning(f"[Codec] zstandard 라이브러리가 없어 '{name}'은(는) zlib으로 압축합니다.")
+
+    @property
+    def binary(self) -> bool:
+        """텍스트(JSON 문자열)로 보낼 수 없는 데이터이면 True입니다."""
+        return self.format != "json" or bool(self.compression)
+
+    def _serialize(self, obj) -> bytes:
+        if self.format == "msgpack":
+            return msgpack.packb(obj, default=str)
+        if self.format == "cbor":
+            return cbor2.dumps(obj, default=_cbor_default)
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+    def _deserialize(self, data: bytes):
+        if self.format == "msgpack":
+            return msgpack.unpackb(data)
+        if self.format == "cbor":
+            return cbor2.loads(data)
+        return json.loads(data)
+
+    def encode(self, obj):
+        """객체를 직렬화합니다. 텍스트 코덱("json")은 str을, 나머지는 bytes를 반환합니다."""
+        data = self._serialize(obj)
+        if not self.compression:
+            return data if self.binary else data.decode("utf-8")
+        if len(data) < Config.PAYLOAD_COMPRESS_MIN_BYTES:
+            return bytes([FRAME_RAW]) + data
+        if self.compression == "zstd" and zstandard is not None:
+            return bytes([FRAME_ZSTD]) + zstandard.ZstdCompressor(level=Config.PAYLOAD_ZSTD_LEVEL).compress(data)
+        return bytes([FRAME_ZLIB]) + zlib.compress(data, Config.PAYLOAD_ZLIB_LEVEL)
+
+    def decode(self, data):
+        """encode로 만든 데이터를 객체로 되돌립니다."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if self.compression:
+            frame, data = data[0], data[1:]
+            if frame == FRAME_ZLIB:
+                data = zlib.decompress(data)
+            elif frame == FRAME_ZSTD:
+                if zstandard is None:
+                    raise ValueError("zstandard 라이브러리가 없어 zstd 데이터를 풀 수 없습니다.")
+                data = zstandard.ZstdDecompressor().decompress(data)
+            elif frame != FRAME_RAW:
+                raise ValueError(f"알 수 없는 프레임 표시입니다: {frame}")
+        return self._deserialize(data)
+
+_codecs = {}
+_topic_codecs = {}  # 토픽 -> 코덱 (사용할 수 없는 코덱을 대체한 결과 포함)
+
+def get_codec(name: str = None) -> PayloadCodec:
+    """이름에 맞는 코덱을 반환합니다. 지원하지 않는 이름이면 ValueError가 발생합니다."""
+    name = (name or Config.PAYLOAD_CODEC_DEFAULT).lower()
+    if name not in _codecs:
+        _codecs[name] = PayloadCodec(name)
+    return _codecs[name]
+
+def codec_for_topic(topic: str) -> PayloadCodec:
+    """MQTT_TOPIC_CODECS에 지정된 토픽의 코덱을 반환합니다. 지정되지 않은 토픽은 기본 코덱을 사용합니다.
+    지정된 코덱을 사용할 수 없으면 오류를 기록하고 "json"을 사용합니다."""
+    if topic not in _topic_codecs:
+        name = Config.MQTT_TOPIC_CODECS.get(topic)
+        try:
+            _topic_codecs[topic] = get_codec(name)
+        except ValueError as e:
+            log.error(f"[Codec] '{topic}' 토픽의 코덱 '{name}'을(를) 사용할 수 없어 json으로 보냅니다: {e}")
+            _topic_codecs[topic] = get_codec("json")
+    return _topic_codecs[topic]
+
+def check_topic_codecs() -> dict:
+    """(시작 시) MQTT_TOPIC_CODECS의 코덱을 모두 확인하고, 토픽별로 실제 사용할 코덱 이름을 반환합니다."""
+    get_codec()  # 기본 코덱이 잘못되었으면 여기서 ValueError로 시작을 멈춤
+    return {topic: codec_for_topic(topic).name for topic in Config.MQTT_TOPIC_CODECS}
@@ -0,0 +1,93 @@
+# =================================================================================
+# Sampling_control.py
+# 아두이노의 센서 전송 간격을 시스템 상황에 맞게 조절
+# 과도 상태(펌프, 히터, 큰 오차)에서는 빠르게, 안정 상태에서는 느리게 샘플링한다.
+# =================================================================================
+
+import threading
+from Utility import log, system_clock
+import Config
+from _System_ import SystemState
+from Arduino_control import HardwareController
+
+class SamplingController:
+    def __init__(self, state: SystemState, hardware: HardwareController, auto_control=None, clock=None):
+        self.state = state
+        self.hardware = hardware
+        self.auto_control = auto_control  # 있으면 자동 제어의 PID 오차를 함께 참고
+        self.clock = clock or system_clock
+        self.last_transient_time = self.clock.time()
+        self.requested_interval = None  # 마지막으로 요청한 간격 (밀리초)
+        self.last_request_time = 0
+        self.stop_event = threading.Event()
+        self.check_interval = Config.SAMPLE_CHECK_INTERVAL
+
+    def _transient_reason(self, data: dict):
+        """과도 상태라면 그 이유를, 아니라면 None을 반환합니다."""
+        actuators = data["ACTUATOR"]
+        sensors = data["SENSOR"]
+        targets = data["TARGET"]
+
+        if actuators.get("PUMP", 0) > 0:
+            return "PUMP"
+        if actuators.get("HEAT_PANNEL", 0) > 0:
+            return "HEAT_PANNEL"
+
+        # 자동 제어가 계산한 오차를 우선 사용하고, 없으면 상태 값으로 계산
+        if self.auto_control is not None and data.get("MODE") == "AUTO":
+            temp_error = self.auto_control.pid.last_error
+        else:
+            temp_error = float(targets["TARGET_TEMP"]) - float(sensors["TEMP"])
+        if abs(temp_error) > Config.SAMPLE_TEMP_ERROR_THRESHOLD:
+            return "TEMP_ERROR"
+
+        soil_error = float(targets["TARGET_SOIL_MOISTURE"]) - float(sensors["SOIL"])
+        if abs(soil_error) > Config.SAMPLE_SOIL_ERROR_THRESHOLD:
+            return "SOIL_ERROR"
+        return None
+
+    def select_interval(self, data: dict, now: float) -> int:
+        """현재 상태에 맞는 센서 전송 간격(밀리초)을 결정합니다."""
+        if self._transient_reason(data):
+            self.last_transient_time = now
+            return Config.SAMPLE_INTERVAL_FAST
+        # 과도 상태가 끝난 직후에는 바로 느려지지 않도록 기본 간격을 유지
+        if now - self.last_transient_time < Config.SAMPLE_STABLE_HOLD:
+            return Config.SAMPLE_INTERVAL_NORMAL
+        return Config.SAMPLE_INTERVAL_SLOW
+
+    def _sampling_once(self):
+        now = self.clock.time()
+        data = self.state.get_all_data()
+        interval = self.select_interval(data, now)
+
+        # 아두이노가 아직 적용하지 않았다면 (재연결 포함) 일정 간격으로 재전송
+        applied = self.hardware.sensor_interval_ms == interval
+        changed = interval != self.requested_interval
+        if not applied and (changed or now - self.last_request_time > Config.SAMPLE_RESEND_INTERVAL):
+            if self.hardware.set_sensor_interval(interval):
+                if changed:
+                    log.info(f"[Sampling] 센서 전송 간격 변경 요청: {self.requested_interval} -> {interval}ms "
+                             f"(사유: {self._transient_reason(data) or 'STABLE'})")
+                self.requested_interval = interval
+                self.last_request_time = now
+
+    def _sampling_loop_worker(self):
+        while not self.stop_event.is_set():
+            try:
+                self._sampling_once()
+            except Exception as e:
+                log.error(f"[Sampling] 샘플링 조절 중 오류 발생: {e}")
+
+            self.stop_event.wait(self.check_interval)
+
+    def start(self, scheduler=None):
+        log.info("적응형 샘플링 스레드를 시작합니다.")
+        if scheduler:
+            scheduler.every(self.check_interval, self._sampling_once, name="adaptive_sampling")
+            return
+        threading.Thread(target=self._sampling_loop_worker, daemon=True).start()
+
+    def stop(self):
+        log.info("적응형 샘플링을 정지합니다.")
+        self.stop_event.set()
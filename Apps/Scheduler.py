@@ -0,0 +1,218 @@
+# =================================================================================
+# Scheduler.py
+# 계층형 타이머 휠 기반의 중앙 스케줄러
+# 각 컴포넌트가 스레드를 만들어 sleep 하는 대신, 주기/일회성 작업을 등록하면
+# 하나의 틱 스레드와 소수의 작업 스레드가 실행한다. 작업별 지터와 오버런을 기록한다.
+# 시계는 주입할 수 있어서(clock) 시험에서는 Simulation.VirtualClock으로 틱을 직접 진행한다.
+# =================================================================================
+
+import threading
+import queue
+import itertools
+import math
+
+from Utility import log, monotonic_clock
+import Config
+
+class Job:
+    """스케줄러에 등록된 작업 하나와 실행 통계입니다."""
+    _ids = itertools.count(1)
+
+    def __init__(self, name, fn, interval, due_time):
+        self.id = next(self._ids)
+        self.name = name
+        self.fn = fn
+        self.interval = interval        # None이면 일회성 작업
+        self.due_time = due_time        # 다음 실행 예정 시각 (스케줄러 시계 기준)
+        self.due_tick = 0
+        self.cancelled = False
+        self.running = False
+
+        self.runs = 0
+        self.overruns = 0               # 이전 실행이 끝나지 않아 건너뛴 횟수 + 주기보다 오래 걸린 횟수
+        self.jitter_last = 0.0          # 예정 시각 대비 실제 시작 지연 (초)
+        self.jitter_mean = 0.0
+        self.jitter_max = 0.0
+        self.duration_last = 0.0
+        self.duration_max = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "interval": self.interval,
+            "runs": self.runs,
+            "overruns": self.overruns,
+            "jitter_ms": {"last": round(self.jitter_last * 1000, 2), "mean": round(self.jitter_mean * 1000, 2),
+                          "max": round(self.jitter_max * 1000, 2)},
+            "duration_ms": {"last": round(self.duration_last * 1000, 2), "max": round(self.duration_max * 1000, 2)},
+        }
+
+class Scheduler:
+    LEVELS = 3          # 휠 단계 수
+    SLOTS = 64          # 단계별 슬롯 수 (틱 0.05초 기준 3.2초 / 204.8초 / 약 3.6시간)
+
+    def __init__(self, tick: float = None, workers: int = None, clock=None):
+        self.tick = tick or Config.SCHEDULER_TICK
+        self.clock = clock or monotonic_clock
+        self.wheels = [[[] for _ in range(self.SLOTS)] for _ in range(self.LEVELS)]
+        self.overflow = []              # 가장 큰 휠의 범위를 넘는 작업
+        self.current_tick = 0
+        self.start_time = None
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.run_queue = queue.Queue()
+        self.worker_count = workers or Config.SCHEDULER_WORKERS
+        self.stop_event = threading.Event()
+
+    # --- 작업 등록 ---
+    def every(self, interval: float, fn, name: str = None, delay: float = None) -> Job:
+        """interval초마다 fn을 실행합니다. delay가 없으면 첫 실행은 interval 후입니다."""
+        first = interval if delay is None else delay
+        return self._add(Job(name or fn.__name__, fn, interval, self.clock.time() + first))
+
+    def after(self, delay: float, fn, name: str = None) -> Job:
+        """delay초 후에 fn을 한 번 실행합니다."""
+        return self._add(Job(name or fn.__name__, fn, None, self.clock.time() + delay))
+
+    def cancel(self, job: Job):
+        with self.lock:
+            job.cancelled = True
+            self.jobs.pop(job.id, None)
+
+    def _add(self, job: Job) -> Job:
+        with self.lock:
+            self.jobs[job.id] = job
+            # 이미 실행 시각이 지난 작업(after(0, ...) 등)은 다음 틱을 기다리지 않고 바로 실행
+            if job.due_time <= self.clock.time():
+                self._dispatch(job)
+            else:
+                self._insert(job)
+        return job
+
+    def _insert(self, job: Job):
+        """작업을 예정 시각에 맞는 휠 단계와 슬롯에 넣습니다. (lock 보유 상태에서 호출)"""
+        if self.start_time is None:
+            self.start_time = self.clock.time()
+        job.due_tick = max(self.current_tick + 1, math.ceil((job.due_time - self.start_time) / self.tick - 1e-6))
+        ticks_left = job.due_tick - self.current_tick
+        for level in range(self.LEVELS):
+            span = self.SLOTS ** (level + 1)
+            if ticks_left < span:
+                slot = (job.due_tick // self.SLOTS ** level) % self.SLOTS
+                self.wheels[level][slot].append(job)
+                return
+        self.overflow.append(job)
+
+    # --- 틱 처리 ---
+    def _advance(self):
+        """틱을 하나 진행하고 만료된 작업을 실행 큐에 넣습니다."""
+        with self.lock:
+            self.current_tick += 1
+            tick = self.current_tick
+
+            # 하위 휠이 한 바퀴 돌 때마다 상위 휠의 슬롯을 내려보냄 (cascade)
+            for level in range(1, self.LEVELS):
+                if tick % self.SLOTS ** level != 0:
+                    break
+                slot = (tick // self.SLOTS ** level) % self.SLOTS
+                jobs, self.wheels[level][slot] = self.wheels[level][slot], []
+                for job in jobs:
+                    self._insert_or_expire(job)
+            else:
+                if tick % self.SLOTS ** self.LEVELS == 0:
+                    jobs, self.overflow = self.overflow, []
+                    for job in jobs:
+                        self._insert_or_expire(job)
+
+            slot = tick % self.SLOTS
+            jobs, self.wheels[0][slot] = self.wheels[0][slot], []
+            for job in jobs:
+                self._insert_or_expire(job)
+
+    def _insert_or_expire(self, job: Job):
+        if job.cancelled:
+            return
+        if job.due_tick <= self.current_tick:
+            self._dispatch(job)
+        else:
+            self._insert(job)
+
+    def _dispatch(self, job: Job):
+        """작업을 작업 스레드로 넘기고, 주기 작업이면 다음 실행을 예약합니다. (lock 보유 상태에서 호출)"""
+        if job.running:
+            job.overruns += 1
+            log.warning(f"[Scheduler] '{job.name}' 작업이 아직 실행 중이어서 이번 실행을 건너뜁니다.")
+        else:
+            job.running = True
+            self.run_queue.put((job, job.due_time))
+
+        if job.interval is not None:
+            # 밀린 주기는 건너뛰고 현재 시각 이후의 다음 주기로 예약
+            now = self.clock.time()
+            job.due_time += job.interval
+            if job.due_time < now:
+                job.due_time += ((now - job.due_time) // job.interval + 1) * job.interval
+            self._insert(job)
+        else:
+            self.jobs.pop(job.id, None)
+
+    def _tick_thread(self):
+        while not self.stop_event.is_set():
+            # 틱 경계를 start_time 기준으로 계산하여 누적 오차가 생기지 않도록 함
+            next_time = self.start_time + (self.current_tick + 1) * self.tick
+            delay = next_time - self.clock.time()
+            if delay > 0:
+                self.stop_event.wait(delay)
+            self._advance()
+
+    def _worker_thread(self):
+        while True:
+            item = self.run_queue.get()
+            if item is None:
+                break
+            job, due_time = item
+            started = self.clock.time()
+            jitter = started - due_time
+            try:
+                job.fn()
+            except Exception as e:
+                log.error(f"[Scheduler] '{job.name}' 작업 실행 중 오류 발생: {e}")
+            finally:
+                duration = self.clock.time() - started
+                with self.lock:
+                    job.running = False
+                    job.runs += 1
+                    job.jitter_last = jitter
+                    job.jitter_mean += (jitter - job.jitter_mean) / job.runs
+                    job.jitter_max = max(job.jitter_max, jitter)
+                    job.duration_last = duration
+                    job.duration_max = max(job.duration_max, duration)
+                    if job.interval is not None and duration > job.interval:
+                        job.overruns += 1
+
+    # --- 통계 ---
+    def stats(self) -> list:
+        with self.lock:
+            return [job.stats() for job in self.jobs.values()]
+
+    def log_stats(self):
+        for job_stats in self.stats():
+            log.info(f"[Scheduler] {job_stats}")
+
+    # --- 시작/정지 ---
+    def start(self):
+        log.info(f"스케줄러를 시작합니다. (틱 {self.tick}초, 작업 스레드 {self.worker_count}개)")
+        with self.lock:
+            if self.start_time is None:
+                self.start_time = self.clock.time()
+        threading.Thread(target=self._tick_thread, daemon=True).start()
+        for _ in range(self.worker_count):
+            threading.Thread(target=self._worker_thread, daemon=True).start()
+        if Config.SCHEDULER_REPORT_INTERVAL:
+            self.every(Config.SCHEDULER_REPORT_INTERVAL, self.log_stats, name="scheduler_report")
+
+    def stop(self):
+        log.info("스케줄러를 정지합니다.")
+        self.stop_event.set()
+        for _ in range(self.worker_count):
+            self.run_queue.put(None)
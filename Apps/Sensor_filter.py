@@ -0,0 +1,122 @@
+# =================================================================================
+# Sensor_filter.py
+# 시리얼로 수신한 센서 값을 SystemState에 저장하기 전에 거치는 필터 단계
+# 채널별로 필터(중앙값, EMA, 1차원 칼만)를 선택할 수 있으며,
+# 필터 상태는 미리 할당된 numpy 배열에 저장하여 샘플당 수 마이크로초로 처리한다.
+# =================================================================================
+
+import numpy as np
+
+import Config
+
+# 아두이노가 보내는 순서와 동일: TEMP, SOIL, HUMID, LIGHT
+SENSOR_CHANNELS = ("TEMP", "SOIL", "HUMID", "LIGHT")
+
+class PassThroughFilter:
+    """필터를 적용하지 않고 값을 그대로 통과시킵니다."""
+    def __init__(self, channels):
+        self.output = np.zeros(channels)
+
+    def update(self, values):
+        self.output[:] = values
+        return self.output
+
+    def reset(self):
+        self.output.fill(0.0)
+
+class MedianFilter:
+    """최근 N개 샘플의 중앙값을 사용합니다. 순간적인 튐(스파이크)에 강합니다."""
+    def __init__(self, channels, window):
+        self.window = window
+        self.buffer = np.zeros((window, channels))
+        self.output = np.zeros(channels)
+        self.index, self.count = 0, 0
+
+    def update(self, values):
+        self.buffer[self.index] = values
+        self.index = (self.index + 1) % self.window
+        self.count = min(self.count + 1, self.window)
+        np.median(self.buffer[:self.count], axis=0, out=self.output)
+        return self.output
+
+    def reset(self):
+        self.index, self.count = 0, 0
+
+class EMAFilter:
+    """지수 이동 평균. alpha가 작을수록 부드럽지만 반응이 느립니다."""
+    def __init__(self, channels, alpha):
+        self.alpha = alpha
+        self.output = np.zeros(channels)
+        self.initialized = False
+
+    def update(self, values):
+        if not self.initialized:
+            self.output[:] = values
+            self.initialized = True
+        else:
+            self.output += self.alpha * (values - self.output)
+        return self.output
+
+    def reset(self):
+        self.initialized = False
+
+class KalmanFilter:
+    """상수 모델(랜덤 워크)을 가정한 채널별 1차원 칼만 필터입니다."""
+    def __init__(self, channels, process_var, measurement_var):
+        self.q, self.r = process_var, measurement_var
+        self.output = np.zeros(channels)       # 추정값
+        self.variance = np.ones(channels)      # 추정 오차 분산
+        self.gain = np.zeros(channels)
+        self.initialized = False
+
+    def update(self, values):
+        if not self.initialized:
+            self.output[:] = values
+            self.variance.fill(self.r)
+            self.initialized = True
+            return self.output
+        self.variance += self.q
+        np.divide(self.variance, self.variance + self.r, out=self.gain)
+        self.output += self.gain * (values - self.output)
+        self.variance *= (1.0 - self.gain)
+        return self.output
+
+    def reset(self):
+        self.initialized = False
+
+def make_filter(kind: str, channels: int):
+    """설정 문자열에 해당하는 필터 객체를 생성합니다."""
+    kind = kind.upper()
+    if kind == "MEDIAN":
+        return MedianFilter(channels, Config.FILTER_MEDIAN_WINDOW)
+    if kind == "EMA":
+        return EMAFilter(channels, Config.FILTER_EMA_ALPHA)
+    if kind == "KALMAN":
+        return KalmanFilter(channels, Config.FILTER_KALMAN_Q, Config.FILTER_KALMAN_R)
+    if kind == "NONE":
+        return PassThroughFilter(channels)
+    raise ValueError(f"알 수 없는 필터 종류입니다: {kind}")
+
+class SensorFilterPipeline:
+    """센서 한 프레임(4채널)을 받아 채널별 필터를 적용한 결과를 반환합니다."""
+    def __init__(self, filters: dict = None):
+        filters = filters if filters is not None else Config.SENSOR_FILTERS
+        self.frame = np.zeros(len(SENSOR_CHANNELS))
+        self.output = np.zeros(len(SENSOR_CHANNELS))
+
+        # 같은 종류의 필터를 쓰는 채널끼리 묶어서 한 번에 계산
+        groups = {}
+        for i, name in enumerate(SENSOR_CHANNELS):
+            groups.setdefault(filters.get(name, "NONE").upper(), []).append(i)
+        self.stages = [(np.array(indexes), make_filter(kind, len(indexes))) for kind, indexes in groups.items()]
+
+    def process(self, values) -> dict:
+        """SENSOR_CHANNELS 순서의 원시 값을 받아 필터링된 {채널: 값} 딕셔너리를 반환합니다."""
+        self.frame[:] = values
+        for indexes, stage in self.stages:
+            self.output[indexes] = stage.update(self.frame[indexes])
+        return {name: round(value, 2) for name, value in zip(SENSOR_CHANNELS, self.output.tolist())}
+
+    def reset(self):
+        for _, stage in self.stages:
+            stage.reset()
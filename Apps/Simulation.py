@@ -0,0 +1,197 @@
+# =================================================================================
+# Simulation.py
+# 가상 시계와 온실 모델(온도, 토양 습도)을 이용한 폐루프 시뮬레이션
+# 실제 AutoController를 실시간보다 수천 배 빠르게 돌려 제어 성능을 평가한다.
+# 사용 예: python Simulation.py --hours 24 --initial-temp 15
+# =================================================================================
+
+import argparse
+import csv
+import logging
+import math
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from Utility import log
+import Config
+from _System_ import SystemState
+from Auto_control import AutoController
+from Actuator_arbiter import ActuatorArbiter
+from Sensor_filter import SensorFilterPipeline, SENSOR_CHANNELS
+
+# 시뮬레이션 기록 CSV의 열 순서
+# TEMP 등은 필터를 거친 값(제어기가 본 값), *_RAW는 필터 전 측정값 (PID_tuning.py는 모델 추정에 *_RAW를 사용)
+HISTORY_FIELDS = ["time", "TEMP", "SOIL", "HUMID", "LIGHT", "FAN", "PUMP", "HEAT_PANNEL", "GROW_LIGHT", "WHITE_LED",
+                  "TEMP_RAW", "SOIL_RAW"]
+ACTUATOR_FIELDS = ["FAN", "PUMP", "HEAT_PANNEL", "GROW_LIGHT", "WHITE_LED"]
+
+class VirtualClock:
+    """sleep 호출 시 실제로 기다리지 않고 시간만 앞으로 보내는 시계입니다."""
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+
+    def advance(self, seconds):
+        self.now += max(0.0, seconds)
+
+@dataclass
+class PlantParams:
+    """온실 모델 파라미터."""
+    outside_temp: float = 18.0      # 외기 평균 온도 (섭씨)
+    outside_swing: float = 6.0      # 일교차의 절반 (섭씨)
+    loss_rate: float = 1 / 1800     # 외기로의 열손실 계수 (1/s)
+    heater_rate: float = 0.01       # 히터 ON 시 온도 상승률 (섭씨/s)
+    fan_rate: float = 1 / 300       # 팬 최대 출력 시 외기와의 열교환 계수 (1/s)
+    soil_dry_rate: float = 0.02     # 증발에 의한 토양 습도 감소율 (단위/s)
+    pump_rate: float = 10.0         # 펌프 최대 출력 시 토양 습도 증가율 (단위/s)
+    soil_max: float = 1023.0        # 토양 센서 최대값
+    temp_noise: float = 0.2         # DHT22 측정 잡음 표준편차
+    soil_noise: float = 5.0         # 토양 센서 측정 잡음 표준편차
+
+class GreenhousePlant:
+    """온실의 온도와 토양 습도를 1차 모델로 근사합니다."""
+    def __init__(self, params: PlantParams = None, initial_temp: float = 18.0, initial_soil: float = 350.0, seed: int = 0):
+        self.params = params or PlantParams()
+        self.temp = initial_temp
+        self.soil = initial_soil
+        self.rng = np.random.default_rng(seed)
+
+    def outside_temp(self, t: float) -> float:
+        p = self.params
+        # 오후 3시 최고, 새벽 3시 최저인 일교차
+        return p.outside_temp + p.outside_swing * math.sin(2 * math.pi * (t - 9 * 3600) / 86400)
+
+    def step(self, t: float, dt: float, actuators: dict):
+        p = self.params
+        outside = self.outside_temp(t)
+        fan = actuators.get("FAN", 0) / 255
+        heater = 1.0 if actuators.get("HEAT_PANNEL", 0) > 0 else 0.0
+        pump = actuators.get("PUMP", 0) / 255
+
+        dtemp = -(p.loss_rate + p.fan_rate * fan) * (self.temp - outside) + p.heater_rate * heater
+        dsoil = -p.soil_dry_rate + p.pump_rate * pump
+        self.temp += dtemp * dt
+        self.soil = min(max(self.soil + dsoil * dt, 0.0), p.soil_max)
+
+    def read_sensors(self, t: float) -> list:
+        """SENSOR_CHANNELS 순서의 측정값 (잡음 포함)을 반환합니다."""
+        p = self.params
+        temp = self.temp + self.rng.normal(0, p.temp_noise)
+        soil = self.soil + self.rng.normal(0, p.soil_noise)
+        humid = 60.0 - 0.8 * (self.temp - 20.0)
+        hour = (t / 3600) % 24
+        light = 800.0 if 6 <= hour < 20 else 0.0
+        return [temp, soil, humid, light]
+
+def _count_switches(values: np.ndarray) -> int:
+    return int(np.count_nonzero(np.diff(values) != 0))
+
+def evaluate_history(times: np.ndarray, temps: np.ndarray, actuators: dict, target_temp: float, band: float) -> dict:
+    """기록된 온도/액추에이터 값으로 제어 성능 지표를 계산합니다."""
+    start = times[0]
+    sign = 1.0 if temps[0] <= target_temp else -1.0
+    crossed = np.nonzero(sign * (temps - target_temp) >= 0)[0]
+    overshoot = float(max(0.0, np.max(sign * (temps[crossed[0]:] - target_temp)))) if len(crossed) else 0.0
+
+    outside = np.nonzero(np.abs(temps - target_temp) > band)[0]
+    if len(outside) == 0:
+        settling_time = 0.0
+    elif outside[-1] == len(temps) - 1:
+        settling_time = None    # 끝까지 목표 범위에 들어오지 못함
+    else:
+        settling_time = float(times[outside[-1] + 1] - start)
+
+    pump = actuators["PUMP"]
+    return {
+        "duration_h": float((times[-1] - start) / 3600),
+        "settling_time_s": settling_time,
+        "overshoot_c": round(overshoot, 3),
+        "mean_abs_error_c": round(float(np.mean(np.abs(temps - target_temp))), 3),
+        "pump_cycles": int(np.count_nonzero((pump[1:] > 0) & (pump[:-1] == 0))),
+        "switch_counts": {name: _count_switches(values) for name, values in actuators.items()},
+        "duty": {name: round(float(np.mean(values > 0)), 3) for name, values in actuators.items()},
+    }
+
+def run_simulation(hours: float = 24.0, initial_temp: float = 15.0, initial_soil: float = 350.0,
+                   target_temp: float = None, target_soil: float = None,
+                   params: PlantParams = None, seed: int = 0, export_path: str = None) -> dict:
+    """AutoController를 가상 시계로 hours 시간 동안 실행하고 성능 지표를 반환합니다."""
+    target_temp = Config.TARGET_TEMP if target_temp is None else target_temp
+    target_soil = Config.TARGET_SOIL_MOISTURE if target_soil is None else target_soil
+    dt = Config.SAMPLE_INTERVAL_NORMAL / 1000
+    steps = int(hours * 3600 / dt)
+
+    clock = VirtualClock()
+    plant = GreenhousePlant(params, initial_temp, initial_soil, seed)
+    sensor_filter = SensorFilterPipeline()
+
+    # 시뮬레이션 중에는 제어 로그가 대량으로 쌓이지 않도록 경고 이상만 기록
+    previous_level = log.level
+    log.setLevel(logging.WARNING)
+    history = np.zeros((steps, len(HISTORY_FIELDS)))
+    wall_start = time.perf_counter()
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            state = SystemState(os.path.join(tmpdir, "Value.json"), clock=clock)
+            state.update_values({"MODE": "AUTO", "TARGET": {"TARGET_TEMP": target_temp, "TARGET_SOIL_MOISTURE": target_soil}})
+            arbiter = ActuatorArbiter(state, clock=clock)
+            arbiter.sync_state()
+            auto = AutoController(state, None, arbiter, clock=clock)
+            actuators = state.get_all_data()["ACTUATOR"]
+
+            for i in range(steps):
+                plant.step(clock.time(), dt, actuators)
+                clock.advance(dt)
+                raw = plant.read_sensors(clock.time())
+                state.update_sensors(sensor_filter.process(raw))
+                current_data = state.get_all_data()
+                auto._control_step(current_data)
+                actuators = current_data["ACTUATOR"]
+
+                history[i, 0] = clock.time()
+                history[i, 1:5] = [current_data["SENSOR"][name] for name in SENSOR_CHANNELS]
+                history[i, 5:10] = [actuators[name] for name in ACTUATOR_FIELDS]
+                history[i, 10:12] = raw[:2]
+    finally:
+        log.setLevel(previous_level)
+    wall_time = time.perf_counter() - wall_start
+
+    if export_path:
+        save_history(export_path, history)
+
+    actuator_history = {name: history[:, 5 + j] for j, name in enumerate(ACTUATOR_FIELDS[:3])}
+    report = evaluate_history(history[:, 0], history[:, 1], actuator_history, target_temp, Config.SIM_SETTLE_BAND)
+    report["wall_time_s"] = round(wall_time, 2)
+    report["speedup"] = round(hours * 3600 / wall_time) if wall_time > 0 else None
+    return report
+
+def save_history(path: str, history: np.ndarray):
+    """기록을 CSV로 저장합니다."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(HISTORY_FIELDS)
+        writer.writerows(history.tolist())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="스마트팜 자동 제어 폐루프 시뮬레이션")
+    parser.add_argument("--hours", type=float, default=24.0, help="시뮬레이션 시간 (시간)")
+    parser.add_argument("--initial-temp", type=float, default=15.0, help="초기 실내 온도")
+    parser.add_argument("--initial-soil", type=float, default=350.0, help="초기 토양 습도")
+    parser.add_argument("--target-temp", type=float, default=None, help="목표 온도 (기본: Config.TARGET_TEMP)")
+    parser.add_argument("--seed", type=int, default=0, help="센서 잡음 난수 시드")
+    parser.add_argument("--export", default=None, help="센서/액추에이터 기록을 저장할 CSV 경로")
+    args = parser.parse_args()
+
+    result = run_simulation(args.hours, args.initial_temp, args.initial_soil, args.target_temp,
+                            seed=args.seed, export_path=args.export)
+    for key, value in result.items():
+        print(f"{key:>18}: {value}")
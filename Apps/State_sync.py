@@ -0,0 +1,280 @@
+# =================================================================================
+# State_sync.py
+# SystemState를 클라우드의 장치 섀도(AWS IoT Device Shadow)와 동기화
+# reported: SHADOW_SYNC_INTERVAL마다 지난번에 보고한 값과 비교하여 바뀐 항목만 보고한다.
+#   {"state": {"reported": {"TARGET": {"TARGET_TEMP": 24.0}, "sync_version": 42}}, "clientToken": ...}
+#   - 센서 값은 SHADOW_SENSOR_DEADBAND 이상 바뀌었을 때만 보고한다.
+#   - sync_version은 수신 확인을 받은 보고마다 1씩 늘어나므로, 클라우드 쪽 미러는 빠진 보고가 있는지 알 수 있다.
+#     (실패한 보고는 같은 sync_version으로 다시 보내므로 번호가 건너뛰지 않음)
+#   - 시작할 때, 브로커에 다시 연결될 때, SHADOW_FULL_SYNC_INTERVAL마다 전체 값을 보고한다.
+#   - 브로커의 수신 확인(PUBACK)을 받은 값만 보고한 것으로 기록하므로, 실패한 항목은 다음 보고에 다시 포함된다.
+# desired: 클라우드에서 바꾼 값(update/delta)을 받아 REST API와 같은 명령 처리기(CommandRouter)로 반영한다.
+#   MODE, TARGET, ACTUATOR만 바꿀 수 있으며, 값은 명령 처리기와 같은 규칙(TARGET_RANGES, ACTUATOR_RANGES)으로 항목마다 검증한다.
+#   반영하거나 거부한 항목(알 수 없는 항목 포함)은 desired에서 지워 같은 delta가 반복되지 않게 한다.
+#   로컬에서 수동으로 바꾼 항목과 겹치면 SHADOW_CONFLICT_POLICY에 따라 처리한다.
+#     "LOCAL_WINS": 로컬에서 바꾼 지 SHADOW_LOCAL_HOLD가 지나지 않았으면 클라우드 값을 거부
+#     "CLOUD_WINS": 항상 클라우드 값을 반영
+#     "NEWEST": 클라우드에서 바꾼 시각과 로컬에서 바꾼 시각 중 나중 값을 사용
+# =================================================================================
+
+import threading
+import time
+
+from Utility import log
+import Config
+from _System_ import SystemState
+from Commands import CommandError, validate_targets
+from Payload_codec import codec_for_topic
+
+SYNC_KEYS = ("MODE", "PLANT_CONDITION", "TARGET", "ACTUATOR", "SENSOR")
+WRITABLE = ("MODE", "TARGET", "ACTUATOR")
+
+def flatten(data: dict) -> dict:
+    """상태를 "TARGET.TARGET_TEMP" 같은 경로 -> 값 형태로 바꿉니다."""
+    flat = {}
+    for key in SYNC_KEYS:
+        if key not in data:
+            continue
+        if isinstance(data[key], dict):
+            for name, value in data[key].items():
+                flat[f"{key}.{name}"] = value
+        else:
+            flat[key] = data[key]
+    return flat
+
+def _desired_paths(desired: dict) -> dict:
+    """delta의 desired 값을 경로 -> 값으로 바꿉니다. flatten과 달리 알 수 없는 항목도 거부하여 지울 수 있도록 모두 포함합니다."""
+    flat = {}
+    for key, value in desired.items():
+        if isinstance(value, dict) and value:
+            for name, item in value.items():
+                flat[f"{key}.{name}"] = item
+        else:
+            flat[key] = value
+    return flat
+
+def nest(flat: dict) -> dict:
+    """flatten으로 만든 경로 -> 값을 다시 중첩된 형태로 바꿉니다."""
+    nested = {}
+    for path, value in flat.items():
+        key, _, name = path.partition(".")
+        if name:
+            nested.setdefault(key, {})[name] = value
+        else:
+            nested[key] = value
+    return nested
+
+class StateSync:
+    POLICIES = ("LOCAL_WINS", "CLOUD_WINS", "NEWEST")
+
+    def __init__(self, state: SystemState, aws, command_router):
+        self.state = state
+        self.aws = aws
+        self.command_router = command_router
+        self.policy = Config.SHADOW_CONFLICT_POLICY
+        if self.policy not in self.POLICIES:
+            raise ValueError(f"알 수 없는 충돌 처리 정책입니다: {self.policy}")
+        prefix = f"$aws/things/{Config.SHADOW_THING_NAME}/shadow"
+        self.update_topic = f"{prefix}/update"
+        self.delta_topic = f"{prefix}/update/delta"
+
+        self.lock = threading.Lock()
+        self.sync_lock = threading.Lock()  # 보고가 동시에 실행되지 않도록 함
+        self.reported = {}          # 보고하여 수신 확인을 받은 값 (경로 -> 값)
+        self.clear_desired = set()  # 다음 보고 때 desired에서 지울 경로
+        self.local_changes = {}     # 로컬에서 수동으로 바꾼 경로 -> 시각 (epoch 초)
+        self.sync_version = 0
+        self.desired_version = 0    # 마지막으로 처리한 delta의 섀도 버전
+        self.last_full_sync = 0.0
+        self.was_connected = False
+        self.counts = {"updates": 0, "full_syncs": 0, "fields": 0, "bytes": 0, "desired_applied": 0, "desired_rejected": 0}
+        self.wake = threading.Event()
+        self.stop_event = threading.Event()
+        self.scheduler = None
+
+        command_router.add_listener(self._on_local_change)
+        aws.subscribe_topic(self.delta_topic, self._on_delta)
+
+    # --- reported ---
+
+    def _on_local_change(self, source: str, paths: list):
+        """(명령 처리기 콜백) 클라우드가 아닌 곳에서 바뀐 항목의 시각을 기록하고, 바로 보고하도록 깨웁니다."""
+        if source != "SHADOW":
+            now = time.time()
+            with self.lock:
+                for path in paths:
+                    self.local_changes[path] = now
+        self.request_sync()
+
+    def _changed(self, path: str, value) -> bool:
+        if path not in self.reported:
+            return True
+        old = self.reported[path]
+        if path.startswith("SENSOR.") and isinstance(value, (int, float)) and isinstance(old, (int, float)):
+            return abs(value - old) >= Config.SHADOW_SENSOR_DEADBAND.get(path[len("SENSOR."):], 0)
+        return value != old
+
+    def sync_once(self, full: bool = False) -> bool:
+        """바뀐 항목을 보고합니다. 보고할 항목이 없거나 보고에 성공하면 True를 반환합니다."""
+        with self.sync_lock:
+            return self._sync(full)
+
+    def _sync(self, full: bool) -> bool:
+        connected = self.aws.mqtt_client.is_connected()
+        reconnected = connected and not self.was_connected
+        self.was_connected = connected
+        if not connected:
+            return False
+
+        current = flatten(self.state.get_all_data())
+        with self.lock:
+            full = full or reconnected or time.monotonic() - self.last_full_sync >= Config.SHADOW_FULL_SYNC_INTERVAL
+            changes = dict(current) if full else {path: value for path, value in current.items() if self._changed(path, value)}
+            clear = set(self.clear_desired)
+            if not changes and not clear:
+                return True
+            version = self.sync_version + 1  # 수신 확인을 받은 뒤에만 올림
+
+        reported = nest(changes)
+        reported["sync_version"] = version
+        document = {"state": {"reported": reported}, "clientToken": f"{Config.DEVICE_ID}-{version}"}
+        if clear:
+            document["state"]["desired"] = nest({path: None for path in clear})
+        if not self.aws.publish_confirmed(self.update_topic, document, qos=1, timeout=Config.SHADOW_PUBLISH_TIMEOUT):
+            log.warning(f"[Shadow] 상태 보고에 실패했습니다. 바뀐 항목 {len(changes)}개를 다음에 다시 보고합니다.")
+            return False
+
+        with self.lock:
+            self.sync_version = version
+            self.reported.update(changes)
+            self.clear_desired -= clear
+            if full:
+                self.last_full_sync = time.monotonic()
+                self.counts["full_syncs"] += 1
+            self.counts["updates"] += 1
+            self.counts["fields"] += len(changes)
+            self.counts["bytes"] += len(codec_for_topic(self.update_topic).encode(document))
+        log.debug(f"[Shadow] {'전체' if full else '변경'} 상태 보고 (항목 {len(changes)}개, sync_version {version})")
+        return True
+
+    def request_sync(self):
+        """다음 주기를 기다리지 않고 바로 보고하도록 요청합니다."""
+        self.wake.set()
+        if self.scheduler:
+            self.scheduler.after(0, self.sync_once, name="state_sync_now")
+
+    # --- desired ---
+
+    def _desired_time(self, delta: dict, path: str):
+        """delta의 metadata에서 해당 항목을 클라우드에서 바꾼 시각을 찾습니다. 없으면 delta의 시각을 사용합니다."""
+        metadata = delta.get("metadata") or {}
+        key, _, name = path.partition(".")
+        entry = metadata.get(key, {})
+        if name and isinstance(entry, dict):
+            entry = entry.get(name, {})
+        if isinstance(entry, dict) and "timestamp" in entry:
+            return entry["timestamp"]
+        return delta.get("timestamp")
+
+    def _accept(self, path: str, desired_at) -> bool:
+        """클라우드의 값을 반영할지 충돌 처리 정책에 따라 판단합니다."""
+        with self.lock:
+            local_at = self.local_changes.get(path)
+        if self.policy == "CLOUD_WINS" or local_at is None:
+            return True
+        if self.policy == "LOCAL_WINS":
+            return time.time() - local_at > Config.SHADOW_LOCAL_HOLD
+        return desired_at is None or desired_at > local_at
+
+    def apply_delta(self, delta: dict) -> dict:
+        """desired delta를 반영하고 {"applied": [...], "rejected": [...]}를 반환합니다."""
+        version = delta.get("version")
+        if isinstance(version, int):
+            if version <= self.desired_version:
+                log.info(f"[Shadow] 이미 처리한 delta입니다. (version {version})")
+                return {"applied": [], "rejected": []}
+            self.desired_version = version
+
+        applied, rejected = [], []
+        targets = {}
+        desired = delta.get("state")
+        for path, value in _desired_paths(desired if isinstance(desired, dict) else {}).items():
+            key, _, name = path.partition(".")
+            if key not in WRITABLE or (key != "MODE" and not name) or value is None:
+                log.warning(f"[Shadow] 바꿀 수 없는 항목을 거부합니다: {path}")
+                rejected.append(path)
+                continue
+            if not self._accept(path, self._desired_time(delta, path)):
+                log.info(f"[Shadow] 로컬에서 바꾼 값을 유지합니다: {path}")
+                rejected.append(path)
+                continue
+            try:
+                if key == "MODE":
+                    self.command_router.set_mode(value, source="SHADOW")
+                elif key == "ACTUATOR":
+                    self.command_router.control(name, value, source="SHADOW")
+                else:
+                    # 목표값은 한 번에 반영하되, 잘못된 항목 하나 때문에 나머지가 거부되지 않도록 항목마다 검증
+                    targets.update(validate_targets({name: value}))
+                    continue
+                applied.append(path)
+            except CommandError as e:
+                log.warning(f"[Shadow] {path} 값을 반영하지 못했습니다: {e.message}")
+                rejected.append(path)
+        if targets:
+            try:
+                self.command_router.set_setpoints(targets, source="SHADOW")
+                applied += [f"TARGET.{name}" for name in targets]
+            except CommandError as e:
+                log.warning(f"[Shadow] 목표값을 반영하지 못했습니다: {e.message}")
+                rejected += [f"TARGET.{name}" for name in targets]
+
+        with self.lock:
+            self.counts["desired_applied"] += len(applied)
+            self.counts["desired_rejected"] += len(rejected)
+            self.clear_desired.update(applied + rejected)
+            # 거부한 항목은 현재 값을 다시 보고하여 클라우드가 로컬 값을 알도록 함
+            for path in rejected:
+                self.reported.pop(path, None)
+        if applied or rejected:
+            log.info(f"[Shadow] desired 반영: {applied} / 거부: {rejected}")
+        return {"applied": applied, "rejected": rejected}
+
+    def _on_delta(self, msg):
+        """(MQTT 콜백) delta를 반영한 뒤 보고는 동기화 스레드에 맡깁니다. (수신 확인을 기다리면 MQTT 스레드가 멈춤)"""
+        self.apply_delta(codec_for_topic(msg.topic).decode(msg.payload))
+        self.request_sync()
+
+    # --- 실행/종료 ---
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"sync_version": self.sync_version, "desired_version": self.desired_version,
+                    "tracked_fields": len(self.reported), "policy": self.policy, **self.counts}
+
+    def wait(self, timeout: float) -> bool:
+        """보고 요청이 오거나 timeout이 지날 때까지 기다립니다."""
+        woke = self.wake.wait(timeout)
+        self.wake.clear()
+        return woke
+
+    def _sync_loop_worker(self):
+        while not self.stop_event.is_set():
+            try:
+                self.sync_once()
+            except Exception as e:
+                log.error(f"[Shadow] 상태 동기화 중 오류 발생: {e}")
+            self.wait(Config.SHADOW_SYNC_INTERVAL)
+
+    def start(self, scheduler=None):
+        log.info(f"클라우드 상태 동기화를 시작합니다. ({self.update_topic}, 정책 {self.policy})")
+        if scheduler:
+            self.scheduler = scheduler
+            scheduler.every(Config.SHADOW_SYNC_INTERVAL, self.sync_once, name="state_sync", delay=0)
+            return
+        threading.Thread(target=self._sync_loop_worker, daemon=True).start()
+
+    def stop(self):
+        log.info("클라우드 상태 동기화를 정지합니다.")
+        self.stop_event.set()
+        self.wake.set()
@@ -0,0 +1,189 @@
+# =================================================================================
+# Storage_layout.py
+# S3 객체 키 배치(날짜 파티션)와 파티션별 매니페스트 객체 관리
+# S3_KEY_LAYOUT 템플릿으로 키를 만든다. 기본값 "{root}/{name}"은 분석 쪽이 읽는 예전 평면 키이고,
+# 날짜 파티션은 템플릿을 바꿔서 켠다 (이때 분석 쪽이 읽는 경로도 함께 바꿔야 함). 사용할 수 있는 항목:
+#   {root}    기존 평면 키의 첫 경로 (images, bundles)
+#   {device}  DEVICE_ID,  {zone} FARM_ZONE
+#   {yyyy} {mm} {dd} {hh}  촬영 시각
+#   {name}    기존 평면 키의 나머지 경로 (예: thumbnail/20250101_120000.jpg), 반드시 마지막에 위치
+# 예) "{root}/{device}/{zone}/{yyyy}/{mm}/{dd}/{hh}/{name}"이면
+#   "images/thumbnail/20250101_120000.jpg" -> "images/smartfarm-pi-hanium/zone1/2025/01/01/12/thumbnail/20250101_120000.jpg"
+#
+# 파티션을 켰을 때 파티션({name} 앞까지의 경로)마다 <파티션>/_manifest.jsonl 객체에 업로드된 객체의 키, 크기, SHA-256,
+# 지각 해시, 촬영 당시 센서 값을 한 줄씩 기록한다. 로컬 사본에 줄을 덧붙이고 S3_MANIFEST_FLUSH_INTERVAL마다
+# 바뀐 매니페스트만 다시 올리므로, 사진마다 매니페스트 PUT이 추가되지 않는다. 업로드가 멈춰도 남은 줄이
+# 올라가도록 start()로 주기 flush를 돌린다. 평면 키에서는 매니페스트 하나가 끝없이 커지므로 기록하지 않는다.
+# flush는 로컬 사본 전체로 S3 객체를 교체하므로, 로컬 사본이 없던 파티션(보관 기간이 지나 지운 뒤 늦게 올라온 업로드,
+# 새 SD 카드 등)은 처음 올리기 전에 S3의 기존 매니페스트를 받아 앞에 붙인다. (<파티션>/_manifest.jsonl.uploaded가 그 표시)
+# 분석/앱 백엔드는 접두사 전체를 나열하지 않고 매니페스트 하나만 읽으면 된다.
+# =================================================================================
+
+import json
+import os
+import posixpath
+import threading
+import time
+from datetime import datetime, timedelta
+
+from botocore.exceptions import ClientError
+
+from Utility import log
+import Config
+
+MANIFEST_NAME = "_manifest.jsonl"
+
+def _fields(name: str, captured_at: datetime = None) -> dict:
+    captured_at = captured_at or datetime.now()
+    root, _, rest = name.partition("/")
+    return {
+        "root": root, "name": rest or root,
+        "device": Config.DEVICE_ID, "zone": Config.FARM_ZONE,
+        "yyyy": f"{captured_at.year:04d}", "mm": f"{captured_at.month:02d}",
+        "dd": f"{captured_at.day:02d}", "hh": f"{captured_at.hour:02d}",
+    }
+
+def object_key(name: str, captured_at: datetime = None) -> str:
+    """평면 키(예: images/thumbnail/a.jpg)를 S3_KEY_LAYOUT에 따른 실제 S3 키로 바꿉니다."""
+    return Config.S3_KEY_LAYOUT.format(**_fields(name, captured_at))
+
+def partition_of(name: str, captured_at: datetime = None) -> str:
+    """평면 키가 속하는 파티션 경로(템플릿에서 {name} 앞까지)를 반환합니다. 평면 키 배치이면 None입니다."""
+    template = Config.S3_KEY_LAYOUT.split("{name}")[0].rstrip("/")
+    if template == "{root}":
+        return None
+    return template.format(**_fields(name, captured_at))
+
+class PartitionManifests:
+    def __init__(self, s3_client, directory: str = None):
+        self.s3_client = s3_client
+        self.directory = directory or Config.S3_MANIFEST_DIR
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.dirty = set()          # S3에 올린 뒤 줄이 추가된 파티션
+        self.last_flush = time.monotonic()
+        os.makedirs(self.directory, exist_ok=True)
+        self._scan_dirty()
+
+    def _local_path(self, partition: str) -> str:
+        return os.path.join(self.directory, *partition.split("/"), MANIFEST_NAME)
+
+    def _scan_dirty(self):
+        """이전 실행에서 올리지 못한 매니페스트(로컬 크기와 마지막으로 올린 크기가 다른 것)를 찾고, 오래된 사본은 지웁니다."""
+        cutoff = time.time() - timedelta(days=Config.S3_MANIFEST_RETENTION_DAYS).total_seconds()
+        for directory, _, files in os.walk(self.directory):
+            if MANIFEST_NAME not in files:
+                continue
+            path = os.path.join(directory, MANIFEST_NAME)
+            partition = os.path.relpath(directory, self.directory).replace(os.sep, "/")
+            if self._uploaded_size(path) != os.path.getsize(path):
+                self.dirty.add(partition)
+            elif os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                os.remove(path + ".uploaded")
+
+    def _uploaded_size(self, path: str) -> int:
+        try:
+            with open(path + ".uploaded", "r") as f:
+                return int(f.read().strip() or -1)
+        except (FileNotFoundError, ValueError):
+            return -1
+
+    def append(self, partition: str, record: dict):
+        """파티션 매니페스트의 로컬 사본에 한 줄을 덧붙입니다. S3에는 flush 때 올라갑니다."""
+        path = self._local_path(partition)
+        with self.lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.dirty.add(partition)
+
+    def _merge_remote(self, partition: str, path: str) -> bool:
+        """S3의 기존 매니페스트를 받아 로컬 사본 앞에 붙입니다. 올려도 되면 True, S3를 확인하지 못했으면 False입니다."""
+        try:
+            response = self.s3_client.get_object(Bucket=Config.AWS_S3_BUCKET_NAME, Key=posixpath.join(partition, MANIFEST_NAME))
+            remote = response["Body"].read()
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+                log.warning(f"[S3] 매니페스트 {partition}의 기존 내용을 확인하지 못했습니다: {e} | 다음에 다시 시도합니다.")
+                return False
+            remote = b""
+        except Exception as e:
+            log.warning(f"[S3] 매니페스트 {partition}의 기존 내용을 확인하지 못했습니다: {e} | 다음에 다시 시도합니다.")
+            return False
+        if remote and not remote.endswith(b"\n"):
+            remote += b"\n"
+        with self.lock:
+            with open(path, "rb") as f:
+                local = f.read()
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(remote + local)
+            os.replace(tmp_path, path)
+            # 올린 크기 0: S3 내용을 합쳤지만 아직 올리지 않은 상태
+            with open(path + ".uploaded", "w") as f:
+                f.write("0")
+        if remote:
+            log.info(f"[S3] 매니페스트 {partition}의 기존 내용({len(remote)} bytes)에 이어서 기록합니다.")
+        return True
+
+    def flush(self, force: bool = False) -> int:
+        """바뀐 매니페스트를 S3에 올립니다. force가 아니면 S3_MANIFEST_FLUSH_INTERVAL마다 한 번만 올립니다.
+        올린 매니페스트 수를 반환하며, 실패한 매니페스트는 다음에 다시 올립니다."""
+        with self.lock:
+            if not self.dirty or (not force and time.monotonic() - self.last_flush < Config.S3_MANIFEST_FLUSH_INTERVAL):
+                return 0
+            self.last_flush = time.monotonic()
+            partitions = sorted(self.dirty)
+
+        uploaded = 0
+        for partition in partitions:
+            path = self._local_path(partition)
+            if not os.path.exists(path + ".uploaded") and not self._merge_remote(partition, path):
+                continue
+            with self.lock:
+                with open(path, "rb") as f:
+                    body = f.read()
+            try:
+                self.s3_client.put_object(Bucket=Config.AWS_S3_BUCKET_NAME, Key=posixpath.join(partition, MANIFEST_NAME),
+                                          Body=body, ContentType="application/x-ndjson")
+            except Exception as e:
+                log.warning(f"[S3] 매니페스트 {partition} 업로드 실패: {e} | 다음에 다시 시도합니다.")
+                continue
+            with self.lock:
+                with open(path + ".uploaded", "w") as f:
+                    f.write(str(len(body)))
+                if os.path.getsize(path) == len(body):
+                    self.dirty.discard(partition)
+            uploaded += 1
+        if uploaded:
+            log.info(f"[S3] 파티션 매니페스트 {uploaded}개를 갱신했습니다.")
+        return uploaded
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"dirty_partitions": len(self.dirty)}
+
+    def _flush_loop_worker(self):
+        while not self.stop_event.wait(Config.S3_MANIFEST_FLUSH_INTERVAL):
+            self.flush_pending()
+
+    def flush_pending(self):
+        """주기 작업에서 호출됩니다. 바뀐 매니페스트가 있으면 올리고, 오류는 기록만 합니다."""
+        try:
+            self.flush(force=True)
+        except Exception as e:
+            log.error(f"[S3] 매니페스트 갱신 중 오류 발생: {e}")
+
+    def start(self, scheduler=None):
+        log.info(f"파티션 매니페스트 갱신을 시작합니다. ({Config.S3_MANIFEST_FLUSH_INTERVAL}초마다)")
+        if scheduler:
+            scheduler.every(Config.S3_MANIFEST_FLUSH_INTERVAL, self.flush_pending, name="s3_manifests")
+            return
+        threading.Thread(target=self._flush_loop_worker, daemon=True).start()
+
+    def stop(self):
+        """주기 갱신을 멈추고 남은 매니페스트를 올립니다."""
+        log.info("파티션 매니페스트 갱신을 정지합니다.")
+        self.stop_event.set()
+        self.flush_pending()
@@ -0,0 +1,197 @@
+# =================================================================================
+# Telemetry.py
+# 센서/액추에이터 값을 일정 시간 모아 하나의 MQTT 메시지로 발행하는 원격 측정(Telemetry) 발행기
+# 새 센서 샘플마다(최소 TELEMETRY_SAMPLE_INTERVAL 간격) 값을 모으고, TELEMETRY_WINDOW마다 열(column) 단위의
+# 작은 메시지 하나로 묶어 QoS 1로 TELEMETRY_TOPIC에 발행한다.
+#   {"device", "seq", "t0": 첫 샘플 시각(epoch 초), "dt": [t0로부터의 초],
+#    "scale": 100, "sensor": {"TEMP": [...], ...}, "actuator": {"FAN": [...], ...}, "mode": [...]}
+# 센서 값은 scale을 곱한 정수로 보낸다. (예: 23.45도 -> 2345) 이진 코덱에서 실수는 8바이트지만 정수는 1~3바이트이다.
+# 메시지는 토픽에 지정된 코덱(MQTT_TOPIC_CODECS, 예: "msgpack+zlib")으로 직렬화된다.
+# 브로커에 연결되지 않았거나 수신 확인(PUBACK)을 받지 못한 묶음은 TELEMETRY_BUFFER_FILE에 보관했다가
+# 다시 연결되면 오래된 묶음부터 순서대로 발행한다. 클라우드는 seq로 중복 수신을 걸러낼 수 있다.
+# =================================================================================
+
+import json
+import os
+import threading
+import time
+
+from Utility import log, system_clock
+import Config
+from _System_ import SystemState
+
+SENSOR_SCALE = 100  # 센서 값을 정수로 보내기 위해 곱하는 값 (소수점 둘째 자리까지)
+
+class TelemetryBuffer:
+    """발행하지 못한 묶음을 한 줄씩 보관하는 파일입니다. 크기가 넘치면 가장 오래된 묶음부터 버립니다."""
+    def __init__(self, path: str = None, max_kb: int = None):
+        self.path = path or Config.TELEMETRY_BUFFER_FILE
+        self.max_bytes = (max_kb or Config.TELEMETRY_BUFFER_MAX_KB) * 1024
+        self.lock = threading.Lock()
+
+    def _read(self) -> list:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return []
+        batches = []
+        for line in lines:
+            try:
+                batches.append(json.loads(line))
+            except json.JSONDecodeError:
+                log.warning("[Telemetry] 보관 파일의 잘린 줄을 무시합니다.")
+        return batches
+
+    def _write(self, batches: list):
+        """보관 파일을 새로 쓴 뒤 교체합니다. 크기 제한을 넘는 오래된 묶음은 버립니다."""
+        lines = [json.dumps(batch, ensure_ascii=False, separators=(",", ":")) + "\n" for batch in batches]
+        dropped = 0
+        total = sum(len(line.encode("utf-8")) for line in lines)
+        while lines and total > self.max_bytes:
+            total -= len(lines.pop(0).encode("utf-8"))
+            dropped += 1
+        if dropped:
+            log.warning(f"[Telemetry] 보관 파일이 가득 차 오래된 묶음 {dropped}개를 버립니다.")
+        if not lines:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def append(self, batch: dict):
+        with self.lock:
+            self._write(self._read() + [batch])
+
+    def take(self, count: int) -> list:
+        """가장 오래된 묶음을 최대 count개 반환합니다. (보관 파일에서는 remove로 지움)"""
+        with self.lock:
+            return self._read()[:count]
+
+    def remove(self, count: int):
+        with self.lock:
+            self._write(self._read()[count:])
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self._read())
+
+class TelemetryPublisher:
+    def __init__(self, state: SystemState, aws, clock=None, buffer: TelemetryBuffer = None):
+        self.state = state
+        self.aws = aws
+        self.clock = clock or system_clock
+        self.buffer = buffer or TelemetryBuffer()
+        self.lock = threading.Lock()
+        self.samples = []           # (시각, 센서 값, 액추에이터 값, 모드)
+        self.last_sample_time = None
+        self.seq = int(time.time())  # 재시작 후에도 증가하도록 시작 값을 현재 시각으로 함
+        self.counts = {"published": 0, "buffered": 0}
+        self.stop_event = threading.Event()
+        self.state.add_sample_listener(self._on_sample)
+
+    def _on_sample(self):
+        """(센서 샘플 콜백) TELEMETRY_SAMPLE_INTERVAL이 지났으면 현재 값을 묶음에 추가합니다."""
+        now = self.clock.time()
+        if self.last_sample_time is not None and now - self.last_sample_time < Config.TELEMETRY_SAMPLE_INTERVAL:
+            return
+        self.last_sample_time = now
+        data = self.state.get_all_data()
+        with self.lock:
+            self.samples.append((time.time(), dict(data["SENSOR"]), dict(data["ACTUATOR"]), data.get("MODE")))
+
+    def build_batch(self, samples: list) -> dict:
+        """샘플 목록을 열 단위의 작은 메시지로 만듭니다."""
+        t0 = int(samples[0][0])
+        sensor_names = sorted({name for _, sensors, _, _ in samples for name in sensors})
+        actuator_names = sorted({name for _, _, actuators, _ in samples for name in actuators})
+        self.seq += 1
+        return {
+            "device": Config.DEVICE_ID,
+            "seq": self.seq,
+            "t0": t0,
+            "dt": [round(sample_time - t0) for sample_time, _, _, _ in samples],
+            "scale": SENSOR_SCALE,
+            "sensor": {name: [self._scale(sensors.get(name)) for _, sensors, _, _ in samples] for name in sensor_names},
+            "actuator": {name: [actuators.get(name) for _, _, actuators, _ in samples] for name in actuator_names},
+            "mode": [mode for _, _, _, mode in samples],
+        }
+
+    def _scale(self, value):
+        return round(value * SENSOR_SCALE) if isinstance(value, (int, float)) else None
+
+    def _publish(self, batch: dict) -> bool:
+        return self.aws.publish_confirmed(Config.TELEMETRY_TOPIC, batch, qos=1, timeout=Config.TELEMETRY_PUBLISH_TIMEOUT)
+
+    def _drain(self) -> bool:
+        """보관된 묶음을 오래된 순서대로 발행합니다. 모두 발행했으면 True를 반환합니다."""
+        while True:
+            batches = self.buffer.take(Config.TELEMETRY_DRAIN_BATCHES)
+            if not batches:
+                return True
+            sent = 0
+            for batch in batches:
+                if self.stop_event.is_set() and sent:
+                    break
+                if not self._publish(batch):
+                    break
+                sent += 1
+            if sent:
+                self.buffer.remove(sent)
+                self.counts["published"] += sent
+                log.info(f"[Telemetry] 보관했던 묶음 {sent}개를 발행했습니다.")
+            if sent < len(batches):
+                return False
+
+    def flush(self):
+        """모인 샘플을 묶음으로 만들어 발행합니다. 발행하지 못하면 보관 파일에 넣어 두었다가 다음에 다시 발행합니다."""
+        with self.lock:
+            samples, self.samples = self.samples, []
+        batch = self.build_batch(samples) if samples else None
+
+        # 순서를 지키기 위해 보관된 묶음을 먼저 발행
+        if self.aws.mqtt_client.is_connected() and self._drain() and batch:
+            if self._publish(batch):
+                self.counts["published"] += 1
+                log.debug(f"[Telemetry] 샘플 {len(samples)}개를 묶음 {batch['seq']}로 발행했습니다.")
+                return
+        if batch:
+            self.buffer.append(batch)
+            self.counts["buffered"] += 1
+            log.info(f"[Telemetry] 브로커에 연결되지 않아 묶음 {batch['seq']}을(를) 보관합니다.")
+
+    def stats(self) -> dict:
+        with self.lock:
+            pending = len(self.samples)
+        return {"pending_samples": pending, "buffered_batches": len(self.buffer), **self.counts}
+
+    def _telemetry_loop_worker(self):
+        while not self.stop_event.wait(Config.TELEMETRY_WINDOW):
+            try:
+                self.flush()
+            except Exception as e:
+                log.error(f"[Telemetry] 원격 측정 발행 중 오류 발생: {e}")
+
+    def start(self, scheduler=None):
+        log.info(f"원격 측정 발행을 시작합니다. ({Config.TELEMETRY_WINDOW}초마다 '{Config.TELEMETRY_TOPIC}')")
+        if scheduler:
+            scheduler.every(Config.TELEMETRY_WINDOW, self.flush, name="telemetry")
+            return
+        threading.Thread(target=self._telemetry_loop_worker, daemon=True).start()
+
+    def stop(self):
+        """남은 샘플을 발행하거나 보관한 뒤 정지합니다."""
+        log.info("원격 측정 발행을 정지합니다.")
+        self.stop_event.set()
+        try:
+            self.flush()
+        except Exception as e:
+            log.error(f"[Telemetry] 남은 샘플을 처리하지 못했습니다: {e}")
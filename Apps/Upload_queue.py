@@ -0,0 +1,320 @@
+# =================================================================================
+# Upload_queue.py
+# 촬영된 사진을 S3에 올리는 크기 제한 업로드 큐와 작업 스레드 풀
+# 촬영 단계는 파일(또는 메모리의 JPEG 데이터)을 큐에 넘기기만 하므로 업로드가 느려도 다음 촬영이 지연되지 않는다.
+# 큐에 넘긴 파일은 먼저 디스크 스풀(Upload_spool.py)에 기록되므로, 업로드가 실패하거나
+# 프로그램이 다시 시작되어도 잃지 않고 추가된 순서대로 이어서 업로드한다.
+# 메모리의 JPEG 데이터(submit_bytes)는 쉬고 있는 작업 스레드가 있고 업로드가 실패하고 있지 않으면
+# SD 카드에 쓰지 않고 메모리에서 바로 올린다(upload_bytes). 업로드에 실패하거나, 기다려야 하거나,
+# 정지할 때 아직 올리지 못했으면 그때 스풀에 기록한다. (업로드 중 전원이 꺼지면 그 사진은 업로드되지 않음)
+#   - 업로드가 실패하면 그 파일을 큐의 맨 앞에 되돌리고, 연속 실패 횟수에 따라 지수적으로 늘어나는
+#     시간(UPLOAD_RETRY_BASE ~ UPLOAD_RETRY_MAX) 동안 모든 업로드를 멈춘다. (연결이 돌아오면 순서대로 재개)
+#     두 번 이상 실패한 파일은 큐의 맨 뒤로 보내 한 파일 때문에 나머지 업로드가 막히지 않게 한다.
+#   - 권한 오류, 버킷 없음처럼 다시 시도해도 성공할 수 없는 실패(PermanentUploadError)나
+#     UPLOAD_MAX_ATTEMPTS번 실패한 파일은 스풀의 dead_letter/로 격리하고 나머지를 계속 업로드한다.
+#   - 기다리는 파일은 스풀에 기록되고 큐에는 위치만 보관하므로, 대기 중인 파일이 많아도 메모리를 차지하지 않는다.
+#   - 쌓인 파일을 한꺼번에 올릴 때 회선을 독점하지 않도록 AWSHandler가 업로드 대역폭을 제한한다.
+#   - 업로드가 끝난 뒤 알려야 하는 파일(묶음 분석 요청 등)은 스풀에 함께 기록된 MQTT 메시지를 업로드 성공 후 발행하고,
+#     브로커의 수신 확인을 받은 뒤에 스풀에서 지운다. 발행에 실패하면 업로드했다고 기록해 두고 발행만 다시 시도한다.
+#     (이미 올라간 객체이므로 재시도 횟수와 상관없이 격리하지 않음)
+#   - 업로드가 끝난 파일은 키, 크기, SHA-256과 함께 넘긴 메타데이터(meta)를 AWSHandler의 파티션 매니페스트에 기록한다.
+# 큐가 가득 차면 UPLOAD_QUEUE_POLICY에 따라 처리한다.
+#   "DROP_OLDEST": 가장 오래된 대기 파일을 버리고 새 파일을 넣음 (최신 사진 우선)
+#   "DROP_NEWEST": 새 파일을 버림
+#   "BLOCK": UPLOAD_BLOCK_TIMEOUT 동안 자리가 나기를 기다린 뒤, 그래도 가득 차 있으면 새 파일을 버림
+# =================================================================================
+
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from Utility import log
+import Config
+from Upload_spool import UploadSpool
+from AWS_control import PermanentUploadError
+
+class UploadJob:
+    def __init__(self, entry: dict, local_path: str, data=None):
+        self.entry = entry
+        self.id = entry["id"]
+        self.object_name = entry["object_name"]
+        self.size = entry["size"]
+        self.sha256 = entry.get("sha256")
+        self.notify = entry.get("notify")    # 업로드 성공 후 발행할 MQTT 메시지
+        self.meta = entry.get("meta")        # 업로드 성공 후 파티션 매니페스트에 기록할 정보
+        self.uploaded = bool(entry.get("uploaded"))  # 업로드는 끝났고 notify 발행만 남았으면 True
+        self.local_path = local_path    # 스풀 파일 (업로드 성공 후 삭제)
+        self.data = data                # 스풀에 기록하지 않고 메모리에서 바로 올릴 데이터 (기록하면 None)
+        self.attempts = 0               # 실패한 업로드 시도 횟수
+        self.created = time.monotonic()
+
+class UploadQueue:
+    POLICIES = ("DROP_OLDEST", "DROP_NEWEST", "BLOCK")
+
+    def __init__(self, aws, maxsize: int = None, workers: int = None, policy: str = None, spool: UploadSpool = None):
+        self.aws = aws
+        self.maxsize = maxsize or Config.UPLOAD_QUEUE_SIZE
+        self.worker_count = workers or Config.UPLOAD_WORKERS
+        self.policy = policy or Config.UPLOAD_QUEUE_POLICY
+        if self.policy not in self.POLICIES:
+            raise ValueError(f"알 수 없는 업로드 큐 정책입니다: {self.policy}")
+
+        self.spool = spool or UploadSpool()
+        self.jobs = deque(UploadJob(entry, self.spool.path_of(entry)) for entry in self.spool.pending())
+        self.condition = threading.Condition()
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.active = 0
+        self.counts = {"submitted": 0, "uploaded": 0, "failed": 0, "dropped": 0, "dead_lettered": 0, "from_memory": 0}
+        self.last_wait = 0.0    # 마지막으로 업로드된 파일의 큐 대기 시간 (초)
+        self.failures = 0       # 연속 업로드 실패 횟수
+        self.retry_at = 0.0     # 이 시각(monotonic)까지 업로드를 멈춤
+
+    def _discard(self, job: UploadJob, reason: str):
+        """업로드하지 않을 파일을 스풀에서 지웁니다."""
+        self.counts["dropped"] += 1
+        log.warning(f"[Upload] {reason}: {job.object_name}을(를) 업로드하지 않고 버립니다.")
+        job.data = None
+        self.spool.complete(job.id)
+
+    def _persist(self, job: UploadJob):
+        """메모리에만 있는 데이터를 스풀에 기록합니다. (업로드 실패, 정지 등으로 바로 올리지 못할 때)"""
+        if job.data is None:
+            return
+        self.spool.write_bytes(job.entry, job.data)
+        job.data = None
+
+    def _remove_file(self, path: str):
+        if path and os.path.exists(path):
+            os.remove(path)
+            log.info(f"임시 파일 삭제: {path}")
+
+    def submit(self, local_path: str, object_name: str, notify: dict = None, meta: dict = None) -> bool:
+        """파일을 업로드 큐에 넣습니다. 파일은 스풀로 옮겨지며, 정책에 따라 버려졌으면 False를 반환합니다.
+        notify({"topic", "payload"})를 주면 업로드가 끝난 뒤 그 메시지를 MQTT로 발행합니다.
+        meta({"partition", ...})를 주면 업로드가 끝난 뒤 그 파티션의 매니페스트에 기록합니다."""
+        if self._admit(object_name, lambda immediate: (self.spool.add_file(local_path, object_name, notify, meta), None)):
+            return True
+        self._remove_file(local_path)
+        return False
+
+    def submit_bytes(self, data: bytes, object_name: str, notify: dict = None, meta: dict = None, durable: bool = False) -> bool:
+        """메모리의 데이터를 업로드 큐에 넣습니다. 정책에 따라 버려졌으면 False를 반환합니다.
+        바로 올릴 수 있으면 메모리에서 올리고, 기다려야 하면 스풀 파일로 저장합니다.
+        durable이면 호출한 쪽이 원본을 지울 수 있도록 항상 먼저 스풀에 기록합니다. (묶음 업로드)"""
+        def add(immediate: bool):
+            if durable or not immediate:
+                return self.spool.add_bytes(data, object_name, notify, meta), None
+            return self.spool.memory_entry(data, object_name, notify, meta), data
+        return self._admit(object_name, add)
+
+    def _idle_worker(self) -> bool:
+        """새 파일을 기다리지 않고 바로 올릴 수 있는지 반환합니다. (condition 보유 상태에서 호출)"""
+        return bool(self.threads) and not self.stop_event.is_set() and not self.failures \
+            and len(self.jobs) + self.active < self.worker_count
+
+    def _admit(self, object_name: str, add_to_queue) -> bool:
+        """자리를 마련하고, 스풀에 기록한 뒤 큐에 넣는 과정을 한 번에 처리합니다.
+        (동시에 들어온 파일들이 같은 빈자리를 차지하여 큐가 maxsize를 넘지 않도록 함)"""
+        with self.condition:
+            if not self._reserve():
+                log.warning(f"[Upload] 업로드 큐가 가득 찼습니다: {object_name}을(를) 업로드하지 않고 버립니다.")
+                return False
+            entry, data = add_to_queue(self._idle_worker())
+            self.jobs.append(UploadJob(entry, self.spool.path_of(entry), data))
+            self.counts["submitted"] += 1
+            self.condition.notify_all()
+            pending = len(self.jobs)
+        log.info(f"[Upload] 업로드 대기열에 추가: {object_name} (대기 {pending}개)")
+        return True
+
+    def _reserve(self) -> bool:
+        """새 파일을 넣을 자리를 정책에 따라 마련합니다. 자리가 없으면 False를 반환합니다. (condition 보유 상태에서 호출)"""
+        if len(self.jobs) < self.maxsize:
+            return True
+        if self.policy == "DROP_OLDEST":
+            self._discard(self.jobs.popleft(), "업로드 큐가 가득 찼습니다")
+            return True
+        if self.policy == "BLOCK":
+            self.condition.wait_for(lambda: len(self.jobs) < self.maxsize or self.stop_event.is_set(),
+                                    Config.UPLOAD_BLOCK_TIMEOUT)
+        if len(self.jobs) < self.maxsize:
+            return True
+        self.counts["dropped"] += 1
+        return False
+
+    def _backoff(self) -> float:
+        """연속 실패 횟수에 따른 재시도 대기 시간입니다. 여러 장치가 동시에 재시도하지 않도록 무작위 지터를 더합니다."""
+        delay = min(Config.UPLOAD_RETRY_MAX, Config.UPLOAD_RETRY_BASE * 2 ** (self.failures - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _next_job(self):
+        """업로드할 다음 파일을 꺼냅니다. 재시도 대기 중이면 대기가 끝날 때까지 기다리고, 정지되면 None을 반환합니다."""
+        with self.condition:
+            while not self.stop_event.is_set():
+                if not self.jobs:
+                    self.condition.wait()
+                    continue
+                wait = self.retry_at - time.monotonic()
+                if wait > 0:
+                    self.condition.wait(wait)
+                    continue
+                if self.failures and self.active:
+                    # 연결 장애 중에는 한 파일로만 연결을 확인하고, 성공하면 나머지 작업 스레드가 이어서 업로드
+                    self.condition.wait()
+                    continue
+                job = self.jobs.popleft()
+                self.active += 1
+                # BLOCK 정책에서 자리가 나기를 기다리는 submit을 깨움
+                self.condition.notify_all()
+                return job
+            return None
+
+    def _notify(self, job: UploadJob) -> bool:
+        """업로드가 끝난 파일의 MQTT 메시지를 발행하고 수신 확인을 기다립니다. 실패하면 업로드했다고 기록해 둡니다."""
+        if self.aws.publish_confirmed(job.notify["topic"], job.notify["payload"], qos=1, timeout=Config.BUNDLE_NOTIFY_TIMEOUT):
+            return True
+        log.warning(f"[Upload] {job.object_name}의 알림을 '{job.notify['topic']}'에 발행하지 못했습니다. 업로드는 끝났으므로 발행만 다시 시도합니다.")
+        # 발행을 다시 시도하려면 스풀 기록이 필요
+        self._persist(job)
+        if not job.uploaded:
+            job.uploaded = True
+            self.spool.mark_uploaded(job.id)
+        return False
+
+    def _dead_letter(self, job: UploadJob, reason: str):
+        """다시 시도하지 않을 파일을 스풀의 dead_letter/로 격리합니다."""
+        self.counts["dead_lettered"] += 1
+        log.error(f"[Upload] {job.object_name}을(를) 격리합니다 ({job.attempts}회 시도): {reason}")
+        self._persist(job)
+        self.spool.dead_letter(job.id, reason, job.attempts)
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+
+            if not job.uploaded and job.data is None and not os.path.exists(job.local_path):
+                with self.condition:
+                    self.active -= 1
+                    self._discard(job, "스풀 파일이 없습니다")
+                    self.condition.notify_all()
+                continue
+
+            wait = time.monotonic() - job.created
+            permanent = None
+            from_memory = job.data is not None
+            try:
+                if job.uploaded:
+                    ok = True
+                elif from_memory:
+                    ok = self.aws.upload_bytes(job.data, job.object_name)
+                else:
+                    ok = self.aws.upload_to_s3(job.local_path, job.object_name)
+            except PermanentUploadError as e:
+                ok, permanent = False, str(e)
+            except Exception as e:
+                log.error(f"[Upload] 업로드 중 예기치 않은 오류 발생: {e}")
+                ok = False
+
+            if ok and not job.uploaded and job.meta:
+                self.aws.record_upload(job.object_name, job.size, job.sha256, job.meta)
+            if ok and job.notify and not self._notify(job):
+                ok = False
+            if ok:
+                job.data = None
+                self.spool.complete(job.id)
+            elif not permanent:
+                # 다시 시도하는 동안 잃지 않도록 스풀에 기록 (격리할 파일은 _dead_letter에서 기록)
+                self._persist(job)
+            with self.condition:
+                self.active -= 1
+                if ok:
+                    self.counts["uploaded"] += 1
+                    self.counts["from_memory"] += from_memory
+                    self.last_wait = wait
+                    if self.failures:
+                        log.info(f"[Upload] 업로드가 재개되었습니다. (남은 파일 {len(self.jobs)}개)")
+                    self.failures = 0
+                    self.retry_at = 0.0
+                elif permanent:
+                    # 이 파일만의 문제이므로 다른 업로드는 멈추지 않음
+                    self.counts["failed"] += 1
+                    job.attempts += 1
+                    self._dead_letter(job, permanent)
+                else:
+                    self.counts["failed"] += 1
+                    self.failures += 1
+                    delay = self._backoff()
+                    self.retry_at = max(self.retry_at, time.monotonic() + delay)
+                    if job.uploaded:
+                        # 객체는 이미 올라갔고 알림만 남았으므로 격리하지 않고 브로커 연결이 돌아올 때까지 다시 시도
+                        self.jobs.append(job)
+                        log.warning(f"[Upload] {job.object_name} 알림 발행 실패. {delay:.1f}초 후 다시 시도합니다.")
+                    else:
+                        job.attempts += 1
+                        if job.attempts >= Config.UPLOAD_MAX_ATTEMPTS:
+                            self._dead_letter(job, f"{job.attempts}회 연속 업로드 실패")
+                        else:
+                            if job.attempts >= 2:
+                                # 같은 파일이 거듭 실패하면 뒤로 보내 다른 파일로 연결을 확인하고 나머지를 계속 업로드
+                                self.jobs.append(job)
+                            else:
+                                # 순서를 지키기 위해 맨 앞에 되돌림
+                                self.jobs.appendleft(job)
+                            log.warning(f"[Upload] {job.object_name} 업로드 실패 ({job.attempts}회째). {delay:.1f}초 후 다시 시도합니다.")
+                self.condition.notify_all()
+
+    def retry_dead_letters(self) -> int:
+        """격리된 파일을 다시 업로드 큐에 넣고 그 수를 반환합니다. (원인을 해결한 뒤 사용)"""
+        with self.condition:
+            entries = self.spool.retry_dead_letters()
+            for entry in entries:
+                self.jobs.append(UploadJob(entry, self.spool.path_of(entry)))
+            self.condition.notify_all()
+        if entries:
+            log.info(f"[Upload] 격리했던 파일 {len(entries)}개를 다시 업로드합니다.")
+        return len(entries)
+
+    def join(self, timeout: float = None) -> bool:
+        """대기 중인 파일과 진행 중인 업로드가 모두 끝날 때까지 기다립니다."""
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.jobs and self.active == 0, timeout)
+
+    def stats(self) -> dict:
+        with self.condition:
+            return {
+                "pending": len(self.jobs),
+                "active": self.active,
+                "policy": self.policy,
+                "last_wait_s": round(self.last_wait, 2),
+                "consecutive_failures": self.failures,
+                "retry_in_s": round(max(0.0, self.retry_at - time.monotonic()), 1),
+                "spool_mb": round(self.spool.size() / 1024 / 1024, 2),
+                "dead_letter": self.spool.dead_letter_count(),
+                **self.counts,
+            }
+
+    def start(self):
+        if self.threads:
+            return
+        log.info(f"업로드 작업 스레드 {self.worker_count}개를 시작합니다. (큐 크기 {self.maxsize}, 정책 {self.policy})")
+        for _ in range(self.worker_count):
+            thread = threading.Thread(target=self._worker, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        log.info("업로드 작업 스레드를 정지합니다.")
+        with self.condition:
+            self.stop_event.set()
+            self.condition.notify_all()
+            for job in self.jobs:
+                self._persist(job)
+            pending = len(self.jobs)
+        if pending:
+            log.info(f"[Upload] 업로드되지 않은 파일 {pending}개는 스풀에 보관되어 다음 실행 시 업로드됩니다.")
+        self.aws.flush_manifests()
@@ -0,0 +1,225 @@
+# =================================================================================
+# Upload_spool.py
+# 업로드할 파일을 디스크에 보관하는 스풀(spool)과 충돌에 안전한 매니페스트
+# 업로드 대기 파일은 UPLOAD_SPOOL_DIR에 복사/이동되고, manifest.jsonl에 한 줄씩 기록된다.
+#   {"op": "add", "id", "object_name", "file", "size", "sha256", "created", "notify", "meta"}  스풀에 추가
+#     (notify: 업로드가 끝나면 발행할 MQTT 메시지 {"topic", "payload"}, 없으면 null)
+#     (meta: 업로드가 끝나면 파티션 매니페스트에 함께 기록할 정보, 없으면 null)
+#   {"op": "uploaded", "id"}                                       업로드는 끝났으나 notify 발행 전 (다시 시작하면 발행만 다시 시도)
+#   {"op": "done", "id"}                                           업로드 완료 또는 버림
+# 업로드 큐가 메모리에서 바로 올리는 데이터는 memory_entry로 항목만 만들고, 업로드에 실패했을 때 write_bytes로 기록한다.
+# 다시 시도해도 올릴 수 없는 파일(권한 오류, 재시도 횟수 초과 등)은 dead_letter/로 옮겨 격리한다.
+#   dead_letter/<id>.dat  스풀 파일,  dead_letter/<id>.json  항목 정보와 실패 사유, 시도 횟수
+#   격리된 파일은 원인을 해결한 뒤 retry_dead_letters()로 다시 스풀에 넣을 수 있다.
+# 줄마다 fsync하므로 전원이 꺼져도 기록된 줄까지는 남고, 마지막 줄이 잘려 있으면 무시한다.
+# 다시 시작하면 기록을 재생하여 남은 파일을 추가된 순서대로 이어서 업로드한다.
+# 완료된 줄이 쌓이면 남은 항목만 새 매니페스트로 다시 쓴다(compaction).
+# =================================================================================
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from Utility import log
+import Config
+
+COMPACT_THRESHOLD = 200     # 완료 기록이 이 수만큼 쌓이면 매니페스트를 다시 씀
+DEAD_LETTER_DIR = "dead_letter"
+ENTRY_KEYS = ("id", "object_name", "file", "size", "sha256", "created", "notify", "meta", "uploaded")
+
+class UploadSpool:
+    def __init__(self, directory: str = None):
+        self.directory = directory or Config.UPLOAD_SPOOL_DIR
+        self.manifest_path = os.path.join(self.directory, "manifest.jsonl")
+        self.dead_letter_dir = os.path.join(self.directory, DEAD_LETTER_DIR)
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()    # id -> {"id", "object_name", "file", "size", "sha256", "created", "notify", "meta", "uploaded"} (추가된 순서)
+        self.completed = 0              # 마지막 compaction 이후 완료 기록 수
+        self._load()
+
+    def _path(self, entry: dict) -> str:
+        return os.path.join(self.directory, entry["file"])
+
+    # --- 매니페스트 ---
+
+    def _load(self):
+        os.makedirs(self.dead_letter_dir, exist_ok=True)
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        log.warning("[Spool] 매니페스트의 잘린 줄을 무시합니다.")
+                        continue
+                    if record.get("op") == "add":
+                        self.entries[record["id"]] = {key: record.get(key) for key in ENTRY_KEYS}
+                    elif record.get("op") == "uploaded" and record["id"] in self.entries:
+                        self.entries[record["id"]]["uploaded"] = True
+                    elif record.get("op") == "done":
+                        self.entries.pop(record["id"], None)
+        except FileNotFoundError:
+            pass
+
+        # 파일이 없는 항목과 매니페스트에 없는 파일(기록 전에 멈춘 경우)을 정리
+        for entry_id, entry in list(self.entries.items()):
+            if not os.path.exists(self._path(entry)):
+                log.warning(f"[Spool] 스풀 파일이 없어 {entry['object_name']}을(를) 건너뜁니다.")
+                del self.entries[entry_id]
+        known = {entry["file"] for entry in self.entries.values()} | {os.path.basename(self.manifest_path), DEAD_LETTER_DIR}
+        for name in os.listdir(self.directory):
+            if name not in known:
+                os.remove(os.path.join(self.directory, name))
+        self._compact()
+        if self.entries:
+            log.info(f"[Spool] 이전 실행에서 업로드하지 못한 파일 {len(self.entries)}개를 이어서 업로드합니다.")
+
+    def _append(self, record: dict):
+        with open(self.manifest_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _compact(self):
+        """남은 항목만으로 매니페스트를 새로 쓴 뒤 교체합니다."""
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(dict(entry, op="add"), ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+        self.completed = 0
+
+    # --- 추가/완료 ---
+
+    def _new_entry(self, object_name: str, notify: dict = None, meta: dict = None) -> dict:
+        entry_id = uuid.uuid4().hex
+        return {"id": entry_id, "object_name": object_name, "file": f"{entry_id}.dat", "size": 0, "sha256": None,
+                "created": time.time(), "notify": notify, "meta": meta, "uploaded": False}
+
+    def _commit(self, entry: dict) -> dict:
+        entry["size"] = os.path.getsize(self._path(entry))
+        if entry["sha256"] is None:
+            digest = hashlib.sha256()
+            with open(self._path(entry), "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            entry["sha256"] = digest.hexdigest()
+        with self.lock:
+            self.entries[entry["id"]] = entry
+            self._append(dict(entry, op="add"))
+        return entry
+
+    def memory_entry(self, data, object_name: str, notify: dict = None, meta: dict = None) -> dict:
+        """메모리의 데이터에 대한 항목을 만듭니다. 디스크에는 아무것도 쓰지 않으며, 필요할 때 write_bytes로 기록합니다."""
+        entry = self._new_entry(object_name, notify, meta)
+        entry["size"] = len(data)
+        entry["sha256"] = hashlib.sha256(data).hexdigest()
+        return entry
+
+    def add_bytes(self, data, object_name: str, notify: dict = None, meta: dict = None) -> dict:
+        """메모리의 데이터를 스풀 파일로 저장하고 매니페스트에 기록합니다."""
+        return self.write_bytes(self.memory_entry(data, object_name, notify, meta), data)
+
+    def write_bytes(self, entry: dict, data) -> dict:
+        """memory_entry로 만든 항목의 데이터를 스풀 파일로 저장하고 매니페스트에 기록합니다."""
+        tmp_path = self._path(entry) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path(entry))
+        return self._commit(entry)
+
+    def add_file(self, local_path: str, object_name: str, notify: dict = None, meta: dict = None) -> dict:
+        """파일을 스풀 디렉토리로 옮기고 매니페스트에 기록합니다."""
+        entry = self._new_entry(object_name, notify, meta)
+        shutil.move(local_path, self._path(entry))
+        return self._commit(entry)
+
+    def _finish(self, entry_id: str):
+        """항목을 매니페스트에서 지우고 반환합니다. (lock 보유 상태에서 호출)"""
+        entry = self.entries.pop(entry_id, None)
+        if entry is None:
+            return None
+        self._append({"op": "done", "id": entry_id})
+        self.completed += 1
+        if self.completed >= COMPACT_THRESHOLD:
+            self._compact()
+        return entry
+
+    def mark_uploaded(self, entry_id: str):
+        """업로드는 끝났지만 notify를 아직 발행하지 못한 항목으로 기록합니다. 다시 시도할 때 업로드는 건너뜁니다."""
+        with self.lock:
+            entry = self.entries.get(entry_id)
+            if entry is None or entry.get("uploaded"):
+                return
+            entry["uploaded"] = True
+            self._append({"op": "uploaded", "id": entry_id})
+
+    def complete(self, entry_id: str):
+        """업로드가 끝났거나 버린 항목을 매니페스트에서 지우고 스풀 파일을 삭제합니다."""
+        with self.lock:
+            entry = self._finish(entry_id)
+        if entry is None:
+            return
+        try:
+            os.remove(self._path(entry))
+        except FileNotFoundError:
+            pass
+
+    def dead_letter(self, entry_id: str, reason: str, attempts: int = 0):
+        """다시 시도하지 않을 항목을 매니페스트에서 지우고 스풀 파일을 dead_letter/로 옮깁니다."""
+        with self.lock:
+            entry = self._finish(entry_id)
+            if entry is None:
+                return
+            record = dict(entry, reason=reason, attempts=attempts, failed_at=time.time())
+            tmp_path = os.path.join(self.dead_letter_dir, f"{entry_id}.json.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(record, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(self._path(entry)):
+                os.replace(self._path(entry), os.path.join(self.dead_letter_dir, entry["file"]))
+            os.replace(tmp_path, os.path.join(self.dead_letter_dir, f"{entry_id}.json"))
+
+    def dead_letters(self) -> list:
+        """격리된 항목 정보(실패 사유 포함) 목록을 반환합니다."""
+        records = []
+        for name in sorted(os.listdir(self.dead_letter_dir)):
+            if name.endswith(".json"):
+                with open(os.path.join(self.dead_letter_dir, name), "r", encoding="utf-8") as f:
+                    records.append(json.load(f))
+        return records
+
+    def retry_dead_letters(self) -> list:
+        """격리된 파일을 다시 스풀에 넣고 새 항목 목록을 반환합니다. (업로드 큐에 넣는 것은 호출한 쪽이 함)"""
+        entries = []
+        for record in self.dead_letters():
+            path = os.path.join(self.dead_letter_dir, record["file"])
+            if os.path.exists(path):
+                entries.append(self.add_file(path, record["object_name"], record.get("notify"), record.get("meta")))
+            os.remove(os.path.join(self.dead_letter_dir, f"{record['id']}.json"))
+        return entries
+
+    def path_of(self, entry: dict) -> str:
+        return self._path(entry)
+
+    def pending(self) -> list:
+        """남은 항목을 추가된 순서대로 반환합니다."""
+        with self.lock:
+            return list(self.entries.values())
+
+    def dead_letter_count(self) -> int:
+        return sum(1 for name in os.listdir(self.dead_letter_dir) if name.endswith(".json"))
+
+    def size(self) -> int:
+        with self.lock:
+            return sum(entry["size"] for entry in self.entries.values())
@@ -9,6 +9,7 @@ import os
 import logging
 from logging.handlers import RotatingFileHandler
 import time
+import threading
 
 # 내부 모듈 호출
 import Config
@@ -77,16 +78,36 @@ def setup_logger():
 log = setup_logger()
 
 
+# 시계 객체 (시뮬레이션에서 가상 시계로 교체할 수 있도록 주입)
+class SystemClock:
+    """실제 시간을 사용하는 기본 시계입니다."""
+    def time(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+system_clock = SystemClock()
+
+class MonotonicClock(SystemClock):
+    """시스템 시각이 바뀌어도 거꾸로 가지 않는 시계입니다. (주기 작업 예약용)"""
+    def time(self):
+        return time.monotonic()
+
+monotonic_clock = MonotonicClock()
+
+
 # PID 함수 (현재는 온도 조절에 사용)
 class PID:
-    def __init__(self, Kp, Ki, Kd, setpoint):
+    def __init__(self, Kp, Ki, Kd, setpoint, clock=None):
         self.Kp, self.Ki, self.Kd = Kp, Ki, Kd
         self.setpoint = setpoint
+        self.clock = clock or system_clock
         self.last_error, self.integral = 0.0, 0.0
-        self.last_time = time.time()
+        self.last_time = self.clock.time()
 
     def compute(self, measured_value):
-        current_time = time.time()
+        current_time = self.clock.time()
         dt = current_time - self.last_time
 
         if dt <= 0: return 0
@@ -100,4 +121,44 @@ class PID:
         self.last_error = error
         self.last_time = current_time
         
-        return output
\ No newline at end of file
+        return output
+
+# 토큰 버킷 (업로드 대역폭 제한 등에 사용)
+class TokenBucket:
+    """초당 rate만큼 토큰이 채워지고 최대 capacity까지 쌓이는 토큰 버킷입니다. rate가 0이면 제한하지 않습니다."""
+    def __init__(self, rate, capacity=None):
+        self.lock = threading.Lock()
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.last_time = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_time) * self.rate)
+        self.last_time = now
+
+    def set_rate(self, rate, capacity=None):
+        with self.lock:
+            self._refill()
+            self.rate = rate
+            self.capacity = capacity or rate
+            self.tokens = min(self.tokens, self.capacity)
+
+    def acquire(self, amount, stop_event=None):
+        """토큰 amount개를 사용합니다. capacity보다 큰 요청은 토큰이 가득 찰 때까지만 기다린 뒤 부족분을 빚으로 남깁니다."""
+        while True:
+            with self.lock:
+                if not self.rate:
+                    return True
+                self._refill()
+                needed = min(amount, self.capacity)
+                if self.tokens >= needed:
+                    self.tokens -= amount
+                    return True
+                wait = (needed - self.tokens) / self.rate
+            if stop_event is not None:
+                if stop_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
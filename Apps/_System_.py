@@ -8,13 +8,21 @@ import threading
 import json
 import os
 from datetime import datetime
-from Utility import log
+from Utility import log, system_clock
 
 class SystemState:
-    def __init__(self, filepath="Value.json"):
+    def __init__(self, filepath="Value.json", clock=None):
         self.filepath = filepath
-        self.file_lock = threading.Lock()
+        self.clock = clock or system_clock
+        # update_values 등에서 get_all_data를 다시 호출하므로 재진입 가능한 락 사용
+        self.file_lock = threading.RLock()
         self.last_updated = None
+
+        # 새 센서 샘플 알림 (이벤트 기반 제어용)
+        self.sample_condition = threading.Condition()
+        self.sample_seq = 0         # 센서 샘플 수신 횟수
+        self.sample_time = None     # 마지막 센서 샘플 수신 시각 (clock.time())
+        self.sample_listeners = []  # 새 샘플마다 호출할 콜백 (스케줄러 모드 등)
         if not os.path.exists(self.filepath):
             self._initialize_json()
 
@@ -47,6 +55,40 @@ class SystemState:
                 with open(self.filepath, "r", encoding="utf-8") as f:
                     return json.load(f)
 
+    def update_sensors(self, sensor_values: dict):
+        """새 센서 값을 저장하고, 새 샘플을 기다리는 스레드들을 깨웁니다."""
+        with self.file_lock:
+            current_data = self.get_all_data()
+            current_data["SENSOR"].update(sensor_values)
+            self._write_state(current_data)
+
+        with self.sample_condition:
+            self.sample_seq += 1
+            self.sample_time = self.clock.time()
+            self.sample_condition.notify_all()
+        for listener in self.sample_listeners:
+            listener()
+        return current_data
+
+    def update_actuators(self, actuator_values: dict):
+        """액추에이터 값만 갱신합니다. 다른 항목은 파일의 최신 값을 유지합니다."""
+        with self.file_lock:
+            current_data = self.get_all_data()
+            current_data["ACTUATOR"].update(actuator_values)
+            self._write_state(current_data)
+        return current_data
+
+    def add_sample_listener(self, callback):
+        """새 센서 샘플이 저장될 때마다 호출할 콜백을 등록합니다. 콜백은 짧게 끝나야 합니다."""
+        self.sample_listeners.append(callback)
+
+    def wait_for_sample(self, last_seq: int, timeout: float):
+        """last_seq 이후의 새 샘플이 들어오거나 timeout이 지날 때까지 대기합니다.
+        (현재 샘플 번호, 해당 샘플 수신 시각)을 반환합니다."""
+        with self.sample_condition:
+            self.sample_condition.wait_for(lambda: self.sample_seq != last_seq, timeout)
+            return self.sample_seq, self.sample_time
+
     def update_values(self, update_data: dict):
         with self.file_lock:
             current_data = self.get_all_data()
@@ -0,0 +1,37 @@
+# =================================================================================
+# tests/conftest.py
+# Apps/의 모듈을 평면 import로 불러올 수 있도록 경로를 추가하고,
+# 클라우드를 Local_cloud.py로 대체한 시험 환경을 임시 디렉토리에 만든다.
+# 로그 파일이 소스 트리(Apps/logs)에 쌓이지 않도록 Utility를 불러오기 전에 로그 디렉토리를 임시 디렉토리로 바꾼다.
+# 실행: Apps/에서 python -m pytest -q tests
+# =================================================================================
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Config
+
+Config.LOG_DIRECTORY = tempfile.mkdtemp(prefix="smartfarm-logs-")
+
+@pytest.fixture
+def local_cloud(tmp_path, monkeypatch):
+    """임시 디렉토리를 작업 디렉토리로 하고 LOCAL 클라우드와 짧은 재시도 간격을 사용합니다."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Config, "CLOUD_BACKEND", "LOCAL")
+    monkeypatch.setattr(Config, "UPLOAD_RATE_LIMIT_KBPS", 0)
+    monkeypatch.setattr(Config, "UPLOAD_RETRY_BASE", 0.01)
+    monkeypatch.setattr(Config, "UPLOAD_RETRY_MAX", 0.05)
+    return tmp_path
+
+@pytest.fixture
+def aws(local_cloud):
+    from _System_ import SystemState
+    from AWS_control import AWSHandler
+    handler = AWSHandler(SystemState("Value.json"))
+    yield handler
+    handler.stop_mqtt_listener()
@@ -0,0 +1,129 @@
+# =================================================================================
+# tests/test_camera_backend.py
+# Fake_camera.py를 rpicam-still 대신 실행하여 촬영 백엔드(ONESHOT, PERSISTENT)를
+# 촬영 방식(SIGNAL, KEYPRESS)과 출력 방식(MEMORY, FILE)의 모든 조합으로 시험하고,
+# 표준 출력 스트림을 JPEG 한 장씩 잘라내는 JpegStreamSplitter를 확인한다.
+# =================================================================================
+
+import os
+import struct
+
+import pytest
+
+import Config
+from Camera_backend import JpegStreamSplitter, OneShotCamera, PersistentCamera, make_camera_backend
+
+FAKE_CAMERA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Fake_camera.py")
+
+@pytest.fixture
+def fake_camera(monkeypatch):
+    """카메라 명령을 Fake_camera.py로 바꾸고 초기화/자동 노출 대기 시간을 줄입니다."""
+    monkeypatch.setattr(Config, "CAMERA_COMMAND_PATH", FAKE_CAMERA)
+    monkeypatch.setattr(Config, "CAMERA_WIDTH", 64)
+    monkeypatch.setattr(Config, "CAMERA_HEIGHT", 48)
+    # 시그널 처리기를 등록하기 전에 SIGUSR1이 도착하면 프로세스가 종료되므로 파이썬 시작 시간만큼은 기다림
+    monkeypatch.setattr(Config, "CAMERA_WARMUP", 0.5)
+    monkeypatch.setenv("FAKE_CAMERA_INIT_DELAY", "0")
+    return FAKE_CAMERA
+
+def _is_jpeg(data: bytes) -> bool:
+    return data[:2] == b"\xff\xd8" and data[-2:] == b"\xff\xd9"
+
+# --- 촬영 백엔드 ---
+
+def test_make_camera_backend_uses_config(fake_camera):
+    assert isinstance(make_camera_backend("persistent"), PersistentCamera)
+    assert isinstance(make_camera_backend("ONESHOT"), OneShotCamera)
+    with pytest.raises(ValueError):
+        make_camera_backend("USB")
+
+@pytest.mark.parametrize("output", ["MEMORY", "FILE"])
+def test_oneshot_camera(fake_camera, tmp_path, output):
+    camera = OneShotCamera()
+    assert camera.command_path == FAKE_CAMERA
+    camera.start()
+    if output == "MEMORY":
+        assert _is_jpeg(camera.capture_bytes())
+    else:
+        path = str(tmp_path / "shot.jpg")
+        assert camera.capture(path) == path
+        with open(path, "rb") as f:
+            assert _is_jpeg(f.read())
+    camera.stop()
+
+@pytest.mark.parametrize("trigger", ["SIGNAL", "KEYPRESS"])
+@pytest.mark.parametrize("output", ["MEMORY", "FILE"])
+def test_persistent_camera(fake_camera, tmp_path, trigger, output):
+    camera = PersistentCamera(trigger=trigger, output=output)
+    camera.start()
+    try:
+        process = camera.process
+        shots = [camera.capture_bytes() for _ in range(3)]
+        assert all(_is_jpeg(shot) for shot in shots)
+
+        path = str(tmp_path / "shot.jpg")
+        assert camera.capture(path) == path
+        with open(path, "rb") as f:
+            assert _is_jpeg(f.read())
+        # 촬영마다 프로세스를 다시 띄우지 않고 같은 프로세스에 요청
+        assert camera.process is process and process.poll() is None
+        if output == "FILE":
+            assert os.listdir(camera.workdir) == []
+    finally:
+        camera.stop()
+    assert camera.process is None and camera.workdir is None
+    assert process.poll() is not None
+
+@pytest.mark.parametrize("output", ["MEMORY", "FILE"])
+def test_persistent_camera_restarts_after_process_exit(fake_camera, output):
+    camera = PersistentCamera(trigger="KEYPRESS", output=output)
+    camera.start()
+    try:
+        camera.process.kill()
+        camera.process.wait()
+        # 프로세스가 종료되어 있으면 다음 촬영에서 새로 띄움
+        assert _is_jpeg(camera.capture_bytes())
+        assert camera.process.poll() is None
+    finally:
+        camera.stop()
+
+# --- JPEG 스트림 분리 ---
+
+def _segment(marker: int, payload: bytes) -> bytes:
+    return bytes([0xFF, marker]) + struct.pack(">H", len(payload) + 2) + payload
+
+def _jpeg(scan: bytes, thumbnail: bytes = b"") -> bytes:
+    """EXIF(APP1) 썸네일과 압축 데이터를 지정할 수 있는 최소 JPEG 구조를 만듭니다."""
+    exif = b"Exif\x00\x00" + b"II*\x00" + thumbnail
+    return (b"\xff\xd8" + _segment(0xE1, exif) + _segment(0xDB, bytes(65))
+            + _segment(0xDA, b"\x01\x01\x00\x00\x3f\x00") + scan + b"\xff\xd9")
+
+THUMBNAIL = _jpeg(b"\x12\x34")     # 썸네일 자체도 SOI ... EOI를 가진 JPEG
+PHOTO = _jpeg(b"\x01\xff\x00\x02\xff\xd0\x03\xff\xd7\x04\xff\xd1\x05", thumbnail=THUMBNAIL)
+
+def test_splitter_skips_exif_thumbnail():
+    assert JpegStreamSplitter().feed(PHOTO) == [PHOTO]
+
+def test_splitter_keeps_stuffed_bytes_and_rst_markers_in_scan():
+    other = _jpeg(b"\xff\xd3\xff\x00" * 4)
+    assert JpegStreamSplitter().feed(PHOTO + other) == [PHOTO, other]
+
+@pytest.mark.parametrize("chunk", [1, 2, 3, 7, 64])
+def test_splitter_handles_any_chunk_boundary(chunk):
+    stream = PHOTO + THUMBNAIL + PHOTO
+    splitter = JpegStreamSplitter()
+    frames = []
+    for i in range(0, len(stream), chunk):
+        frames += splitter.feed(stream[i:i + chunk])
+    assert frames == [PHOTO, THUMBNAIL, PHOTO]
+    assert splitter.buffer == b""
+
+def test_splitter_resyncs_after_garbage():
+    splitter = JpegStreamSplitter()
+    assert splitter.feed(b"noise\xff" + PHOTO[:10]) == []
+    assert splitter.feed(PHOTO[10:] + b"\x00\x01" + PHOTO) == [PHOTO, PHOTO]
+
+def test_splitter_on_fake_camera_output(fake_camera):
+    from Fake_camera import make_jpeg
+    frames = [make_jpeg(64, 48) for _ in range(3)]
+    assert JpegStreamSplitter().feed(b"".join(frames)) == frames
@@ -0,0 +1,88 @@
+# =================================================================================
+# tests/test_commands.py
+# REST/MQTT/섀도가 함께 쓰는 명령 처리기(CommandRouter)와 중재기를 시험한다.
+# =================================================================================
+
+import time
+
+import pytest
+
+import Config
+from _System_ import SystemState
+from Actuator_arbiter import ActuatorArbiter
+from Commands import CommandRouter, CommandError, validate_actuator, validate_targets
+
+@pytest.fixture
+def router(local_cloud):
+    state = SystemState("Value.json")
+    arbiter = ActuatorArbiter(state)
+    arbiter.sync_state()
+    return CommandRouter(state, arbiter)
+
+def test_repeated_manual_mode_keeps_manual_settings(router):
+    router.set_mode("MANUAL")
+    router.control("HEAT_PANNEL", 1)
+    router.control("FAN", 120)
+    router.set_mode("manual")
+    assert router.arbiter.effective["HEAT_PANNEL"] == 1
+    assert router.arbiter.effective["FAN"] == 120
+    assert router.state.get_all_data()["ACTUATOR"]["HEAT_PANNEL"] == 1
+
+def test_switching_to_manual_turns_actuators_off(router):
+    router.set_mode("AUTO")
+    router.arbiter.request("AUTO", {"HEAT_PANNEL": 1, "FAN": 200})
+    router.set_mode("MANUAL")
+    assert router.arbiter.effective["HEAT_PANNEL"] == 0
+    assert router.arbiter.effective["FAN"] == 0
+
+@pytest.mark.parametrize("device, value", [
+    ("FAN", True), ("FAN", "255"), ("FAN", "1;PUMP:255"), ("FAN", 12.5), ("FAN", 256), ("FAN", -1),
+    ("HEAT_PANNEL", 2), ("GROW_LIGHT", None), ("FAN", float("nan")), ("DOOR", 1),
+])
+def test_invalid_actuator_values_are_rejected(device, value):
+    with pytest.raises(CommandError) as e:
+        validate_actuator(device, value)
+    assert e.value.status == 400
+
+def test_valid_actuator_values_become_ints():
+    assert validate_actuator("FAN", 200.0) == 200 and isinstance(validate_actuator("FAN", 200.0), int)
+    assert validate_actuator("HEAT_PANNEL", 1) == 1
+
+@pytest.mark.parametrize("targets", [
+    {}, [], {"TARGET_TEMP": True}, {"TARGET_TEMP": "25"}, {"TARGET_TEMP": float("inf")},
+    {"TARGET_TEMP": 100.0}, {"TARGET_SOIL_MOISTURE": -1}, {"TARGET_HUMID": 50}, {"MODE": "AUTO"},
+])
+def test_invalid_targets_are_rejected(targets):
+    with pytest.raises(CommandError) as e:
+        validate_targets(targets)
+    assert e.value.status == 400
+
+def test_valid_targets_become_floats():
+    assert validate_targets({"TARGET_TEMP": 25, "TARGET_SOIL_MOISTURE": 400}) == {"TARGET_TEMP": 25.0, "TARGET_SOIL_MOISTURE": 400.0}
+
+def test_rejected_command_changes_nothing(router):
+    before = router.state.get_all_data()["TARGET"]
+    response = router.execute({"id": "bad", "type": "setpoint", "targets": {"TARGET_TEMP": before["TARGET_TEMP"] + 1, "TARGET_SOIL_MOISTURE": "x"}})
+    assert response["status"] == "error" and response["code"] == 400
+    assert router.state.get_all_data()["TARGET"] == before
+
+def test_replayed_id_is_not_executed_again(router):
+    router.set_mode("MANUAL")
+    command = {"id": "req-1", "type": "actuator", "device": "FAN", "value": 100, "ts": time.time()}
+    first = router.execute(command)
+    assert first["status"] == "ok" and "duplicate" not in first
+
+    router.control("FAN", 0)    # 다른 경로로 값이 바뀐 뒤 같은 요청이 다시 전달됨
+    second = router.execute(command)
+    assert second["duplicate"] is True and second["result"] == first["result"]
+    assert router.arbiter.effective["FAN"] == 0
+    assert router.stats()["executed"] == 1 and router.stats()["duplicates"] == 1
+
+def test_expired_command_returns_408(router):
+    command = {"id": "old", "type": "mode", "mode": "MANUAL", "ts": time.time() - Config.COMMAND_MAX_AGE - 1}
+    response = router.execute(command)
+    assert response["status"] == "error" and response["code"] == 408
+    assert router.state.get_all_data()["MODE"] != "MANUAL"
+
+def test_command_without_id_is_rejected(router):
+    assert router.execute({"type": "mode", "mode": "AUTO"})["code"] == 400
@@ -0,0 +1,63 @@
+# =================================================================================
+# tests/test_image_bundle.py
+# 모으는 중인 묶음이 디스크에 기록되어 다시 시작해도 이어서 업로드되는지 시험
+# =================================================================================
+
+import io
+import json
+import tarfile
+
+import Config
+from Image_bundle import ImageBundler
+
+class RecordingQueue:
+    def __init__(self):
+        self.submitted = []
+
+    def submit_bytes(self, data, object_name, notify=None, meta=None, durable=False):
+        assert durable
+        self.submitted.append((data, object_name, notify, meta))
+        return True
+
+def test_pending_items_survive_restart(local_cloud):
+    queue = RecordingQueue()
+    bundler = ImageBundler(queue)
+    bundler.add("a.jpg", [("images/a.jpg", b"A")], {"TEMP": 24.0})
+    bundler.add("b.jpg", [("images/b.jpg", b"B")], {"TEMP": 24.5})
+    bundle_id = bundler.bundle_id
+
+    # 업로드하기 전에 멈춘 뒤 다시 시작
+    restarted = ImageBundler(queue)
+    assert restarted.bundle_id == bundle_id and restarted.stats()["pending"] == 2
+    restarted.add("c.jpg", [("images/c.jpg", b"C")], {"TEMP": 25.0})
+    assert restarted.flush()
+
+    [(data, object_name, notify, meta)] = queue.submitted
+    assert bundle_id in object_name and notify["payload"]["count"] == 3
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        manifest = json.load(tar.extractfile("manifest.json"))
+        assert manifest["columns"]["filename"] == ["a.jpg", "b.jpg", "c.jpg"]
+        assert tar.extractfile("images/b.jpg").read() == b"B"
+
+    # 스풀에 넘긴 묶음은 다시 불러오지 않음
+    assert ImageBundler(queue).stats()["pending"] == 0
+
+def test_bundle_is_kept_when_queue_rejects_it(local_cloud, monkeypatch):
+    queue = RecordingQueue()
+    bundler = ImageBundler(queue)
+    bundler.add("a.jpg", [("images/a.jpg", b"A")], {"TEMP": 24.0})
+    bundle_id = bundler.bundle_id
+
+    accept = queue.submit_bytes
+    queue.submit_bytes = lambda *args, **kwargs: False
+    assert not bundler.flush()
+    assert bundler.stats()["pending"] == 1
+    assert ImageBundler(queue).stats()["pending"] == 1    # 디스크 기록도 남아 있음
+
+    # 큐에 자리가 나면 같은 묶음이 그대로 올라감
+    queue.submit_bytes = accept
+    monkeypatch.setattr(Config, "BUNDLE_WINDOW", 0)
+    bundler.flush_if_due()
+    [(data, object_name, notify, meta)] = queue.submitted
+    assert bundle_id in object_name and notify["payload"]["count"] == 1
+    assert bundler.stats()["pending"] == 0
@@ -0,0 +1,63 @@
+# =================================================================================
+# tests/test_image_store.py
+# 로컬 사진 저장소의 촬영 시각 기록, 덮어쓴 파일 정리, 작물 환경 조회, 조회 경로의 디스크 쓰기를 확인한다.
+# =================================================================================
+
+import os
+from datetime import datetime
+
+from Image_store import ImageStore
+
+CAPTURED_AT = datetime(2025, 1, 1, 12, 0, 0)
+
+def make_store(tmp_path) -> ImageStore:
+    return ImageStore(root=str(tmp_path / "store"), quota_mb=10)
+
+def test_capture_time_is_kept(tmp_path):
+    store = make_store(tmp_path)
+    store.put("a.jpg", {"thumbnail": b"a"}, {"TEMP": 20.0}, captured_at=CAPTURED_AT)
+    store.put_reference("b.jpg", "a.jpg", {"TEMP": 20.0}, captured_at=CAPTURED_AT)
+    assert [entry["captured_at"] for entry in store.list_images()] == ["2025-01-01T12:00:00"] * 2
+
+def test_overwrite_reclaims_orphaned_blob(tmp_path):
+    store = make_store(tmp_path)
+    store.put("a.jpg", {"thumbnail": b"old"})
+    old_path, _ = store.get_path("a.jpg", "thumbnail")
+    store.put("a.jpg", {"thumbnail": b"new"})
+    assert not os.path.exists(old_path)
+    assert store.stats()["blobs"] == 1
+
+def test_overwrite_keeps_blob_still_referenced(tmp_path):
+    store = make_store(tmp_path)
+    store.put("a.jpg", {"thumbnail": b"old"})
+    store.put_reference("b.jpg", "a.jpg")
+    old_path, _ = store.get_path("a.jpg", "thumbnail")
+    store.put("a.jpg", {"thumbnail": b"new"})
+    assert os.path.exists(old_path)
+    assert store.get_path("b.jpg", "thumbnail")[0] == old_path
+
+def test_list_images_by_plant_condition(tmp_path):
+    store = make_store(tmp_path)
+    store.put("cold.jpg", {"thumbnail": b"1"}, {"TEMP": 12.0, "SOIL": 500})
+    store.put("warm_dry.jpg", {"thumbnail": b"2"}, {"TEMP": 27.0, "SOIL": 250})
+    store.put("warm_wet.jpg", {"thumbnail": b"3"}, {"TEMP": 28.0, "SOIL": 700})
+    store.put("warm_dry.jpg", {"thumbnail": b"4"}, {"TEMP": 15.0, "SOIL": 250})  # 덮어쓰면 색인도 갱신
+
+    names = lambda **kw: sorted(entry["filename"] for entry in store.list_images(**kw))
+    assert names(conditions={"TEMP": (25, 30)}) == ["warm_wet.jpg"]
+    assert names(conditions={"TEMP": (10, None), "SOIL": (None, 300)}) == ["warm_dry.jpg"]
+
+    # 다시 불러와도 색인이 만들어짐
+    store.flush()
+    reloaded = ImageStore(root=store.root, quota_mb=10)
+    assert [entry["filename"] for entry in reloaded.list_images(conditions={"TEMP": (None, 13)})] == ["cold.jpg"]
+
+def test_get_path_does_not_write_index(tmp_path):
+    store = make_store(tmp_path)
+    store.put("a.jpg", {"thumbnail": b"a"})
+    mtime = os.stat(store.index_path).st_mtime_ns
+    os.utime(store.index_path, ns=(0, 0))
+    store.get_path("a.jpg", "thumbnail")
+    assert os.stat(store.index_path).st_mtime_ns == 0
+    store.flush()
+    assert os.stat(store.index_path).st_mtime_ns >= mtime
@@ -0,0 +1,47 @@
+# =================================================================================
+# tests/test_pid_tuning.py
+# 기록된 이력(CSV, 원격 측정 JSONL)을 읽어 필터 전 측정값으로 온실 모델을 추정하는지 확인한다.
+# =================================================================================
+
+import csv
+import json
+
+import pytest
+
+import PID_tuning
+from Simulation import PlantParams, run_simulation
+
+@pytest.fixture(scope="module")
+def history(tmp_path_factory):
+    path = tmp_path_factory.mktemp("history") / "history.csv"
+    run_simulation(hours=1, export_path=str(path))
+    return PID_tuning.load_history(str(path))
+
+def test_noise_is_estimated_on_raw_series(history):
+    assert PID_tuning.has_raw_series(history)
+    assert PID_tuning.fit_plant(history).temp_noise == pytest.approx(PlantParams().temp_noise, rel=0.25)
+
+def test_recorded_csv_with_iso_time(history, tmp_path):
+    path = tmp_path / "recorded.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["time", "TEMP", "SOIL", "FAN", "PUMP", "HEAT_PANNEL", "MODE"])
+        writer.writerow(["2025-01-01T00:00:00", 15.0, 350, 0, 0, 1, "AUTO"])
+        writer.writerow(["2025-01-01T00:00:01", 15.1, 350, 0, 0, 1, "AUTO"])
+        writer.writerow(["2025-01-01T00:00:01", 15.1, 350, 0, 0, 1, "AUTO"])  # 중복 시각
+        writer.writerow(["2025-01-01T00:00:02", "", 350, 0, 0, 1, "AUTO"])    # 누락 값
+        writer.writerow(["2025-01-01T00:00:03", 15.2, 349, 0, 0, 1, "AUTO"])
+    loaded = PID_tuning.load_history(str(path))
+    assert list(loaded["time"] - loaded["time"][0]) == [0, 1, 3]
+    assert not PID_tuning.has_raw_series(loaded)
+
+def test_telemetry_jsonl(tmp_path):
+    path = tmp_path / "telemetry.jsonl"
+    batch = {"t0": 1000.0, "dt": [0, 1, 2], "scale": 100,
+             "sensor": {"TEMP": [1500, 1510, 1520], "SOIL": [35000, 35000, 34900]},
+             "actuator": {"FAN": [0, 0, 0], "PUMP": [0, 0, 0], "HEAT_PANNEL": [1, 1, 1]}}
+    path.write_text(json.dumps(batch) + "\n", encoding="utf-8")
+    loaded = PID_tuning.load_history(str(path))
+    assert list(loaded["time"]) == [1000.0, 1001.0, 1002.0]
+    assert list(loaded["TEMP"]) == [15.0, 15.1, 15.2]
+    assert list(loaded["HEAT_PANNEL"]) == [1.0, 1.0, 1.0]
@@ -0,0 +1,99 @@
+# =================================================================================
+# tests/test_scheduler.py
+# 타이머 휠 스케줄러를 VirtualClock으로 한 틱씩 진행하며 시험한다.
+# 틱 1초, 슬롯 64개이므로 64틱 이상 남은 작업은 1단계 휠, 4096틱 이상 남은 작업은 2단계 휠에서 내려온다.
+# =================================================================================
+
+import pytest
+
+from Scheduler import Scheduler
+from Simulation import VirtualClock
+
+TICK = 1.0
+
+@pytest.fixture
+def scheduler():
+    scheduler = Scheduler(tick=TICK, workers=1, clock=VirtualClock())
+    scheduler.start_time = scheduler.clock.time()
+    return scheduler
+
+def _run_ready(scheduler):
+    """실행 큐에 들어온 작업을 작업 스레드 코드로 그 자리에서 실행합니다."""
+    scheduler.run_queue.put(None)
+    scheduler._worker_thread()
+
+def _run_until(scheduler, end: float):
+    while scheduler.clock.time() < end:
+        scheduler.clock.advance(TICK)
+        scheduler._advance()
+        _run_ready(scheduler)
+
+def _recorder(scheduler, fired: list):
+    return lambda: fired.append(scheduler.clock.time())
+
+def test_one_shot_jobs_fire_on_time_across_cascades(scheduler):
+    fired = {delay: [] for delay in (3, 100, 5000)}
+    for delay, times in fired.items():
+        scheduler.after(delay, _recorder(scheduler, times), name=f"after_{delay}")
+    # 100틱 작업은 1단계, 5000틱 작업은 2단계 휠에 들어감
+    assert any(job.name == "after_100" for slot in scheduler.wheels[1] for job in slot)
+    assert any(job.name == "after_5000" for slot in scheduler.wheels[2] for job in slot)
+
+    _run_until(scheduler, 6000)
+    assert fired == {3: [3.0], 100: [100.0], 5000: [5000.0]}
+    assert scheduler.jobs == {}
+
+def test_periodic_jobs_fire_on_time_across_cascades(scheduler):
+    short, medium, long = [], [], []
+    scheduler.every(5, _recorder(scheduler, short), name="short")
+    scheduler.every(70, _recorder(scheduler, medium), name="medium")
+    scheduler.every(4100, _recorder(scheduler, long), name="long")
+
+    _run_until(scheduler, 8300)
+    assert short == [5.0 * i for i in range(1, 1661)]
+    assert medium == [70.0 * i for i in range(1, 119)]
+    assert long == [4100.0, 8200.0]
+    stats = {job["name"]: job for job in scheduler.stats()}
+    assert stats["long"]["runs"] == 2 and stats["long"]["jitter_ms"]["max"] == 0
+    assert all(job["overruns"] == 0 for job in stats.values())
+
+def test_delay_sets_first_run(scheduler):
+    fired = []
+    scheduler.every(100, _recorder(scheduler, fired), delay=10)
+    _run_until(scheduler, 300)
+    assert fired == [10.0, 110.0, 210.0]
+
+def test_cancelled_job_does_not_fire(scheduler):
+    fired = []
+    job = scheduler.every(70, _recorder(scheduler, fired))
+    _run_until(scheduler, 100)
+    scheduler.cancel(job)
+    _run_until(scheduler, 300)
+    assert fired == [70.0]
+
+def test_job_longer_than_interval_is_counted_as_overrun(scheduler):
+    job = scheduler.every(10, lambda: scheduler.clock.advance(15), name="slow")
+    _run_until(scheduler, 10)
+    assert job.runs == 1 and job.overruns == 1
+    assert job.duration_last == 15.0
+
+def test_skipped_run_while_still_running_is_counted_as_overrun(scheduler):
+    fired = []
+    job = scheduler.every(2, _recorder(scheduler, fired), name="busy")
+    # 작업 스레드가 바빠 첫 실행이 끝나지 않은 채로 다음 주기가 돌아옴
+    for _ in range(4):
+        scheduler.clock.advance(TICK)
+        scheduler._advance()
+    assert job.running and job.overruns == 1
+    _run_ready(scheduler)
+    assert fired == [4.0] and job.runs == 1
+    assert job.jitter_last == 2.0
+
+    _run_until(scheduler, 6)
+    assert fired == [4.0, 6.0] and job.overruns == 1
+
+def test_due_job_runs_immediately(scheduler):
+    fired = []
+    scheduler.after(0, _recorder(scheduler, fired))
+    _run_ready(scheduler)
+    assert fired == [0.0]
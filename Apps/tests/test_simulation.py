@@ -0,0 +1,32 @@
+# =================================================================================
+# tests/test_simulation.py
+# 자동 제어 폐루프 시뮬레이션을 2시간(실제 약 2초)만 실행하여 제어 성능이 나빠지지 않았는지 확인한다.
+# 기준값은 현재 제어기(seed 0)의 결과에 여유를 둔 값이다. (정착 4432초, 오버슈트 4.56도,
+# 스위칭 FAN 2회 / PUMP 16회 / HEAT_PANNEL 314회) 제어기를 개선하면 기준값도 함께 줄인다.
+# =================================================================================
+
+import pytest
+
+from Simulation import run_simulation
+
+HOURS = 2
+
+@pytest.fixture(scope="module")
+def report():
+    return run_simulation(hours=HOURS, seed=0)
+
+def test_temperature_settles(report):
+    assert report["duration_h"] == pytest.approx(HOURS, abs=0.01)
+    assert report["settling_time_s"] is not None and report["settling_time_s"] <= 5400
+    assert report["overshoot_c"] <= 5.5
+    assert report["mean_abs_error_c"] <= 2.5
+
+def test_actuators_do_not_chatter(report):
+    switches = report["switch_counts"]
+    assert switches["HEAT_PANNEL"] <= 400
+    assert switches["FAN"] <= 10
+    assert switches["PUMP"] <= 24
+    assert 1 <= report["pump_cycles"] <= 12
+
+def test_runs_faster_than_real_time(report):
+    assert report["speedup"] >= 100
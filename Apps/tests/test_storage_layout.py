@@ -0,0 +1,71 @@
+# =================================================================================
+# tests/test_storage_layout.py
+# S3 키 배치(기본 평면 키, 날짜 파티션 선택)와 파티션 매니페스트의 주기 갱신을 확인한다.
+# =================================================================================
+
+import json
+import os
+import shutil
+from datetime import datetime
+
+import Config
+from Storage_layout import object_key, partition_of, PartitionManifests, MANIFEST_NAME
+
+CAPTURED_AT = datetime(2025, 1, 1, 12, 0, 0)
+PARTITIONED = "{root}/{device}/{zone}/{yyyy}/{mm}/{dd}/{hh}/{name}"
+
+def test_default_layout_keeps_flat_keys():
+    assert object_key("images/thumbnail/a.jpg", CAPTURED_AT) == "images/thumbnail/a.jpg"
+    assert object_key("bundles/b.tar", CAPTURED_AT) == "bundles/b.tar"
+    assert partition_of("images/a.jpg", CAPTURED_AT) is None
+
+def test_partitioned_layout_is_opt_in(monkeypatch):
+    monkeypatch.setattr(Config, "S3_KEY_LAYOUT", PARTITIONED)
+    prefix = f"images/{Config.DEVICE_ID}/{Config.FARM_ZONE}/2025/01/01/12"
+    assert object_key("images/thumbnail/a.jpg", CAPTURED_AT) == f"{prefix}/thumbnail/a.jpg"
+    assert partition_of("images/thumbnail/a.jpg", CAPTURED_AT) == prefix
+
+def test_flat_layout_records_no_manifest(aws):
+    aws.record_upload("images/a.jpg", 3, "00", {"partition": partition_of("images/a.jpg", CAPTURED_AT)})
+    assert aws.manifests.stats()["dirty_partitions"] == 0
+
+def test_periodic_flush_uploads_pending_manifests(aws, monkeypatch):
+    monkeypatch.setattr(Config, "S3_KEY_LAYOUT", PARTITIONED)
+    partition = partition_of("images/a.jpg", CAPTURED_AT)
+    # 최소 간격 안에 들어온 기록은 업로드 때 올라가지 않고 주기 갱신을 기다림
+    aws.manifests.last_flush = float("inf")
+    aws.record_upload("images/a.jpg", 3, "00", {"partition": partition})
+    remote = os.path.join(aws.s3_client.root, Config.AWS_S3_BUCKET_NAME, *partition.split("/"), MANIFEST_NAME)
+    assert not os.path.exists(remote)
+
+    aws.manifests.flush_pending()
+    assert os.path.exists(remote)
+    assert aws.manifests.stats()["dirty_partitions"] == 0
+
+def _remote_lines(aws, partition: str) -> list:
+    body = aws.s3_client.get_object(Bucket=Config.AWS_S3_BUCKET_NAME, Key=f"{partition}/{MANIFEST_NAME}")["Body"].read()
+    return [json.loads(line)["key"] for line in body.decode("utf-8").splitlines()]
+
+def test_late_upload_after_pruning_keeps_remote_entries(aws, monkeypatch):
+    monkeypatch.setattr(Config, "S3_KEY_LAYOUT", PARTITIONED)
+    partition = partition_of("images/a.jpg", CAPTURED_AT)
+    aws.manifests.append(partition, {"key": "a"})
+    aws.manifests.append(partition, {"key": "b"})
+    assert aws.manifests.flush(force=True) == 1
+
+    # 보관 기간이 지나 로컬 사본을 지운 뒤(또는 새 SD 카드) 같은 파티션의 업로드가 늦게 끝남
+    shutil.rmtree(aws.manifests.directory)
+    manifests = PartitionManifests(aws.s3_client)
+    manifests.append(partition, {"key": "c"})
+
+    aws.s3_client.online = False    # S3를 확인하지 못하면 덮어쓰지 않고 다음에 다시 시도
+    assert manifests.flush(force=True) == 0
+    assert manifests.stats()["dirty_partitions"] == 1
+    aws.s3_client.online = True
+    assert _remote_lines(aws, partition) == ["a", "b"]
+
+    assert manifests.flush(force=True) == 1
+    assert _remote_lines(aws, partition) == ["a", "b", "c"]
+    manifests.append(partition, {"key": "d"})
+    assert manifests.flush(force=True) == 1
+    assert _remote_lines(aws, partition) == ["a", "b", "c", "d"]
@@ -0,0 +1,86 @@
+# =================================================================================
+# tests/test_telemetry.py
+# 원격 측정 발행기를 LocalMQTTClient로 시험: 보관 파일, 재연결 후 순서대로 재전송, QoS 1 보관/수신 확인
+# =================================================================================
+
+import time
+
+import pytest
+
+import Config
+from Payload_codec import codec_for_topic
+from Telemetry import TelemetryBuffer, TelemetryPublisher
+
+def _wait_connected(client, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if client.is_connected():
+            return True
+        time.sleep(0.05)
+    return False
+
+def _published_seqs(client) -> list:
+    codec = codec_for_topic(Config.TELEMETRY_TOPIC)
+    return [codec.decode(payload)["seq"] for topic, payload in client.published if topic == Config.TELEMETRY_TOPIC]
+
+@pytest.fixture
+def publisher(aws, monkeypatch):
+    monkeypatch.setattr(Config, "TELEMETRY_SAMPLE_INTERVAL", 0)
+    monkeypatch.setattr(Config, "TELEMETRY_PUBLISH_TIMEOUT", 0.5)
+    return TelemetryPublisher(aws.state, aws, buffer=TelemetryBuffer("telemetry_buffer.jsonl", 64))
+
+def _sample(publisher, temp: float):
+    publisher.state.update_sensors({"TEMP": temp})
+
+def test_buffer_drops_oldest_when_full(local_cloud):
+    buffer = TelemetryBuffer("buffer.jsonl", max_kb=1)
+    for seq in range(40):
+        buffer.append({"seq": seq, "pad": "x" * 40})
+    batches = buffer.take(1000)
+    assert 0 < len(batches) < 40
+    assert batches[-1]["seq"] == 39 and batches[0]["seq"] == 40 - len(batches)
+    buffer.remove(len(batches))
+    assert len(buffer) == 0
+
+def test_offline_batches_are_buffered_and_drained_in_order(aws, publisher):
+    # 부팅 직후처럼 브로커가 오프라인인 상태에서 리스너 시작
+    aws.mqtt_client.online = False
+    aws.start_mqtt_listener()
+    for temp in (20.0, 21.0, 22.0):
+        _sample(publisher, temp)
+        publisher.flush()
+    assert len(publisher.buffer) == 3 and publisher.counts["buffered"] == 3
+    assert _published_seqs(aws.mqtt_client) == []
+
+    # 처음 연결에 실패했어도 네트워크 스레드가 다시 연결
+    aws.mqtt_client.online = True
+    assert _wait_connected(aws.mqtt_client)
+    _sample(publisher, 23.0)
+    publisher.flush()
+
+    seqs = _published_seqs(aws.mqtt_client)
+    assert len(seqs) == 4 and seqs == sorted(seqs)
+    assert len(publisher.buffer) == 0 and publisher.counts["published"] == 4
+
+    codec = codec_for_topic(Config.TELEMETRY_TOPIC)
+    last = codec.decode(aws.mqtt_client.published[-1][1])
+    assert last["sensor"]["TEMP"] == [2300] and last["scale"] == 100
+
+def test_publish_confirmed_requires_connection(aws):
+    assert not aws.publish_confirmed(Config.TELEMETRY_TOPIC, {"seq": 1}, timeout=0.1)
+    aws.start_mqtt_listener()
+    assert _wait_connected(aws.mqtt_client)
+    assert aws.publish_confirmed(Config.TELEMETRY_TOPIC, {"seq": 2}, timeout=0.5)
+
+def test_qos1_publish_is_held_while_disconnected(aws):
+    aws.start_mqtt_listener()
+    assert _wait_connected(aws.mqtt_client)
+    aws.mqtt_client.online = False
+    assert aws.publish("smartfarm/test", {"n": 1}, qos=1)
+    assert not aws.publish("smartfarm/test", {"n": 2}, qos=0)
+    assert [topic for topic, _ in aws.mqtt_client.published] == []
+
+    aws.mqtt_client.online = True
+    assert _wait_connected(aws.mqtt_client)
+    # QoS 1 메시지만 보관했다가 다시 연결되면 전달
+    assert [codec_for_topic(topic).decode(payload) for topic, payload in aws.mqtt_client.published] == [{"n": 1}]
@@ -0,0 +1,211 @@
+# =================================================================================
+# tests/test_upload_queue.py
+# 업로드 큐/스풀을 LocalS3Client로 시험: 재시도, 격리(dead letter), 이어서 업로드, 큐 크기 제한
+# =================================================================================
+
+import os
+import threading
+
+import Config
+from Upload_spool import UploadSpool
+from Upload_queue import UploadQueue
+
+def _object(name: str) -> str:
+    return os.path.join(Config.LOCAL_CLOUD_DIR, Config.AWS_S3_BUCKET_NAME, name)
+
+def test_submit_bytes_is_spooled_when_no_worker_is_free(aws):
+    queue = UploadQueue(aws, workers=1)
+    assert queue.submit_bytes(b"jpeg-data", "images/a.jpg")
+    job = queue.jobs[0]
+    assert job.data is None
+    with open(job.local_path, "rb") as f:
+        assert f.read() == b"jpeg-data"
+
+    queue.start()
+    assert queue.join(timeout=5)
+    queue.stop()
+    with open(_object("images/a.jpg"), "rb") as f:
+        assert f.read() == b"jpeg-data"
+    assert queue.spool.pending() == []
+
+def _count_spool_writes(queue, monkeypatch) -> list:
+    writes = []
+    write_bytes = queue.spool.write_bytes
+    monkeypatch.setattr(queue.spool, "write_bytes", lambda entry, data: writes.append(entry["object_name"]) or write_bytes(entry, data))
+    return writes
+
+def test_submit_bytes_uploads_from_memory_without_spooling(aws, monkeypatch):
+    queue = UploadQueue(aws, workers=1)
+    writes = _count_spool_writes(queue, monkeypatch)
+    queue.start()
+    for name in ("images/a.jpg", "images/b.jpg"):
+        assert queue.submit_bytes(name.encode(), name, meta={"partition": None})
+        assert queue.join(timeout=5)
+    queue.stop()
+
+    assert writes == []
+    assert not [name for name in os.listdir(queue.spool.directory) if name.endswith(".dat")]
+    with open(_object("images/b.jpg"), "rb") as f:
+        assert f.read() == b"images/b.jpg"
+    assert queue.stats()["from_memory"] == 2
+
+def test_failed_memory_upload_is_spooled_and_retried(aws, monkeypatch):
+    monkeypatch.setattr(Config, "UPLOAD_MAX_ATTEMPTS", 1000)
+    queue = UploadQueue(aws, workers=1)
+    writes = _count_spool_writes(queue, monkeypatch)
+    queue.start()
+    aws.s3_client.online = False
+    assert queue.submit_bytes(b"x", "images/x.jpg")
+    assert not queue.join(timeout=0.3)
+    assert writes == ["images/x.jpg"]
+    assert [entry["object_name"] for entry in queue.spool.pending()] == ["images/x.jpg"]
+
+    # 실패 중에 들어온 사진은 바로 스풀에 기록
+    assert queue.submit_bytes(b"y", "images/y.jpg")
+    assert queue.jobs[-1].data is None
+
+    aws.s3_client.online = True
+    assert queue.join(timeout=5)
+    queue.stop()
+    assert os.path.exists(_object("images/x.jpg")) and os.path.exists(_object("images/y.jpg"))
+    assert queue.spool.pending() == []
+
+def test_stop_spools_memory_jobs_not_yet_uploaded(aws):
+    queue = UploadQueue(aws, workers=1)
+    queue.threads = [None]     # 작업 스레드가 쉬고 있는 것처럼 보이게 하여 메모리에 남김
+    assert queue.submit_bytes(b"m", "images/m.jpg")
+    assert queue.jobs[0].data == b"m" and queue.spool.pending() == []
+    queue.stop()
+
+    resumed = UploadQueue(aws, workers=1, spool=UploadSpool())
+    assert [job.object_name for job in resumed.jobs] == ["images/m.jpg"]
+    resumed.start()
+    assert resumed.join(timeout=5)
+    resumed.stop()
+    assert os.path.exists(_object("images/m.jpg"))
+
+def test_permanent_error_is_dead_lettered_without_blocking(aws):
+    aws.s3_client.errors["images/denied"] = "AccessDenied"
+    queue = UploadQueue(aws, workers=1)
+    queue.submit_bytes(b"bad", "images/denied.jpg")
+    queue.submit_bytes(b"good", "images/ok.jpg")
+    queue.start()
+    assert queue.join(timeout=5)
+    queue.stop()
+
+    assert os.path.exists(_object("images/ok.jpg"))
+    assert not os.path.exists(_object("images/denied.jpg"))
+    stats = queue.stats()
+    assert stats["dead_lettered"] == 1 and stats["dead_letter"] == 1
+    assert stats["consecutive_failures"] == 0
+    [record] = queue.spool.dead_letters()
+    assert record["object_name"] == "images/denied.jpg" and "AccessDenied" in record["reason"]
+    with open(os.path.join(queue.spool.dead_letter_dir, record["file"]), "rb") as f:
+        assert f.read() == b"bad"
+
+def test_transient_failures_retry_then_dead_letter_after_max_attempts(aws, monkeypatch):
+    monkeypatch.setattr(Config, "UPLOAD_MAX_ATTEMPTS", 3)
+    aws.s3_client.errors["images/slow"] = "SlowDown"
+    queue = UploadQueue(aws, workers=1)
+    queue.submit_bytes(b"1", "images/slow.jpg")
+    queue.submit_bytes(b"2", "images/b.jpg")
+    queue.submit_bytes(b"3", "images/c.jpg")
+    queue.start()
+    assert queue.join(timeout=5)
+    queue.stop()
+
+    assert os.path.exists(_object("images/b.jpg")) and os.path.exists(_object("images/c.jpg"))
+    [record] = queue.spool.dead_letters()
+    assert record["object_name"] == "images/slow.jpg" and record["attempts"] == 3
+    assert queue.stats()["failed"] == 3
+
+def test_offline_keeps_files_and_resumes(aws):
+    aws.s3_client.online = False
+    queue = UploadQueue(aws, workers=2)
+    for name in ("images/1.jpg", "images/2.jpg"):
+        queue.submit_bytes(name.encode(), name)
+    queue.start()
+    assert not queue.join(timeout=0.3)
+    assert sorted(entry["object_name"] for entry in queue.spool.pending()) == ["images/1.jpg", "images/2.jpg"]
+    assert queue.stats()["consecutive_failures"] >= 1
+
+    aws.s3_client.online = True
+    assert queue.join(timeout=5)
+    queue.stop()
+    assert os.path.exists(_object("images/1.jpg")) and os.path.exists(_object("images/2.jpg"))
+    assert queue.spool.dead_letters() == []
+
+def test_spool_survives_restart(aws):
+    queue = UploadQueue(aws, workers=1)
+    queue.submit_bytes(b"x", "images/x.jpg")
+    queue.submit_bytes(b"y", "images/y.jpg")
+
+    # 작업 스레드를 시작하지 않고 새 큐로 다시 시작
+    resumed = UploadQueue(aws, workers=1, spool=UploadSpool())
+    assert [job.object_name for job in resumed.jobs] == ["images/x.jpg", "images/y.jpg"]
+    resumed.start()
+    assert resumed.join(timeout=5)
+    resumed.stop()
+    assert os.path.exists(_object("images/y.jpg"))
+
+def test_retry_dead_letters_requeues(aws):
+    aws.s3_client.errors["images/denied"] = "AccessDenied"
+    queue = UploadQueue(aws, workers=1)
+    queue.submit_bytes(b"bad", "images/denied.jpg")
+    queue.start()
+    assert queue.join(timeout=5)
+
+    del aws.s3_client.errors["images/denied"]
+    assert queue.retry_dead_letters() == 1
+    assert queue.join(timeout=5)
+    queue.stop()
+    assert os.path.exists(_object("images/denied.jpg"))
+    assert queue.spool.dead_letters() == []
+
+def test_concurrent_submits_do_not_exceed_maxsize(aws):
+    queue = UploadQueue(aws, maxsize=5, workers=1, policy="DROP_NEWEST")
+    results = []
+    threads = [threading.Thread(target=lambda i=i: results.append(queue.submit_bytes(b"d", f"images/{i}.jpg")))
+               for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 5
+    assert len(queue.jobs) == 5 and len(queue.spool.pending()) == 5
+    assert queue.stats()["dropped"] == 15
+
+def test_notify_is_retried_without_reuploading(aws):
+    notify = {"topic": Config.BUNDLE_ANALYSIS_TOPIC, "payload": {"key": "bundles/b.tar"}}
+    queue = UploadQueue(aws, workers=1)
+    queue.submit_bytes(b"tar", "bundles/b.tar", notify=notify)
+    queue.start()
+    # 브로커에 연결되지 않아 업로드만 되고 알림은 보류
+    assert not queue.join(timeout=0.3)
+    assert os.path.exists(_object("bundles/b.tar"))
+    [entry] = queue.spool.pending()
+    assert entry["uploaded"]
+    puts = aws.s3_client.put_count
+
+    aws.start_mqtt_listener()
+    assert queue.join(timeout=5)
+    queue.stop()
+    assert aws.s3_client.put_count == puts
+    assert [topic for topic, _ in aws.mqtt_client.published] == [Config.BUNDLE_ANALYSIS_TOPIC]
+    assert queue.spool.pending() == []
+
+def test_memoryview_reader_does_not_copy():
+    from AWS_control import MemoryviewReader
+    data = bytearray(b"0123456789")
+    reader = MemoryviewReader(data)
+    chunk = reader.read(4)
+    assert isinstance(chunk, memoryview) and chunk == b"0123"
+    data[0:1] = b"x"   # 같은 버퍼를 가리키므로 원본 변경이 보임
+    assert chunk[0:1] == b"x"
+    assert reader.read() == b"456789" and reader.read() == b""
+
+def test_upload_bytes_from_memoryview(aws):
+    assert aws.upload_bytes(memoryview(b"jpeg-data"), "images/b.jpg")
+    with open(_object("images/b.jpg"), "rb") as f:
+        assert f.read() == b"jpeg-data"
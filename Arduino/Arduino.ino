@@ -4,6 +4,9 @@
  * 1. 센서값 측정 및 시리얼 출력 (2초 간격)
  * 2. 액추에이터 제어 명령 수신 및 실행
  * 3. Heartbeat 신호 전송 (5초 간격)
+ * 4. 센서 전송 간격 변경 명령 수신 (RATE:<ms>, 라즈베리파이의 적응형 샘플링)
+ * 5. 액추에이터 명령 적용 확인 응답 (6번째 값으로 번호가 오면 "ACK:<번호>")
+ * 6. 조도 즉시 측정 요청 (LIGHT? -> "LIGHT:<lux>", 촬영 전 조명 안정화 확인용)
  * * 핀 변경사항:
  * - D4: 백색등 (WHITE_LED)
  * - D5: 워터 펌프 (WATER_PUMP)
@@ -35,8 +38,10 @@ BH1750 lightMeter;
 // --- 타이머 변수 ---
 unsigned long lastSensorReadTime = 0;
 unsigned long lastHeartbeatTime = 0; // Heartbeat 타이머 추가
-const long sensorInterval = 2000;    // 2초
+long sensorInterval = 2000;          // 2초 (RATE 명령으로 변경 가능)
 const long heartbeatInterval = 5000; // 5초
+const long minSensorInterval = 500;    // 허용하는 최소 전송 간격
+const long maxSensorInterval = 60000;  // 허용하는 최대 전송 간격
 
 // =================================================================
 // 2. 초기 설정 (setup)
@@ -69,7 +74,7 @@ void setup() {
 void loop() {
   unsigned long currentTime = millis(); // 현재 시간을 한 번만 읽어옴
 
-  // 2초마다 센서 값 전송
+  // sensorInterval마다 센서 값 전송
   if (currentTime - lastSensorReadTime >= sensorInterval) {
     readAndSendSensors();
     lastSensorReadTime = currentTime;
@@ -120,14 +125,47 @@ void readAndSendSensors() {
   Serial.println(light);
 }
 
+/**
+ * @brief 센서 전송 간격을 변경하고 적용된 값을 "RATE:<ms>"로 응답합니다.
+ */
+void setSensorInterval(long interval) {
+  if (interval < minSensorInterval) interval = minSensorInterval;
+  if (interval > maxSensorInterval) interval = maxSensorInterval;
+  sensorInterval = interval;
+
+  Serial.print("RATE:");
+  Serial.println(sensorInterval);
+}
+
+/**
+ * @brief 현재 조도를 바로 측정하여 "LIGHT:<lux>"로 응답합니다.
+ */
+void sendLightLevel() {
+  Serial.print("LIGHT:");
+  Serial.println(lightMeter.readLightLevel());
+}
+
 void processCommand(String cmd) {
   cmd.trim();
 
+  // 센서 전송 간격 변경 명령: RATE:<ms>
+  if (cmd.startsWith("RATE:")) {
+    setSensorInterval(cmd.substring(5).toInt());
+    return;
+  }
+
+  // 조도 즉시 측정 요청: LIGHT?
+  if (cmd == "LIGHT?") {
+    sendLightLevel();
+    return;
+  }
+
   char buf[32];
   cmd.toCharArray(buf, sizeof(buf));
 
   char* token;
   int index = 0;
+  unsigned long seq = 0;
 
   token = strtok(buf, ",");
   while (token != NULL) {
@@ -139,8 +177,15 @@ void processCommand(String cmd) {
       case 2: digitalWrite(HEAT_PANNEL_PIN, value > 0 ? HIGH : LOW); break;
       case 3: analogWrite(GROW_LIGHT_PIN, value > 0 ? 255 : 0); break;
       case 4: digitalWrite(WHITE_LED_PIN, value > 0 ? HIGH : LOW); break;
+      case 5: seq = strtoul(token, NULL, 10); break;
     }
     token = strtok(NULL, ",");
     index++;
   }
+
+  // 명령 번호가 함께 온 경우 모든 출력을 적용한 뒤 확인 응답
+  if (index > 5) {
+    Serial.print("ACK:");
+    Serial.println(seq);
+  }
 }
\ No newline at end of file